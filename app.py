@@ -1,106 +1,463 @@
+from flask import Flask, Response, g, request, render_template, session, send_file, abort, jsonify, redirect, url_for
+from artifacts import MemoryBlobStore, FileBlobStore, SQLiteBlobStore, BlobTooLarge, SingleFlight
+from cache import ResultCache, ModelTemplateCache
+from datetime import date
+from metrics import PhaseTimer, Histogram, Counter, MetricsRegistry
+from jobs import JobQueue, MemoryJobStore, SQLiteJobStore, QueueFull, BatchRunner, ScheduleStream, run_schedule, preload_solver
 from io import BytesIO
-from flask import Flask, logging, request, render_template, session, send_file, abort
-from ortools.sat.python import cp_model
-import pandas as pd
-from pdf import generate_pdf
-from project import schedule_blocks, create_timetable, get_project_statistics
 import json
+import logging
 import os
+import time
 import uuid
 
 app = Flask(__name__)
 
 app.secret_key = os.urandom(24)  # Generates a random 24-byte key
+# The inputs and results of each request are logged at the DEBUG level (LOG_LEVEL=DEBUG)
+app.logger.setLevel(os.environ.get('LOG_LEVEL', 'WARNING').upper())
+app.config['SCHEDULER_ENGINE'] = os.environ.get('SCHEDULER_ENGINE', 'boolean')  # 'boolean' or 'interval', see project.ENGINES
+app.config['SCHEDULER_OBJECTIVE'] = os.environ.get('SCHEDULER_OBJECTIVE', 'separation')  # 'separation' or 'min_gap', see project.OBJECTIVES
+
+# OR-Tools, pandas and fpdf are imported by the first /generate, so a cold start (e.g. on Vercel) serves / right away.
+# PRELOAD_SOLVER=1 imports them at startup instead, for long-lived servers.
+if os.environ.get('PRELOAD_SOLVER', '') in ('1', 'true', 'yes'):
+    preload_solver()
+
+# Reads an optional numeric setting from the environment
+def env_number(name, cast, default=None):
+    value = os.environ.get(name)
+    return cast(value) if value else default
+
+# Solver budget for each request (see project.SOLVER_PARAMS). The time limit keeps a single
+# pathological submission from holding a worker indefinitely, it should stay below gunicorn's timeout.
+app.config['SOLVER_PARAMS'] = {
+    'max_time': env_number('SOLVER_MAX_TIME', float, 20.0),
+    'num_workers': env_number('SOLVER_NUM_WORKERS', int),
+    'relative_gap': env_number('SOLVER_RELATIVE_GAP', float),
+    'random_seed': env_number('SOLVER_RANDOM_SEED', int),
+}
+
+# Cache of solved weeks: an in-memory LRU per worker, plus an optional directory shared by all the workers
+result_cache = ResultCache(max_size=env_number('RESULT_CACHE_SIZE', int, 256),
+                           ttl=env_number('RESULT_CACHE_TTL', float, 3600),
+                           directory=os.environ.get('RESULT_CACHE_DIR') or None)
+
+# Models of the week shapes seen by this worker (days, slot grid and project blocks), cloned by the next requests of the same shape
+model_templates = ModelTemplateCache(max_size=env_number('MODEL_TEMPLATE_CACHE_SIZE', int, 64))
+
+# Job mode: /generate hands the solve and the PDF rendering to a bounded process pool and the results page polls for it.
+# Job records are kept in memory, or in a SQLite database shared by the workers if JOB_STORE is set.
+app.config['JOB_MODE'] = os.environ.get('JOB_MODE', '') in ('1', 'true', 'yes')
+job_queue = JobQueue(store=SQLiteJobStore(os.environ['JOB_STORE']) if os.environ.get('JOB_STORE') else MemoryJobStore(),
+                     max_workers=env_number('JOB_WORKERS', int),
+                     max_pending=env_number('JOB_MAX_PENDING', int, 16),
+                     cache_dir=os.environ.get('RESULT_CACHE_DIR') or None)
+
+# Batch API: each item is solved in a pool of BATCH_WORKERS processes (one per CPU by default), with at most BATCH_ITEM_MAX_TIME
+# seconds of solver time. At most BATCH_MAX_IN_FLIGHT items of all the batches are in the pool at once.
+app.config['BATCH_MAX_ITEMS'] = env_number('BATCH_MAX_ITEMS', int, 1000)
+# Longest horizon of /plan, in weeks
+app.config['PLAN_MAX_WEEKS'] = env_number('PLAN_MAX_WEEKS', int, 12)
+batch_runner = BatchRunner(max_workers=env_number('BATCH_WORKERS', int),
+                           max_in_flight=env_number('BATCH_MAX_IN_FLIGHT', int),
+                           max_time=env_number('BATCH_ITEM_MAX_TIME', float, 20.0),
+                           cache_dir=os.environ.get('RESULT_CACHE_DIR') or None)
+
+# Generated timetables are kept on the server as compact schedules (see export.schedule_document), the session only holds
+# their ids. Their PDFs are rendered when they are first downloaded, and kept next to them under the same ids.
+# They are kept in memory, or shared by the workers in a directory (PDF_STORE_DIR) or a SQLite database (PDF_STORE_DB),
+# each one PDF_STORE_TTL seconds.
+pdf_store_limits = {'max_bytes': env_number('PDF_STORE_MAX_BYTES', int, 64 * 2**20), 'ttl': env_number('PDF_STORE_TTL', float, 3600)}
+if os.environ.get('PDF_STORE_DIR'):
+    pdf_store = FileBlobStore(os.environ['PDF_STORE_DIR'], **pdf_store_limits)
+    schedule_store = FileBlobStore(os.path.join(os.environ['PDF_STORE_DIR'], 'schedules'), **pdf_store_limits)
+elif os.environ.get('PDF_STORE_DB'):
+    pdf_store = SQLiteBlobStore(os.environ['PDF_STORE_DB'], **pdf_store_limits)
+    schedule_store = SQLiteBlobStore(os.environ['PDF_STORE_DB'], table='schedules', **pdf_store_limits)
+else:
+    pdf_store = MemoryBlobStore(**pdf_store_limits)
+    schedule_store = MemoryBlobStore(**pdf_store_limits)
+
+# Number of PDF ids remembered in a session, only these can be downloaded from it
+PDF_IDS_PER_SESSION = 10
+
+# PDF renders running in this worker, shared by the requests for the same PDF
+pdf_renders = SingleFlight()
+
+# Request metrics of this worker, served by /metrics. Each request times its phases (parse, build, solve, extract,
+# statistics, pdf, render, ...), which are sent back in the Server-Timing header and added to the histograms.
+metrics = MetricsRegistry()
+phase_seconds = metrics.register(Histogram('scheduler_phase_seconds', 'Time spent in each phase of the requests.', 'phase'))
+request_seconds = metrics.register(Histogram('scheduler_request_seconds', 'Time to handle the requests, by endpoint.', 'endpoint'))
+requests_total = metrics.register(Counter('scheduler_requests_total', 'Requests handled, by endpoint and HTTP status.', ('endpoint', 'status')))
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    g.timer = PhaseTimer()
+
+@app.after_request
+def record_timings(response):
+    if 'timer' not in g:
+        return response
+    endpoint = request.endpoint or 'unknown'
+    total = time.perf_counter() - g.started
+    for phase, seconds in g.timer.phases.items():
+        phase_seconds.observe(phase, seconds)
+    request_seconds.observe(endpoint, total)
+    requests_total.inc(endpoint, response.status_code)
+    g.timer.add('total', total)
+    response.headers['Server-Timing'] = g.timer.server_timing()
+    return response
+
+# Renders a template, timing it as the 'render' phase
+def render_page(template, **context):
+    with g.timer.phase('render'):
+        return render_template(template, **context)
 
 # Route to serve the index.html page
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_page('index.html')
 
-@app.route('/generate', methods=['POST'])
-def generate():# Extract available days
-    try:
-        available_days = request.form.getlist('available_days')
-        start_time = request.form['start_time']
-        end_time = request.form['end_time']
-
-        # Extract project details
-        projects = []
-        project_count = int(request.form.get('project_count', 0))  # Use 0 as default if project_count is not present
-        for i in range(project_count):
-            project_name = request.form.get(f'projects[{i}][name]')
-            blocks = int(request.form.get(f'projects[{i}][blocks_per_week]', 3))  # Default to 3 if not present
-            hours_per_block = float(request.form.get(f'projects[{i}][hours_per_block]', 1))  # Default to 1 if not present
-            if project_name:  # Ensure project name is not None
-                projects.append({'name': project_name, 'hours_per_block': hours_per_block, 'blocks_per_week': blocks})
-
-        # Extract fixed constraints
-        fixed_constraints = []
-        constraint_count = int(request.form.get('constraint_count', 0))  # Use 0 as default if constraint_count is not present
-        for i in range(constraint_count):
-            constraint_name = request.form.get(f'constraints[{i}][name]')
-            constraint_day = request.form.get(f'constraints[{i}][day]')
-            constraint_start = request.form.get(f'constraints[{i}][start_time]')
-            constraint_end = request.form.get(f'constraints[{i}][end_time]')
-            
-            if constraint_name and constraint_day and constraint_start and constraint_end:
-                fixed_constraints.append({
-                    'name': constraint_name,
-                    'day': constraint_day,
-                    'start_time': constraint_start,
-                    'end_time': constraint_end
-                })
-        
-        # Print extracted data for debugging
-        print("Available Days:", available_days)
-        print("Start Time:", start_time)
-        print("End Time:", end_time)
-        print("Projects:")
-        print(json.dumps(projects, indent=4, skipkeys=False))
-        print("Fixed Constraints:")
-        print(json.dumps(fixed_constraints, indent=4, skipkeys=False))
-
-        # Schedule the blocks
-        status, result = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints)
-        print(json.dumps(result, indent=4, skipkeys=False)) # debug
-        timetable = create_timetable(available_days, start_time, end_time, result)
+# Extracts the scheduling inputs from the submitted form
+def parse_schedule_form(form):
+    available_days = form.getlist('available_days')
+    start_time = form['start_time']
+    end_time = form['end_time']
+
+    # Extract project details
+    projects = []
+    project_count = int(form.get('project_count', 0))  # Use 0 as default if project_count is not present
+    for i in range(project_count):
+        project_name = form.get(f'projects[{i}][name]')
+        blocks = int(form.get(f'projects[{i}][blocks_per_week]', 3))  # Default to 3 if not present
+        hours_per_block = float(form.get(f'projects[{i}][hours_per_block]', 1))  # Default to 1 if not present
+        if project_name:  # Ensure project name is not None
+            projects.append({'name': project_name, 'hours_per_block': hours_per_block, 'blocks_per_week': blocks})
+            if form.get(f'projects[{i}][weight]'):  # Weight of the project with the min_gap objective
+                projects[-1]['weight'] = int(form[f'projects[{i}][weight]'])
+
+    # Extract fixed constraints
+    fixed_constraints = []
+    constraint_count = int(form.get('constraint_count', 0))  # Use 0 as default if constraint_count is not present
+    for i in range(constraint_count):
+        constraint_name = form.get(f'constraints[{i}][name]')
+        constraint_day = form.get(f'constraints[{i}][day]')
+        constraint_start = form.get(f'constraints[{i}][start_time]')
+        constraint_end = form.get(f'constraints[{i}][end_time]')
         
-        # Handle scheduling result and generate PDF
-        if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
-            print("Optimal or feasible solution found.")
+        if constraint_name and constraint_day and constraint_start and constraint_end:
+            fixed_constraints.append({
+                'name': constraint_name,
+                'day': constraint_day,
+                'start_time': constraint_start,
+                'end_time': constraint_end
+            })
+
+    # Log extracted data for debugging (only built when DEBUG is enabled)
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("Available Days: %s, Start Time: %s, End Time: %s", available_days, start_time, end_time)
+        app.logger.debug("Projects: %s", json.dumps(projects, indent=4, skipkeys=False))
+        app.logger.debug("Fixed Constraints: %s", json.dumps(fixed_constraints, indent=4, skipkeys=False))
+
+    return available_days, start_time, end_time, projects, fixed_constraints
 
-            timetable_pdf_path = 'timetable.pdf'
-            pdf_buffer = generate_pdf(timetable, timetable_pdf_path, start_time, end_time, [project['name'] for project in projects] + [constraint['name'] for constraint in fixed_constraints])
-           
-           # Create a unique identifier for the PDF
-            pdf_id = str(uuid.uuid4())
-            # Store the PDF buffer in the session or temporary storage
-            session[pdf_id] = pdf_buffer.getvalue()
+# Previous result of this session, to warm start the next solve (only if it was scheduled on the same grid)
+def previous_result(slot_minutes):
+    schedule_id = session.get('last_schedule_id')
+    if session.get('last_slot_minutes', 30) != slot_minutes:
+        return None
+    cached = result_cache.peek(schedule_id) if schedule_id else None
+    return cached[1] if cached else None
 
-            stats = get_project_statistics(projects, result)
+# Renders the outcome of jobs.run_schedule, keeping the schedule for download_pdf and the exports
+def render_outcome(outcome):
+    if outcome['error']:
+        return render_page('results.html', error=outcome['error'])
 
-            return render_template('results.html', filename=timetable_pdf_path, stats=stats, pdf_id=pdf_id)
-        else:
-            error_message = "No feasible solution found with the given constraints."
-            return render_template('results.html', error=error_message)
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("Optimal or feasible solution found: %s", json.dumps(outcome['result'], indent=4, skipkeys=False))
+
+    # Store the schedule on the server, under the hash of the timetable. Its PDF is rendered if it's downloaded.
+    try:
+        pdf_id = schedule_store.put(outcome['pdf_id'], json.dumps(outcome['schedule'], separators=(',', ':')).encode('utf-8'))
+    except BlobTooLarge as e:
+        return render_page('results.html', error=str(e))
+    session['pdf_ids'] = [other for other in session.get('pdf_ids', []) if other != pdf_id][-(PDF_IDS_PER_SESSION - 1):] + [pdf_id]
+    # Remember the schedule, so the next solve of this session starts from it
+    if outcome['solve_stats'].get('schedule_id'):
+        session['last_schedule_id'] = outcome['solve_stats']['schedule_id']
+        session['last_slot_minutes'] = outcome['slot_minutes']
+
+    return render_page('results.html', filename='timetable.pdf', stats=outcome['stats'], pdf_id=pdf_id, solve_stats=outcome['solve_stats'])
+
+@app.route('/generate', methods=['POST'])
+def generate():
+    try:
+        with g.timer.phase('parse'):
+            inputs = parse_schedule_form(request.form)
+        slot_minutes = int(request.form.get('slot_minutes', 30))
 
+        # In job mode the solve runs in the pool, and the results page waits for it
+        if app.config['JOB_MODE']:
+            job_id = job_queue.submit(*inputs, engine=app.config['SCHEDULER_ENGINE'], objective=app.config['SCHEDULER_OBJECTIVE'],
+                                      solver_params=app.config['SOLVER_PARAMS'], hint=previous_result(slot_minutes), slot_minutes=slot_minutes)
+            return redirect(url_for('job_results', job_id=job_id))
+
+        outcome = run_schedule(*inputs, engine=app.config['SCHEDULER_ENGINE'], objective=app.config['SCHEDULER_OBJECTIVE'], solver_params=app.config['SOLVER_PARAMS'],
+                               cache=result_cache, templates=model_templates, hint=previous_result(slot_minutes), slot_minutes=slot_minutes)
+        g.timer.update(outcome.get('timings', {}))
+        return render_outcome(outcome)
+
+    except QueueFull as e:
+        return render_page('results.html', error=str(e)), 503
     except Exception as e:
         error_message = str(e)
-        return render_template('results.html', error=error_message)
+        return render_page('results.html', error=error_message)
+
+# Streams of /generate/stream being solved by this worker, by id, so they can be cancelled
+active_streams = {}
+
+# One Server-Sent Event
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+# Streaming mode of /generate (same form fields): the response is a stream of Server-Sent Events, read with fetch by the index page.
+# 'start' gives the 'cancel_url' and the 'results_url', each improving timetable found by the solver is sent as a 'solution'
+# (see jobs.ScheduleStream) and 'done' ends the stream. Cancelling keeps the best timetable so far and frees the worker.
+# The outcome is kept in the job store, so the results page of the stream shows it like the one of a job.
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    try:
+        with g.timer.phase('parse'):
+            inputs = parse_schedule_form(request.form)
+        slot_minutes = int(request.form.get('slot_minutes', 30))
+    except Exception as e:
+        return jsonify(error=str(e)), 400
+
+    stream_id = str(uuid.uuid4())
+    job_queue.store.create(stream_id)
+    stream = ScheduleStream(inputs, on_done=lambda outcome: job_queue.store.update(stream_id, 'done', outcome),
+                            engine=app.config['SCHEDULER_ENGINE'], objective=app.config['SCHEDULER_OBJECTIVE'], solver_params=app.config['SOLVER_PARAMS'],
+                            cache=result_cache, templates=model_templates, hint=previous_result(slot_minutes), slot_minutes=slot_minutes)
+    active_streams[stream_id] = stream
+    start = {'stream_id': stream_id, 'cancel_url': url_for('cancel_stream', stream_id=stream_id),
+             'results_url': url_for('job_results', job_id=stream_id)}
+
+    def events():
+        try:
+            yield sse_event('start', start)
+            for event, data in stream.events():
+                if event == 'solution':
+                    yield sse_event('solution', data)
+                else:
+                    yield sse_event('done', {'error': data['error'], 'status': data.get('status'), 'reason': data.get('reason'), 'solve_stats': data.get('solve_stats'),
+                                             'results_url': start['results_url']})
+        finally:
+            active_streams.pop(stream_id, None)
+
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Accepts the best timetable of a stream so far and stops its solve. Streams are only known to the worker solving them.
+@app.route('/generate/stream/<stream_id>/cancel', methods=['POST'])
+def cancel_stream(stream_id):
+    stream = active_streams.get(stream_id)
+    if stream is None:
+        return jsonify(error="Stream not found"), 404
+    stream.cancel()
+    return jsonify(stream_id=stream_id, cancelled=True), 202
+
+# Submits a schedule job and returns its id right away (form fields as in /generate)
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    try:
+        with g.timer.phase('parse'):
+            inputs = parse_schedule_form(request.form)
+        job_id = job_queue.submit(*inputs, engine=app.config['SCHEDULER_ENGINE'], objective=app.config['SCHEDULER_OBJECTIVE'],
+                                  solver_params=app.config['SOLVER_PARAMS'], slot_minutes=int(request.form.get('slot_minutes', 30)))
+    except QueueFull as e:
+        return jsonify(error=str(e)), 503, {'Retry-After': '5'}
+    except Exception as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(job_id=job_id, status_url=url_for('job_status', job_id=job_id), results_url=url_for('job_results', job_id=job_id)), 202
+
+# Status of a job, polled by the results page
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify(error="Job not found"), 404
+    response = {'job_id': job_id, 'status': job['status']}
+    if job['outcome'] is not None:
+        response['error'] = job['outcome'].get('error')
+        response['reason'] = job['outcome'].get('reason')
+        response['solve_stats'] = job['outcome'].get('solve_stats')
+    return jsonify(response)
+
+# Results page of a job: waits for it while it's queued or running
+@app.route('/jobs/<job_id>')
+def job_results(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404, description="Job not found")
+    if job['status'] in ('queued', 'running'):
+        return render_page('results.html', pending=True, status_url=url_for('job_status', job_id=job_id))
+    return render_outcome(job['outcome'])
+
+# Solves a list of weeks given as JSON, either a list or {"requests": [...]}. Each week has the fields of schedule_blocks
+# (available_days, start_time, end_time, projects, fixed_constraints), and optionally an id, slot_minutes and max_time.
+# The response is NDJSON: one line per week, as soon as it's solved (see jobs.run_batch_item), so not in the order of the request.
+# With ?format=ics, csv or json, the timetables are streamed in that export format instead (see export.py).
+@app.route('/batch', methods=['POST'])
+def batch():
+    from export import EXPORT_FORMATS, export_chunks, batch_weeks
+
+    data = request.get_json(silent=True)
+    items = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify(error="Expected a JSON list of schedule requests"), 400
+    if len(items) > app.config['BATCH_MAX_ITEMS']:
+        return jsonify(error=f"Too many schedule requests ({len(items)}), the limit is {app.config['BATCH_MAX_ITEMS']}"), 413
+
+    export_format = request.args.get('format', 'ndjson')
+    if export_format != 'ndjson' and export_format not in EXPORT_FORMATS:
+        return jsonify(error=f"Unknown format: {export_format}"), 400
+    week_start = week_start_arg()
+    repeat_weeks = repeat_weeks_arg()
+
+    lines = batch_runner.run(items, engine=app.config['SCHEDULER_ENGINE'], objective=app.config['SCHEDULER_OBJECTIVE'], solver_params=app.config['SOLVER_PARAMS'])
+    if export_format != 'ndjson':
+        return Response(export_chunks(export_format, batch_weeks(items, lines), week_start, repeat_weeks), mimetype=EXPORT_FORMATS[export_format])
+    return Response((json.dumps(line) + '\n' for line in lines), mimetype='application/x-ndjson')
+
+# Schedules a team: {"people": {name: week, ...}, "shared_events": [...]}, each week as in /batch.
+# Shared events must be at the same time for all their 'participants': either at a fixed 'day', 'start_time' and 'end_time',
+# or placed by the scheduler given their 'hours' (see team.schedule_team). The weeks are solved in the batch pool,
+# within its BATCH_MAX_IN_FLIGHT limit.
+@app.route('/team', methods=['POST'])
+def team():
+    from team import schedule_team
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('people'), dict) or not isinstance(data.get('shared_events', []), list):
+        return jsonify(error="Expected a JSON object with the people and their shared events"), 400
+    if len(data['people']) > app.config['BATCH_MAX_ITEMS']:
+        return jsonify(error=f"Too many people ({len(data['people'])}), the limit is {app.config['BATCH_MAX_ITEMS']}"), 413
+
+    solver_params = dict(app.config['SOLVER_PARAMS'], max_time=batch_runner.max_time)
+    outcome = schedule_team(data['people'], data.get('shared_events', []), engine=app.config['SCHEDULER_ENGINE'], objective=app.config['SCHEDULER_OBJECTIVE'],
+                            solver_params=solver_params, slot_minutes=int(data.get('slot_minutes', 30)), executor=batch_runner)
+    if outcome['error']:
+        return jsonify(error=outcome['error']), 400
+    return jsonify(outcome)
+
+# Plans several weeks ahead: {"start_date": "YYYY-MM-DD", "num_weeks": N, ...} and the fields of a week as in /batch, with one-off
+# 'dated_constraints' and per-week targets in the 'weekly_blocks' of the projects (see horizon.horizon_inputs). The weeks are solved
+# one after the other, each with at most BATCH_ITEM_MAX_TIME seconds of solver time, carrying forward the blocks that don't fit.
+# With the "plan" of a previous response and a "replan_week", only that week is planned again (see horizon.replan_week).
+@app.route('/plan', methods=['POST'])
+def plan():
+    from horizon import horizon_inputs, plan_horizon, replan_week
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify(error="Expected a JSON object with the horizon"), 400
+    try:
+        inputs = horizon_inputs(data)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if inputs['num_weeks'] > app.config['PLAN_MAX_WEEKS']:
+        return jsonify(error=f"Too many weeks ({inputs['num_weeks']}), the limit is {app.config['PLAN_MAX_WEEKS']}"), 413
+
+    options = {'engine': app.config['SCHEDULER_ENGINE'], 'objective': app.config['SCHEDULER_OBJECTIVE'],
+               'solver_params': dict(app.config['SOLVER_PARAMS'], max_time=batch_runner.max_time), 'templates': model_templates}
+    if 'replan_week' in data:
+        try:
+            return jsonify(replan_week(inputs, data['plan'], int(data['replan_week']), **options))
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify(error=f"Invalid plan to re-plan: {e}"), 400
+    return jsonify(plan_horizon(inputs, **options))
+
+# Request metrics of this worker, in the Prometheus text format
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Hit/miss counters of the result cache, and of the model templates in 'templates'
+@app.route('/cache_stats')
+def cache_stats():
+    return jsonify(dict(result_cache.stats(), templates=model_templates.stats()))
+
+# First day of the week the week days of an iCalendar export land on (?week_start=YYYY-MM-DD), the coming Monday by default
+def week_start_arg():
+    try:
+        return date.fromisoformat(request.args['week_start']) if request.args.get('week_start') else None
+    except ValueError:
+        abort(400, description="Invalid week_start, expected YYYY-MM-DD")
+
+# Number of weeks the week days of an iCalendar export repeat for (?repeat_weeks=N), once by default
+def repeat_weeks_arg():
+    from export import MAX_REPEAT_WEEKS
+    repeat_weeks = request.args.get('repeat_weeks', '1')
+    if not repeat_weeks.isdigit() or not 1 <= int(repeat_weeks) <= MAX_REPEAT_WEEKS:
+        abort(400, description=f"Invalid repeat_weeks, expected 1 to {MAX_REPEAT_WEEKS}")
+    return int(repeat_weeks)
+
+# Exports a timetable of the session as iCalendar (.ics), CSV (.csv) or compact JSON (.json), from its stored schedule
+@app.route('/export/<pdf_id>.<export_format>')
+def export_schedule(pdf_id, export_format):
+    from export import EXPORT_FORMATS, export_chunks, document_week
+
+    if export_format not in EXPORT_FORMATS:
+        abort(404, description="Unknown export format")
+    document = schedule_store.open(pdf_id) if pdf_id in session.get('pdf_ids', []) else None
+    if document is None:
+        abort(404, description="Timetable not found")
+    week = document_week(json.loads(document.read()), pdf_id[:12])
+    return Response(export_chunks(export_format, [week], week_start_arg(), repeat_weeks_arg()), mimetype=EXPORT_FORMATS[export_format],
+                    headers={'Content-Disposition': f'attachment; filename=timetable.{export_format}'})
+
+# Renders the PDF of a stored schedule and keeps it in the PDF store. None if the schedule is gone.
+def render_stored_pdf(pdf_id):
+    from pdf import render_document
+
+    # Another request may have rendered it in the meantime
+    pdf_file = pdf_store.open(pdf_id)
+    if pdf_file is not None:
+        return pdf_file.read()
+    document = schedule_store.open(pdf_id)
+    if document is None:
+        return None
+    with g.timer.phase('pdf'):
+        data = render_document(json.loads(document.read()))
+    try:
+        pdf_store.put(pdf_id, data)
+    except BlobTooLarge as e:
+        app.logger.warning("PDF %s not kept: %s", pdf_id, e)
+    return data
+
+# The PDF of a timetable, rendered by the first request for it: the next views and downloads read it from the PDF store,
+# and the requests arriving during the render wait for it instead of rendering it again.
+def stored_pdf(pdf_id):
+    pdf_file = pdf_store.open(pdf_id)
+    if pdf_file is not None:
+        return pdf_file
+    data = pdf_renders.run(pdf_id, lambda: render_stored_pdf(pdf_id))
+    return BytesIO(data) if data is not None else None
 
 @app.route('/download_pdf/<pdf_id>')
 def download_pdf(pdf_id):
-    print(f"Attempting to download PDF with ID: {pdf_id}")
-    
-    try:
-        pdf_data = session.get(pdf_id)
-        if pdf_data is None:
-            abort(404, description="PDF not found")
-        
-        pdf_bytes = BytesIO(pdf_data.encode('latin1')) 
+    app.logger.debug("Attempting to download PDF with ID: %s", pdf_id)
 
+    pdf_file = stored_pdf(pdf_id) if pdf_id in session.get('pdf_ids', []) else None
+    if pdf_file is None:
+        abort(404, description="PDF not found")
+
+    try:
         return send_file(
-            pdf_bytes,
+            pdf_file,
             as_attachment=request.args.get('mode') == 'download',
             download_name='timetable.pdf',
             mimetype='application/pdf'
@@ -0,0 +1,241 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from io import BytesIO
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Raised by the stores when a single blob is over max_blob_bytes
+class BlobTooLarge(ValueError):
+    pass
+
+# Blob ids are sha256 hashes. Anything else is treated as missing, so an id can't point outside the store.
+def valid_key(key):
+    return isinstance(key, str) and re.fullmatch(r'[0-9a-f]{64}', key) is not None
+
+# Hash of what a timetable shows, used as the id of its PDF: the same timetable is stored once, whoever generated it.
+# The PDF bytes themselves can't be the key, since fpdf writes the creation date in them.
+# result is a dict or a Schedule, hashed through the cells of each day (see Schedule.runs).
+def timetable_hash(available_days, result, project_names, time_slots):
+    # Imported here, numpy isn't needed to start the web app
+    from schedule import Schedule
+    schedule = Schedule.of(result, num_slots=len(time_slots))
+    cells = {day: schedule.runs(day) for day in schedule.days}
+    payload = {
+        'available_days': list(available_days),
+        'time_slots': [time_slots.start_time, time_slots.end_time, time_slots.slot_minutes],
+        'result': {day: day_cells for day, day_cells in cells.items() if day_cells},
+        'project_names': list(project_names),  # Their order sets the colors
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+# Blobs (the generated PDFs) kept in the memory of a single process.
+# Blobs live ttl seconds after being stored, and the least recently used ones are evicted past max_bytes in total.
+class MemoryBlobStore:
+    def __init__(self, max_bytes=64 * 2**20, max_blob_bytes=5 * 2**20, ttl=3600):
+        self.max_bytes = max_bytes
+        self.max_blob_bytes = max_blob_bytes
+        self.ttl = ttl
+        self._blobs = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, key, data):
+        check_blob(key, data, self.max_blob_bytes)
+        with self._lock:
+            self._remove(key)
+            self._blobs[key] = (time.time() + self.ttl, data)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._blobs)))
+        return key
+
+    # Binary file object with the blob, or None if it's missing or expired
+    def open(self, key):
+        with self._lock:
+            entry = self._blobs.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._remove(key)
+                return None
+            self._blobs.move_to_end(key)
+            return BytesIO(entry[1])
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {'blobs': len(self._blobs), 'bytes': self._size, 'max_bytes': self.max_bytes}
+
+    # Must be called with the lock held
+    def _remove(self, key):
+        entry = self._blobs.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+# Blobs stored as files in a directory, shared by the gunicorn workers. The modification time of a file is the time it was stored.
+# Expired files are removed, then the least recently stored ones past max_bytes in total.
+class FileBlobStore:
+    def __init__(self, directory, max_bytes=256 * 2**20, max_blob_bytes=5 * 2**20, ttl=3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_blob_bytes = max_blob_bytes
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.blob')
+
+    def put(self, key, data):
+        check_blob(key, data, self.max_blob_bytes)
+        # Write to a temporary file and rename it, so other workers never read a partial blob
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, self._path(key))
+        self._evict()
+        return key
+
+    def open(self, key):
+        if not valid_key(key):
+            return None
+        path = self._path(key)
+        try:
+            file = open(path, 'rb')
+        except OSError:
+            return None
+        if os.fstat(file.fileno()).st_mtime + self.ttl <= time.time():
+            file.close()
+            remove_file(path)
+            return None
+        return file
+
+    def delete(self, key):
+        if valid_key(key):
+            remove_file(self._path(key))
+
+    def stats(self):
+        files = self._files()
+        return {'blobs': len(files), 'bytes': sum(size for _, _, size in files), 'max_bytes': self.max_bytes}
+
+    # (modification time, path, size) of the stored blobs
+    def _files(self):
+        files = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith('.blob'):
+                path = os.path.join(self.directory, filename)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                files.append((info.st_mtime, path, info.st_size))
+        return files
+
+    def _evict(self):
+        expired_before = time.time() - self.ttl
+        files = []
+        for mtime, path, size in self._files():
+            if mtime <= expired_before:
+                remove_file(path)
+            else:
+                files.append((mtime, path, size))
+        total = sum(size for _, _, size in files)
+        for mtime, path, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            remove_file(path)
+            total -= size
+
+# Blobs in a SQLite database, shared by the gunicorn workers like the SQLite job store.
+# Several stores can share a database, each with its own table.
+class SQLiteBlobStore:
+    def __init__(self, path, max_bytes=256 * 2**20, max_blob_bytes=5 * 2**20, ttl=3600, table='blobs'):
+        if not re.fullmatch(r'[a-z_]+', table):
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.max_blob_bytes = max_blob_bytes
+        self.ttl = ttl
+        with self._connect() as connection:
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {self.table} (id TEXT PRIMARY KEY, data BLOB, size INTEGER, stored REAL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def put(self, key, data):
+        check_blob(key, data, self.max_blob_bytes)
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(f'INSERT OR REPLACE INTO {self.table} (id, data, size, stored) VALUES (?, ?, ?, ?)', (key, data, len(data), now))
+            connection.execute(f'DELETE FROM {self.table} WHERE stored <= ?', (now - self.ttl,))
+            # Keeps the most recently stored blobs that fit in max_bytes
+            connection.execute(f'DELETE FROM {self.table} WHERE id IN (SELECT id FROM (SELECT id, SUM(size) OVER (ORDER BY stored DESC, id) AS total FROM {self.table}) WHERE total > ?)',
+                               (self.max_bytes,))
+        return key
+
+    def open(self, key):
+        with self._connect() as connection:
+            row = connection.execute(f'SELECT data FROM {self.table} WHERE id = ? AND stored > ?', (key, time.time() - self.ttl)).fetchone()
+        return BytesIO(row[0]) if row else None
+
+    def delete(self, key):
+        with self._connect() as connection:
+            connection.execute(f'DELETE FROM {self.table} WHERE id = ?', (key,))
+
+    def stats(self):
+        with self._connect() as connection:
+            count, size = connection.execute(f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}').fetchone()
+        return {'blobs': count, 'bytes': size, 'max_bytes': self.max_bytes}
+
+# Shares a call between the threads asking for the same key at the same time: the first one runs it, the others wait
+# for its result (or its exception). Used so concurrent requests for a PDF that isn't stored yet render it once.
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+        try:
+            result = function()
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    # Number of calls running
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+def check_blob(key, data, max_blob_bytes):
+    if not valid_key(key):
+        raise ValueError(f"Invalid blob id: {key!r}")
+    if len(data) > max_blob_bytes:
+        raise BlobTooLarge(f"The file is too large to be stored ({len(data)} bytes, the limit is {max_blob_bytes}).")
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
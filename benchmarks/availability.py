@@ -0,0 +1,37 @@
+# Benchmarks the boolean model on weeks of growing meeting density: with variables only for the blocks that fit in the free time,
+# busier weeks should give smaller models that are faster to solve, not bigger ones.
+# Usage: python -m benchmarks.availability [--densities 0 0.1 0.2 0.35 0.5] [--seeds N] [--max-time S]
+import argparse
+import statistics
+from tabulate import tabulate
+from project import schedule_blocks
+from benchmarks.instances import generate_instance
+
+def main():
+    parser = argparse.ArgumentParser(description='Boolean model size and solve time by meeting density.')
+    parser.add_argument('--densities', type=float, nargs='+', default=[0.0, 0.1, 0.2, 0.35, 0.5])
+    parser.add_argument('--seeds', type=int, default=3)
+    parser.add_argument('--max-time', type=float, default=30.0)
+    args = parser.parse_args()
+
+    rows = []
+    for density in args.densities:
+        runs = []
+        for seed in range(args.seeds):
+            # Short weeks, the boolean engine struggles to prove optimality on bigger ones
+            instance = generate_instance(seed=seed, num_days=3, start_time='09:00', end_time='17:00', num_projects=4, max_blocks=3, constraint_density=density)
+            status, result, stats = schedule_blocks(*instance, engine='boolean', solver_params={'max_time': args.max_time}, return_stats=True)
+            runs.append(stats)
+        rows.append({
+            'Density': density,
+            'Variables': statistics.mean(stats['variables'] for stats in runs),
+            'Constraints': statistics.mean(stats['constraints'] for stats in runs),
+            'Build (ms)': statistics.mean(stats['build_time'] for stats in runs) * 1000,
+            'Solve (s)': statistics.mean(stats['wall_time'] for stats in runs),
+            'Optimal': sum(stats['optimal'] for stats in runs),
+            'Infeasible': sum(stats['status'] == 'INFEASIBLE' for stats in runs),
+        })
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.3f'))
+
+if __name__ == '__main__':
+    main()
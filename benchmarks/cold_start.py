@@ -0,0 +1,88 @@
+# Benchmarks the cold start of the web app: the import time of each module, and the time to the first byte of
+# / and /generate in a fresh Python process (like a serverless instance starting up).
+# Usage: python -m benchmarks.cold_start [--repeat N] [--preload] [--json FILE]
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from tabulate import tabulate
+
+MODULES = ('timeslots', 'cache', 'jobs', 'app', 'project', 'pdf', 'flask', 'pandas', 'fpdf', 'ortools.sat.python.cp_model')
+
+# Runs in the fresh process: imports the app and makes one request with the test client.
+# Prints the import time and the time to the first byte, in seconds since the start of the script.
+CHILD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+client = app.test_client()
+path = sys.argv[1]
+if path == '/generate':
+    from benchmarks.instances import hardcoded_instance, schedule_form
+    response = client.post(path, data=schedule_form(hardcoded_instance()))
+else:
+    response = client.get(path)
+first_byte = time.perf_counter()
+print(json.dumps({'status': response.status_code, 'import': imported - started, 'first_byte': first_byte - started}))
+'''
+
+# Import time of a module in a fresh process, in seconds (cumulative, from python -X importtime)
+def import_time(module):
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True, check=True)
+    for line in reversed(process.stderr.splitlines()):
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    return None
+
+# Runs one request in a fresh process. Returns the process wall time and the child's measurements.
+def first_byte_time(path, env):
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, path], capture_output=True, text=True, check=True, env=env)
+    wall_time = time.perf_counter() - started
+    measures = json.loads(process.stdout.strip().splitlines()[-1])
+    measures['process'] = wall_time
+    return measures
+
+def median_of(values):
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+def main():
+    parser = argparse.ArgumentParser(description='Import times and time to first byte of a cold start.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--preload', action='store_true', help='import the solver at startup (PRELOAD_SOLVER=1)')
+    parser.add_argument('--json', help='also write the medians to this file, to compare runs')
+    args = parser.parse_args()
+
+    env = dict(os.environ, SCHEDULER_ENGINE='interval', PRELOAD_SOLVER='1' if args.preload else '0')
+    env.pop('JOB_MODE', None)
+
+    imports = {module: median_of([import_time(module) for _ in range(args.repeat)]) for module in MODULES}
+    print(tabulate([{'Module': module, 'Import (ms)': seconds * 1000 if seconds is not None else None} for module, seconds in imports.items()],
+                   headers='keys', tablefmt='grid', floatfmt='.1f'))
+
+    requests = {}
+    rows = []
+    for path in ('/', '/generate'):
+        runs = [first_byte_time(path, env) for _ in range(args.repeat)]
+        requests[path] = {key: median_of([run[key] for run in runs]) for key in ('import', 'first_byte', 'process')}
+        rows.append({
+            'Request': path,
+            'HTTP status': runs[-1]['status'],
+            'Import app (ms)': requests[path]['import'] * 1000,
+            'First byte (ms)': requests[path]['first_byte'] * 1000,
+            'Process (ms)': requests[path]['process'] * 1000,
+        })
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.1f'))
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'preload': args.preload, 'repeat': args.repeat, 'imports': imports, 'requests': requests}, file, indent=2)
+
+if __name__ == '__main__':
+    main()
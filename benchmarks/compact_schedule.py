@@ -0,0 +1,83 @@
+# Benchmarks the post-solve work on a {day: {slot: name}} result against a Schedule (a matrix of activity ids plus a name table):
+# the project statistics (a walk of the dicts against a bincount), the block cells of the PDF (merging the slots of the dicts against Schedule.runs),
+# the timetable DataFrame, and the size of a cached entry (the dict as JSON against the compact forms).
+# Usage: python -m benchmarks.compact_schedule [--repeat N]
+import argparse
+import json
+import pickle
+from tabulate import tabulate
+from project import schedule_blocks, create_timetable, get_project_statistics
+from schedule import Schedule
+from timeslots import SlotGrid
+from benchmarks.extraction import best_time, create_timetable_by_cell
+from benchmarks.instances import hardcoded_instance, generate_instance
+
+def benchmark_instances():
+    return [
+        ('hardcoded', hardcoded_instance(), 30),
+        ('hardcoded, 15 min', hardcoded_instance(), 15),
+        ('7 days, 07-22, 15 projects', generate_instance(seed=3, num_days=7, start_time='07:00', end_time='22:00', num_projects=15, max_blocks=7), 30),
+        ('7 days, 07-22, 15 projects, 15 min', generate_instance(seed=3, num_days=7, start_time='07:00', end_time='22:00', num_projects=15, max_blocks=7), 15),
+    ]
+
+# The assigned slots of each project as get_project_statistics counted them before, walking the dicts
+def slot_counts_by_dict(projects, result):
+    counts = {project['name']: 0 for project in projects}
+    for day, slots in result.items():
+        for slot, name in slots.items():
+            if name in counts:
+                counts[name] += 1
+    return counts
+
+# The block cells of a day as the PDF merged them before, walking the slots of the dict: [first slot, number of slots, name]
+def merged_cells(slots):
+    cells = []
+    for slot in sorted(slots):
+        name = slots[slot]
+        if cells and cells[-1][2] == name and cells[-1][0] + cells[-1][1] == slot:
+            cells[-1][1] += 1
+        else:
+            cells.append([slot, 1, name])
+    return cells
+
+def main():
+    parser = argparse.ArgumentParser(description='Statistics, PDF cells, timetable and cache size from dicts against a Schedule.')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    rows = []
+    for name, instance, slot_minutes in benchmark_instances():
+        available_days, start_time, end_time, projects, fixed_constraints = instance
+        time_slots = SlotGrid(start_time, end_time, slot_minutes)
+        status, schedule = schedule_blocks(*instance, engine='interval', time_slots=time_slots, as_schedule=True)
+        result = schedule.to_result()
+
+        dict_stats_time, counts = best_time(lambda: slot_counts_by_dict(projects, result), args.repeat)
+        schedule_stats_time, stats = best_time(lambda: get_project_statistics(projects, schedule, time_slots=time_slots), args.repeat)
+        assert [counts[project['name']] for project in projects] == [project['Assigned Slots'] for project in stats]
+
+        dict_cells_time, cells = best_time(lambda: [merged_cells(result.get(day, {})) for day in available_days], args.repeat)
+        schedule_cells_time, runs = best_time(lambda: [schedule.runs(day) for day in available_days], args.repeat)
+        assert cells == runs
+
+        by_cell_time, by_cell = best_time(lambda: create_timetable_by_cell(available_days, result, time_slots), args.repeat)
+        grid_time, grid = best_time(lambda: create_timetable(available_days, start_time, end_time, schedule, time_slots=time_slots), args.repeat)
+        assert grid.equals(by_cell)
+
+        rows.append({
+            'Instance': name,
+            'Stats dict (ms)': dict_stats_time * 1000,
+            'Stats schedule (ms)': schedule_stats_time * 1000,
+            'PDF cells dict (ms)': dict_cells_time * 1000,
+            'PDF cells schedule (ms)': schedule_cells_time * 1000,
+            'Timetable by cell (ms)': by_cell_time * 1000,
+            'Timetable schedule (ms)': grid_time * 1000,
+            'Dict JSON (B)': len(json.dumps(result)),
+            'Dict pickle (B)': len(pickle.dumps(result)),
+            'Schedule JSON (B)': len(json.dumps(schedule.to_dict())),
+            'Schedule bytes (B)': len(schedule.to_bytes()),
+        })
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.3f'))
+
+if __name__ == '__main__':
+    main()
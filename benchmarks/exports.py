@@ -0,0 +1,58 @@
+# Benchmarks the export formats (see export.py) against rendering the PDF, on the timetables of the suite's weeks,
+# and the peak memory of streaming the exports of growing batches of weeks, which shouldn't grow with the batch.
+# Usage: python -m benchmarks.exports [--engine interval|boolean] [--seeds N] [--repeat N] [--batches 10 100 1000]
+import argparse
+import tracemalloc
+from tabulate import tabulate
+from export import EXPORT_FORMATS, export_chunks
+from pdf import render_pdf
+from project import ENGINES, schedule_blocks
+from timeslots import SlotGrid
+from benchmarks.extraction import best_time
+from benchmarks.suite import suite_instances
+
+# Peak memory, in bytes, of exporting the same week num_weeks times, reading the chunks one at a time
+def streaming_peak(export_format, week, num_weeks):
+    tracemalloc.start()
+    size = sum(len(chunk) for chunk in export_chunks(export_format, (dict(week, id=index) for index in range(num_weeks))))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, size
+
+def main():
+    parser = argparse.ArgumentParser(description='Export time against PDF rendering, and memory of streamed batch exports.')
+    parser.add_argument('--engine', choices=ENGINES, default='interval')
+    parser.add_argument('--seeds', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--batches', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    rows = []
+    week = None
+    for name, instance in suite_instances(args.seeds):
+        available_days, start_time, end_time, projects, fixed_constraints = instance
+        time_slots = SlotGrid(start_time, end_time)
+        status, result = schedule_blocks(*instance, engine=args.engine, solver_params={'max_time': 10.0}, time_slots=time_slots, as_schedule=True)
+        names = [project['name'] for project in projects] + [constraint['name'] for constraint in fixed_constraints]
+        week = {'available_days': available_days, 'result': result, 'time_slots': time_slots}
+
+        row = {'Instance': name}
+        row['PDF (ms)'] = best_time(lambda: render_pdf(available_days, result, names, time_slots), args.repeat)[0] * 1000
+        for export_format in EXPORT_FORMATS:
+            row[f'{export_format} (ms)'] = best_time(lambda: ''.join(export_chunks(export_format, [week])), args.repeat)[0] * 1000
+        rows.append(row)
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.3f'))
+
+    # Streaming the last week of the suite as batches of growing size
+    rows = []
+    for num_weeks in args.batches:
+        row = {'Weeks': num_weeks}
+        for export_format in EXPORT_FORMATS:
+            peak, size = streaming_peak(export_format, week, num_weeks)
+            row[f'{export_format} output (KB)'] = size / 1024
+            row[f'{export_format} peak (KB)'] = peak / 1024
+        rows.append(row)
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.1f'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# Benchmarks the post-solve phase: reading the solution (one solver.Value() call per variable against one read of the
+# solver response) and building the timetable DataFrame (cell by cell against one numpy assignment).
+# Usage: python -m benchmarks.extraction [--engine interval|boolean] [--repeat N] [--max-time S]
+import argparse
+import time
+import pandas as pd
+from tabulate import tabulate
+from project import ENGINES, build_boolean_model, build_interval_model, create_solver, create_timetable, schedule_blocks
+from timeslots import SlotGrid
+from benchmarks.instances import hardcoded_instance, generate_instance
+
+def benchmark_instances():
+    return [
+        ('hardcoded', hardcoded_instance(), 30),
+        ('hardcoded, 15 min', hardcoded_instance(), 15),
+        ('7 days, 07-22, 15 projects', generate_instance(seed=3, num_days=7, start_time='07:00', end_time='22:00', num_projects=15, max_blocks=7), 30),
+        ('7 days, 07-22, 15 projects, 15 min', generate_instance(seed=3, num_days=7, start_time='07:00', end_time='22:00', num_projects=15, max_blocks=7), 15),
+    ]
+
+# The timetable as create_timetable built it before, one cell at a time
+def create_timetable_by_cell(available_days, result, time_slots):
+    timetable = pd.DataFrame(index=time_slots.labels, columns=available_days)
+    for day, slots in result.items():
+        for slot, project_name in slots.items():
+            timetable.at[time_slots[slot], day] = project_name
+    return timetable
+
+# Best time in seconds over the repetitions, and the last value returned
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+def main():
+    parser = argparse.ArgumentParser(description='Solution extraction and timetable construction times.')
+    parser.add_argument('--engine', choices=ENGINES, default='interval')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--max-time', type=float, default=10.0, help='solver time limit, the boolean engine rarely proves optimality on big weeks')
+    args = parser.parse_args()
+    build_model = build_interval_model if args.engine == 'interval' else build_boolean_model
+
+    rows = []
+    for name, instance, slot_minutes in benchmark_instances():
+        available_days, start_time, end_time, projects, fixed_constraints = instance
+        time_slots = SlotGrid(start_time, end_time, slot_minutes)
+        model, extract_allocation = build_model(available_days, time_slots, projects, fixed_constraints)
+        solver = create_solver({'max_time': args.max_time})
+        status = solver.Solve(model)
+        if solver.StatusName(status) not in ('OPTIMAL', 'FEASIBLE'):
+            print(f"{name}: no solution within {args.max_time} seconds, skipped")
+            continue
+
+        per_value_time, per_value = best_time(lambda: list(extract_allocation(solver, bulk=False)), args.repeat)
+        bulk_time, bulk = best_time(lambda: extract_allocation(solver), args.repeat)
+        assert per_value == bulk
+
+        status, result = schedule_blocks(*instance, engine='interval', time_slots=time_slots)
+        by_cell_time, by_cell = best_time(lambda: create_timetable_by_cell(available_days, result, time_slots), args.repeat)
+        grid_time, grid = best_time(lambda: create_timetable(available_days, start_time, end_time, result, time_slots=time_slots), args.repeat)
+        assert grid.equals(by_cell)
+
+        rows.append({
+            'Instance': name,
+            'Variables': len(model.Proto().variables),
+            'Extract per value (ms)': per_value_time * 1000,
+            'Extract bulk (ms)': bulk_time * 1000,
+            'Timetable by cell (ms)': by_cell_time * 1000,
+            'Timetable grid (ms)': grid_time * 1000,
+        })
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.3f'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Benchmarks rolling-horizon planning (see horizon.py) on horizons of growing length: a generated week recurring every week,
+# with a one-off meeting on a random date of each week. Planning week by week should take about the same time per week
+# however long the horizon, and re-planning a week the time of one week.
+# Usage: python -m benchmarks.horizon [--engine interval|boolean] [--weeks 1 2 4 8 12] [--seed N] [--max-time S]
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from tabulate import tabulate
+from cache import ModelTemplateCache
+from horizon import horizon_inputs, plan_horizon, replan_week
+from project import ENGINES
+from benchmarks.instances import generate_instance
+
+# A horizon of num_weeks weeks from Monday 2 November 2026, with the generated week and a one-off meeting in each week
+def horizon_instance(num_weeks, seed=0):
+    rng = random.Random(seed)
+    available_days, start_time, end_time, projects, fixed_constraints = generate_instance(seed=seed)
+    start_date = date(2026, 11, 2)
+    dated_constraints = []
+    for week in range(num_weeks):
+        day = start_date + timedelta(weeks=week, days=rng.randrange(len(available_days)))
+        dated_constraints.append({'name': f'Workshop {week}', 'date': day.isoformat(), 'start_time': '09:00', 'end_time': '12:00'})
+    return horizon_inputs({'start_date': start_date.isoformat(), 'num_weeks': num_weeks, 'available_days': available_days, 'start_time': start_time,
+                           'end_time': end_time, 'projects': projects, 'fixed_constraints': fixed_constraints, 'dated_constraints': dated_constraints})
+
+def main():
+    parser = argparse.ArgumentParser(description='Planning time by horizon length, and the time to re-plan one week.')
+    parser.add_argument('--engine', choices=ENGINES, default='interval')
+    parser.add_argument('--weeks', type=int, nargs='+', default=[1, 2, 4, 8, 12])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-time', type=float, default=10.0)
+    args = parser.parse_args()
+
+    rows = []
+    for num_weeks in args.weeks:
+        inputs = horizon_instance(num_weeks, args.seed)
+        options = {'engine': args.engine, 'solver_params': {'max_time': args.max_time}, 'templates': ModelTemplateCache()}
+        start = time.perf_counter()
+        plan = plan_horizon(inputs, **options)
+        plan_time = time.perf_counter() - start
+        start = time.perf_counter()
+        replan_week(inputs, plan, num_weeks // 2, **options)
+        replan_time = time.perf_counter() - start
+        rows.append({
+            'Weeks': num_weeks,
+            'Plan (s)': plan_time,
+            'Per week (s)': plan_time / num_weeks,
+            'Re-plan one week (s)': replan_time,
+            'Optimal weeks': sum(week['status'] == 'OPTIMAL' for week in plan['weeks']),
+            'Unmet blocks': sum(unmet['blocks'] for unmet in plan['unmet'].values()),
+        })
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.3f'))
+
+if __name__ == '__main__':
+    main()
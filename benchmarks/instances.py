@@ -0,0 +1,72 @@
+import random
+from project import get_user_inputs
+from timeslots import time_to_minutes, minutes_to_time
+
+WEEK_DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# The week from get_user_inputs(hardcoded=True), used as the reference instance
+def hardcoded_instance():
+    return get_user_inputs(hardcoded=True)
+
+# Generates a random (but reproducible) week with the same shape as the hardcoded inputs:
+# a lunch break every day, some meetings covering about constraint_density of the window,
+# and projects of 0.5 to max_hours_per_block hours per block filling about load of the free time.
+def generate_instance(seed=0, num_days=5, start_time='08:00', end_time='18:00', num_projects=6,
+                      max_blocks=5, max_hours_per_block=2, constraint_density=0.1, load=0.8):
+    rng = random.Random(seed)
+    available_days = WEEK_DAYS[:num_days]
+    start = time_to_minutes(start_time)
+    end = time_to_minutes(end_time)
+    num_slots = (end - start) // 30
+
+    # Fixed constraints: a lunch break around midday and random meetings on a 30 min grid
+    fixed_constraints = []
+    busy = {day: set() for day in available_days}
+    lunch_slot = (13 * 60 - start) // 30
+    for day in available_days:
+        if 0 <= lunch_slot < num_slots - 1:
+            fixed_constraints.append({'name': 'Lunch break', 'day': day, 'start_time': minutes_to_time(start + lunch_slot * 30), 'end_time': minutes_to_time(start + lunch_slot * 30 + 30)})
+            busy[day].add(lunch_slot)
+
+    target_busy = int(constraint_density * num_days * num_slots)
+    attempts = 0
+    while sum(len(slots) for slots in busy.values()) < target_busy and attempts < 100 * num_days:
+        attempts += 1
+        day = rng.choice(available_days)
+        length = rng.randint(1, 6)
+        first = rng.randint(0, num_slots - 1 - length)  # Constraints can't end at the end of the window
+        slots = set(range(first, first + length))
+        if slots & busy[day]:
+            continue
+        busy[day] |= slots
+        fixed_constraints.append({'name': f'Meeting {len(fixed_constraints)}', 'day': day, 'start_time': minutes_to_time(start + first * 30), 'end_time': minutes_to_time(start + (first + length) * 30)})
+
+    # Projects: drop blocks until the demand fits in load of the free slots
+    projects = []
+    for project_idx in range(num_projects):
+        hours_per_block = rng.randint(1, int(max_hours_per_block * 2)) / 2
+        blocks_per_week = rng.randint(1, min(max_blocks, num_days))
+        projects.append({'name': f'Project {project_idx}', 'hours_per_block': hours_per_block, 'blocks_per_week': blocks_per_week})
+
+    free_slots = num_days * num_slots - sum(len(slots) for slots in busy.values())
+    while sum(p['blocks_per_week'] * p['hours_per_block'] * 2 for p in projects) > load * free_slots:
+        project = max(projects, key=lambda p: p['blocks_per_week'] * p['hours_per_block'])
+        if project['blocks_per_week'] == 1:
+            break
+        project['blocks_per_week'] -= 1
+
+    return available_days, start_time, end_time, projects, fixed_constraints
+
+# The form /generate expects for an instance (see app.parse_schedule_form), to benchmark the web app
+def schedule_form(instance, slot_minutes=30):
+    available_days, start_time, end_time, projects, fixed_constraints = instance
+    form = {'available_days': list(available_days), 'start_time': start_time, 'end_time': end_time, 'slot_minutes': str(slot_minutes),
+            'project_count': str(len(projects)), 'constraint_count': str(len(fixed_constraints))}
+    for i, project in enumerate(projects):
+        form[f'projects[{i}][name]'] = project['name']
+        form[f'projects[{i}][hours_per_block]'] = str(project['hours_per_block'])
+        form[f'projects[{i}][blocks_per_week]'] = str(project['blocks_per_week'])
+    for i, constraint in enumerate(fixed_constraints):
+        for field in ('name', 'day', 'start_time', 'end_time'):
+            form[f'constraints[{i}][{field}]'] = constraint[field]
+    return form
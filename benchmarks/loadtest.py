@@ -0,0 +1,342 @@
+# Load test of the web app: virtual users submit weeks to /generate and download some of the PDFs with /download_pdf,
+# in parallel, for a while. Reports the throughput, the p50/p95/p99 latencies and the error rate of each endpoint
+# (and of /generate by instance difficulty), and the resident memory of the server processes over time.
+# The weeks range from easy to near-infeasible (LEVELS), mixed with --mix. The app runs in this process with the Flask test client,
+# or is a server started with --serve (gunicorn, like in production) or already running at --url (with --server-pid for its memory).
+# --output writes the report as JSON with the commit it ran on, --compare shows the changes against an earlier report,
+# and --slo checks latency and error targets (the exit code is 1 when one is missed).
+# Usage: python -m benchmarks.loadtest [--url URL [--server-pid PID] | --serve [--workers N] [--threads N]] [--concurrency N]
+#                                      [--duration S | --requests N] [--mix easy=4 medium=3 hard=2 tight=1] [--download-rate R]
+#                                      [--output FILE] [--compare FILE] [--slo generate:p95=2000 download_pdf:p99=300 ...]
+# Timings depend on the machine and the server settings (SOLVER_MAX_TIME, SCHEDULER_ENGINE, ...): compare runs made with the same ones.
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+from tabulate import tabulate
+from benchmarks.instances import generate_instance, schedule_form
+
+# Difficulty levels of the submitted weeks, as parameters of generate_instance
+LEVELS = {
+    'easy': {'num_days': 3, 'start_time': '09:00', 'end_time': '17:00', 'num_projects': 3, 'max_blocks': 2, 'load': 0.5},
+    'medium': {},  # The shape of the hardcoded week
+    'hard': {'num_days': 7, 'start_time': '07:00', 'end_time': '22:00', 'num_projects': 12, 'max_blocks': 6},
+    'tight': {'constraint_density': 0.35, 'load': 1.0},  # The blocks fill the free time, some weeks are infeasible
+}
+
+# Metrics of an endpoint compared between reports, and whether lower is better
+COMPARED_METRICS = {'throughput': False, 'p50_ms': True, 'p95_ms': True, 'p99_ms': True, 'error_rate': True}
+
+# A virtual user of a server over HTTP, keeping its session cookie like a browser
+class HttpClient:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    # Returns the HTTP status and the body
+    def request(self, method, path, form=None):
+        data = urllib.parse.urlencode(form, doseq=True).encode('utf-8') if form is not None else None
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + path, data=data, method=method), timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+# A virtual user of the app in this process, with the Flask test client
+class AppClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None):
+        response = self.client.open(path, method=method, data=form)
+        return response.status_code, response.get_data()
+
+# Resident memory of a process in MB, None if it's gone (read from /proc, so only on Linux)
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+# A process and its descendants (the gunicorn master and its workers)
+def process_tree(pid):
+    pids = [pid]
+    for task in os.listdir(f'/proc/{pid}/task') if os.path.isdir(f'/proc/{pid}/task') else []:
+        try:
+            with open(f'/proc/{pid}/task/{task}/children') as file:
+                for child in file.read().split():
+                    pids += process_tree(int(child))
+        except OSError:
+            continue
+    return pids
+
+# Samples the resident memory of the server processes every interval seconds, until stopped
+class MemorySampler(threading.Thread):
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.started = time.perf_counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while True:
+            memory = {pid: rss_mb(pid) for pid in process_tree(self.pid)}
+            self.samples.append({'time': time.perf_counter() - self.started, 'rss_mb': {str(pid): mb for pid, mb in memory.items() if mb is not None}})
+            if self.stopped.wait(self.interval):
+                break
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+# Value at a percentile of some values (nearest rank)
+def percentile(values, q):
+    values = sorted(values)
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)] if values else None
+
+# Throughput, latencies and error rate of some requests ({'latency', 'error', ...}) over a run of elapsed seconds
+def summarize(requests, elapsed):
+    latencies = [request['latency'] * 1000 for request in requests]
+    return {
+        'requests': len(requests),
+        'throughput': len(requests) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': max(latencies, default=None),
+        'error_rate': sum(request['error'] for request in requests) / len(requests) if requests else 0.0,
+        'no_timetable': sum(request.get('no_timetable', False) for request in requests),
+    }
+
+# One virtual user: submits a week of a random level, then downloads its PDF with probability download_rate, until the run is over
+def virtual_user(client, weeks, mix, download_rate, seed, deadline, budget, records):
+    rng = random.Random(seed)
+    levels, weights = zip(*mix.items())
+    while time.perf_counter() < deadline and budget.acquire(blocking=False):
+        level = rng.choices(levels, weights)[0]
+        form = rng.choice(weeks[level])
+        started = time.perf_counter()
+        try:
+            status, body = client.request('POST', '/generate', form)
+        except Exception as e:
+            status, body = 0, str(e).encode('utf-8')
+        latency = time.perf_counter() - started
+        page = body.decode('utf-8', 'replace')
+        pdf_id = re.search(r'/download_pdf/([0-9a-f]{64})', page) if status == 200 else None
+        # Weeks without a timetable get the results page with an error: it's an answer, not a failure of the server
+        records.append({'endpoint': 'generate', 'level': level, 'status': status, 'latency': latency, 'time': started,
+                        'error': status != 200 or (pdf_id is None and 'alert-danger' not in page), 'no_timetable': status == 200 and pdf_id is None})
+
+        if pdf_id and rng.random() < download_rate:
+            started = time.perf_counter()
+            try:
+                status, body = client.request('GET', f'/download_pdf/{pdf_id.group(1)}?mode=download')
+            except Exception as e:
+                status, body = 0, b''
+            records.append({'endpoint': 'download_pdf', 'level': level, 'status': status, 'latency': time.perf_counter() - started, 'time': started,
+                            'error': status != 200 or not body.startswith(b'%PDF')})
+
+# Starts gunicorn on a free port, and waits for it to serve the index page. Returns the process and its URL.
+def start_server(workers, threads, timeout):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+               '--timeout', str(int(timeout)), 'app:app']
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(300):
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with code {server.returncode} (is gunicorn installed?)")
+        try:
+            urllib.request.urlopen(url + '/', timeout=1).read()
+            return server, url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("The server didn't start within 30 seconds")
+
+# Commit of the working tree, with '-dirty' if it has changes, so reports can be matched with the code
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Parses --mix (level=weight ...) and --slo (endpoint:metric=value ...)
+def parse_mix(values):
+    mix = {}
+    for value in values:
+        level, weight = value.split('=')
+        if level not in LEVELS:
+            raise argparse.ArgumentTypeError(f"Unknown level: {level}, expected one of {', '.join(LEVELS)}")
+        mix[level] = float(weight)
+    return mix
+
+def parse_slos(values):
+    slos = []
+    for value in values:
+        target, limit = value.split('=')
+        endpoint, metric = target.split(':')
+        slos.append((endpoint, metric, float(limit)))
+    return slos
+
+# Rows of the memory table: a few samples spread over the run, with the total and the largest process
+def memory_rows(samples, rows=10):
+    step = max(1, len(samples) // rows)
+    picked = samples[::step] + ([samples[-1]] if samples and (len(samples) - 1) % step else [])
+    return [{'Time (s)': sample['time'], 'Processes': len(sample['rss_mb']), 'Total RSS (MB)': sum(sample['rss_mb'].values()),
+             'Largest process (MB)': max(sample['rss_mb'].values(), default=0.0)} for sample in picked]
+
+# Changes of the compared metrics against an earlier report
+def comparison_rows(report, earlier):
+    rows = []
+    for endpoint, summary in report['endpoints'].items():
+        old = earlier['endpoints'].get(endpoint)
+        if old is None:
+            continue
+        for metric, lower_is_better in COMPARED_METRICS.items():
+            before, now = old.get(metric), summary.get(metric)
+            if before is None or now is None:
+                continue
+            change = (now - before) / before if before else None
+            better = change is not None and (change < 0) == lower_is_better and change != 0
+            rows.append({'Endpoint': endpoint, 'Metric': metric, 'Before': before, 'Now': now,
+                         'Change': f"{change:+.1%}" if change is not None else '', '': ('better' if better else 'worse') if change else ''})
+    for key in ('max_total_rss_mb', 'max_process_rss_mb'):
+        before, now = earlier['memory'].get(key), report['memory'].get(key)
+        if before and now:
+            rows.append({'Endpoint': 'server', 'Metric': key, 'Before': before, 'Now': now,
+                         'Change': f"{(now - before) / before:+.1%}", '': 'better' if now < before else 'worse' if now > before else ''})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test of /generate and /download_pdf, with latency percentiles and memory.')
+    parser.add_argument('--url', help='URL of a running server (by default the app runs in this process)')
+    parser.add_argument('--server-pid', type=int, help='PID of the running server, to sample its memory and the one of its workers')
+    parser.add_argument('--serve', action='store_true', help='start gunicorn for the test')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers with --serve')
+    parser.add_argument('--threads', type=int, default=1, help='threads of each gunicorn worker with --serve')
+    parser.add_argument('--concurrency', type=int, default=4, help='virtual users submitting weeks at the same time')
+    parser.add_argument('--duration', type=float, default=30.0, help='length of the run, in seconds')
+    parser.add_argument('--requests', type=int, help='stop after this many weeks submitted instead')
+    parser.add_argument('--mix', nargs='+', default=['easy=4', 'medium=3', 'hard=2', 'tight=1'], help='weights of the levels: level=weight')
+    parser.add_argument('--seeds', type=int, default=20, help='different weeks of each level (repeated weeks can hit the result cache)')
+    parser.add_argument('--download-rate', type=float, default=0.3, help='share of the timetables whose PDF is downloaded')
+    parser.add_argument('--warmup', type=int, default=1, help='weeks submitted before the run, so imports are not measured')
+    parser.add_argument('--timeout', type=float, default=120.0, help='timeout of each HTTP request, in seconds')
+    parser.add_argument('--sample-interval', type=float, default=1.0, help='seconds between memory samples')
+    parser.add_argument('--output', help='write the report to this JSON file')
+    parser.add_argument('--compare', help='an earlier JSON report to compare with')
+    parser.add_argument('--slo', nargs='+', default=[], help='targets: endpoint:metric=value, e.g. generate:p95_ms=2000 generate:error_rate=0.01')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    slos = parse_slos(args.slo)
+
+    server = None
+    if args.serve:
+        server, url = start_server(args.workers, args.threads, args.timeout)
+        server_pid = server.pid
+        make_client = lambda: HttpClient(url, args.timeout)
+    elif args.url:
+        server_pid = args.server_pid
+        make_client = lambda: HttpClient(args.url, args.timeout)
+    else:
+        from app import app
+        server_pid = os.getpid()
+        make_client = lambda: AppClient(app)
+
+    try:
+        weeks = {level: [schedule_form(generate_instance(seed=1000 + seed, **LEVELS[level])) for seed in range(args.seeds)] for level in mix}
+        warmup = make_client()
+        for level in list(mix)[:args.warmup]:
+            warmup.request('POST', '/generate', weeks[level][0])
+
+        sampler = MemorySampler(server_pid, args.sample_interval) if server_pid and os.path.isdir(f'/proc/{server_pid}') else None
+        if sampler:
+            sampler.start()
+        records = []
+        budget = threading.BoundedSemaphore(args.requests) if args.requests else threading.Semaphore(2**30)
+        started = time.perf_counter()
+        deadline = started + (args.duration if not args.requests else float('inf'))
+        users = [threading.Thread(target=virtual_user, args=(make_client(), weeks, mix, args.download_rate, seed, deadline, budget, records))
+                 for seed in range(args.concurrency)]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - started
+        if sampler:
+            sampler.stop()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    samples = sampler.samples if sampler else []
+    report = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'target': 'gunicorn' if args.serve else args.url or 'in-process',
+        'config': {'concurrency': args.concurrency, 'duration': elapsed, 'mix': mix, 'seeds': args.seeds, 'download_rate': args.download_rate,
+                   'workers': args.workers if args.serve else None, 'threads': args.threads if args.serve else None,
+                   'env': {name: os.environ[name] for name in ('SCHEDULER_ENGINE', 'SCHEDULER_OBJECTIVE', 'SOLVER_MAX_TIME', 'JOB_MODE') if name in os.environ}},
+        'machine': {'python': platform.python_version(), 'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'endpoints': {endpoint: summarize([record for record in records if record['endpoint'] == endpoint], elapsed) for endpoint in ('generate', 'download_pdf')},
+        'levels': {level: summarize([record for record in records if record['endpoint'] == 'generate' and record['level'] == level], elapsed) for level in mix},
+        'memory': {'samples': samples,
+                   'max_total_rss_mb': max((sum(sample['rss_mb'].values()) for sample in samples), default=None),
+                   'max_process_rss_mb': max((max(sample['rss_mb'].values(), default=0.0) for sample in samples), default=None)},
+    }
+
+    print(f"{report['target']} at {report['commit']}: {args.concurrency} users for {elapsed:.1f}s")
+    print(tabulate([dict(Endpoint=endpoint, **summary) for endpoint, summary in report['endpoints'].items()], headers='keys', tablefmt='grid', floatfmt='.3f'))
+    print(tabulate([dict(Level=level, **summary) for level, summary in report['levels'].items()], headers='keys', tablefmt='grid', floatfmt='.3f'))
+    if samples:
+        print(tabulate(memory_rows(samples), headers='keys', tablefmt='grid', floatfmt='.1f'))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            earlier = json.load(file)
+        print(f"\nAgainst {args.compare} ({earlier['commit']}, {earlier['target']}):")
+        print(tabulate(comparison_rows(report, earlier), headers='keys', tablefmt='grid', floatfmt='.3f'))
+
+    missed = []
+    for endpoint, metric, limit in slos:
+        value = (report['endpoints'].get(endpoint) or {}).get(metric)
+        if value is None or value > limit:
+            missed.append((endpoint, metric, limit, value))
+    if slos:
+        print(f"\nSLOs: {len(slos) - len(missed)} of {len(slos)} met.")
+        if missed:
+            print(tabulate(missed, headers=['Endpoint', 'Metric', 'Target', 'Measured'], tablefmt='grid', floatfmt='.3f'))
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
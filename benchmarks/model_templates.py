@@ -0,0 +1,41 @@
+# Benchmarks the model build of schedule_blocks with and without model templates (see cache.ModelTemplateCache):
+# building the model of each week from scratch, building the template of its shape on a miss, and cloning the template
+# and adding the fixed constraints of the week on a hit.
+# Usage: python -m benchmarks.model_templates [--engine interval|boolean] [--seeds N] [--repeat N]
+import argparse
+from tabulate import tabulate
+from project import ENGINES, build_boolean_model, build_interval_model, build_model_template, model_from_template, model_size
+from timeslots import SlotGrid
+from benchmarks.extraction import best_time
+from benchmarks.suite import suite_instances
+
+def main():
+    parser = argparse.ArgumentParser(description='Model build time from scratch against model templates.')
+    parser.add_argument('--engine', choices=ENGINES, default='boolean')
+    parser.add_argument('--seeds', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    build_model = build_interval_model if args.engine == 'interval' else build_boolean_model
+    rows = []
+    for name, instance in suite_instances(args.seeds):
+        available_days, start_time, end_time, projects, fixed_constraints = instance
+        time_slots = SlotGrid(start_time, end_time)
+
+        build_time, (model, extract_allocation) = best_time(lambda: build_model(available_days, time_slots, projects, fixed_constraints), args.repeat)
+        miss_time, template = best_time(lambda: build_model_template(args.engine, len(available_days), time_slots, projects), 1)
+        hit_time, (cloned, extract_allocation) = best_time(lambda: model_from_template(template, available_days, time_slots, projects, fixed_constraints), args.repeat)
+
+        rows.append({
+            'Instance': name,
+            'Variables': model_size(model)['variables'],
+            'Template variables': model_size(cloned)['variables'],
+            'Build (ms)': build_time * 1000,
+            'Template miss (ms)': (miss_time + hit_time) * 1000,
+            'Template hit (ms)': hit_time * 1000,
+            'Speedup': build_time / hit_time,
+        })
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.2f'))
+
+if __name__ == '__main__':
+    main()
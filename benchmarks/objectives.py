@@ -0,0 +1,44 @@
+# Benchmarks the time to prove optimality with each objective of schedule_blocks (see project.OBJECTIVES) on the suite's weeks,
+# and how spread out the blocks of the timetables are: the smallest gap in days between consecutive blocks of each project
+# (summed over the projects, the min_gap objective) and the days between the first and last blocks (what the separation objective adds up).
+# Usage: python -m benchmarks.objectives [--engine interval|boolean] [--seeds N] [--max-time S]
+import argparse
+from tabulate import tabulate
+from project import ENGINES, OBJECTIVES, schedule_blocks
+from benchmarks.suite import suite_instances
+
+# Sum of the smallest gap between the days of consecutive blocks of each project, and sum of the days between their first and last blocks
+def spread(available_days, projects, result):
+    min_gaps = 0
+    spans = 0
+    for project in projects:
+        days = [day_idx for day_idx, day in enumerate(available_days) if project['name'] in result.get(day, {}).values()]
+        if len(days) > 1:
+            min_gaps += min(later - earlier for earlier, later in zip(days, days[1:]))
+            spans += days[-1] - days[0]
+    return min_gaps, spans
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to optimality and spread of the blocks for each objective.')
+    parser.add_argument('--engine', choices=ENGINES, default='boolean')
+    parser.add_argument('--seeds', type=int, default=1)
+    parser.add_argument('--max-time', type=float, default=30.0)
+    args = parser.parse_args()
+
+    rows = []
+    for name, instance in suite_instances(args.seeds):
+        available_days, start_time, end_time, projects, fixed_constraints = instance
+        row = {'Instance': name}
+        for objective in OBJECTIVES:
+            status, result, stats = schedule_blocks(*instance, engine=args.engine, objective=objective, solver_params={'max_time': args.max_time},
+                                                    return_stats=True)
+            min_gaps, spans = spread(available_days, projects, result)
+            row[f'{objective} status'] = stats['status']
+            row[f'{objective} (s)'] = stats['wall_time']
+            row[f'{objective} min gaps'] = min_gaps
+            row[f'{objective} spans'] = spans
+        rows.append(row)
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.3f'))
+
+if __name__ == '__main__':
+    main()
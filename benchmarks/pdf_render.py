@@ -0,0 +1,83 @@
+# Benchmarks the PDF rendering: the old generate_pdf (a DataFrame walked with PDF.table_row, one cell per slot)
+# against render_pdf (merged block cells on cached page skeletons), on solved weeks.
+# Usage: python -m benchmarks.pdf_render [--repeat N]
+import argparse
+import time
+from io import StringIO
+import pandas as pd
+from tabulate import tabulate
+from pdf import PDF, generate_project_colors, render_pdf, page_skeletons
+from project import schedule_blocks, create_timetable
+from timeslots import SlotGrid
+from benchmarks.instances import hardcoded_instance, generate_instance
+
+def benchmark_instances():
+    return [
+        ('hardcoded, 30 min', hardcoded_instance(), 30),
+        ('hardcoded, 15 min', hardcoded_instance(), 15),
+        ('7 days, 07-22, 30 min', generate_instance(seed=3, num_days=7, start_time='07:00', end_time='22:00', num_projects=15, max_blocks=7), 30),
+    ]
+
+# The PDF as it was rendered before render_pdf: the timetable DataFrame with a time column, a table_row per slot
+def generate_pdf(timetable, time_slots, project_names):
+    pdf = PDF()
+    pdf.add_page()
+    timetable_with_times = pd.DataFrame({'Time': time_slots.labels}).join(timetable.fillna('').reset_index(drop=True))
+    project_colors = generate_project_colors(project_names)
+    headers = timetable_with_times.columns.tolist()
+    column_widths = [180 / len(headers)] * len(headers)
+    pdf.table_header(headers, column_widths)
+    for _, row in timetable_with_times.iterrows():
+        pdf.table_row(row, column_widths, project_colors)
+    return StringIO(pdf.output(dest="S"))
+
+# Best time in seconds over the repetitions, and the size of the last PDF in bytes
+def time_render(render, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pdf = render()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(pdf)
+
+def main():
+    parser = argparse.ArgumentParser(description='PDF render time and size, table_row loop against merged cells.')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    for name, instance, slot_minutes in benchmark_instances():
+        available_days, start_time, end_time, projects, fixed_constraints = instance
+        time_slots = SlotGrid(start_time, end_time, slot_minutes)
+        status, result = schedule_blocks(*instance, engine='interval', time_slots=time_slots)
+        names = [project['name'] for project in projects] + [constraint['name'] for constraint in fixed_constraints]
+
+        # The old path includes building the DataFrame and the string to bytes conversion done by the download
+        def render_table_rows():
+            timetable = create_timetable(available_days, start_time, end_time, result, time_slots=time_slots)
+            return generate_pdf(timetable, time_slots, names).getvalue().encode('latin1')
+
+        def render_cold():
+            page_skeletons.cache_clear()
+            return render_pdf(available_days, result, names, time_slots)
+
+        def render_warm():
+            return render_pdf(available_days, result, names, time_slots)
+
+        old_time, old_size = time_render(render_table_rows, args.repeat)
+        cold_time, new_size = time_render(render_cold, args.repeat)
+        warm_time, _ = time_render(render_warm, args.repeat)
+        rows.append({
+            'Instance': name,
+            'table_row (ms)': old_time * 1000,
+            'Merged, new skeleton (ms)': cold_time * 1000,
+            'Merged, cached skeleton (ms)': warm_time * 1000,
+            'Speedup': old_time / warm_time,
+            'table_row size (KB)': old_size / 1024,
+            'Merged size (KB)': new_size / 1024,
+        })
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.2f'))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# Solver benchmark suite: solves a set of generated weeks and records, for each one, the size of the model, the time to build it,
+# the solve time, the status and the peak memory of schedule_blocks. The results are written as JSON and compared with a baseline.
+# Usage: python -m benchmarks.suite [--engine interval|boolean] [--seeds N] [--max-time S] [--output FILE]
+#                                   [--baseline FILE] [--save-baseline] [--tolerance T]
+# The exit code is 1 when a regression is found, so it can run in CI. Timings depend on the machine: compare runs made on the same one.
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from tabulate import tabulate
+from benchmarks.instances import hardcoded_instance, generate_instance
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Shapes of the generated weeks: each one starts from the hardcoded week (5 days, 08:00 to 18:00, 6 projects, 10% of meetings)
+# and changes the days, the window, the number of projects, the blocks, their length or the density of the fixed constraints.
+SHAPES = {
+    'default': {},
+    'short week': {'num_days': 3, 'start_time': '09:00', 'end_time': '17:00', 'num_projects': 4, 'max_blocks': 3},
+    'long days': {'start_time': '07:00', 'end_time': '22:00'},
+    'many projects': {'num_projects': 12},
+    'many blocks': {'num_days': 7, 'max_blocks': 7},
+    'long blocks': {'max_hours_per_block': 4},
+    'empty calendar': {'constraint_density': 0.0},
+    'busy calendar': {'constraint_density': 0.35},
+    'full week': {'num_days': 7, 'start_time': '07:00', 'end_time': '22:00', 'num_projects': 15, 'max_blocks': 7},
+}
+
+def suite_instances(seeds=1):
+    instances = [('hardcoded', hardcoded_instance())]
+    for seed in range(seeds):
+        for shape, params in SHAPES.items():
+            instances.append((f'{shape} #{seed}', generate_instance(seed=seed, **params)))
+    return instances
+
+# Peak resident memory of this process in MB (ru_maxrss is in KB on Linux and in bytes on macOS)
+def peak_memory():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+# Runs in a fresh process for each instance, so the peak memory is the one of this solve
+def run_instance(instance, engine, max_time):
+    from project import schedule_blocks
+    before = peak_memory()
+    status, result, stats = schedule_blocks(*instance, engine=engine, solver_params={'max_time': max_time}, return_stats=True)
+    peak = peak_memory()
+    return {
+        'status': stats['status'],
+        'objective': stats['objective'],
+        'variables': stats['variables'],
+        'constraints': stats['constraints'],
+        'build_time': stats['build_time'],
+        'solve_time': stats['wall_time'],
+        'peak_memory_mb': peak,
+        'solve_memory_mb': peak - before,
+    }
+
+def run_suite(engine, seeds, max_time):
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    with ProcessPoolExecutor(max_workers=1, mp_context=context, max_tasks_per_child=1) as executor:
+        for name, instance in suite_instances(seeds):
+            results[name] = executor.submit(run_instance, instance, engine, max_time).result()
+            print(f"{name}: {results[name]['status']} in {results[name]['solve_time']:.3f}s", file=sys.stderr)
+    return results
+
+# Compares results with a baseline. Returns a list of (instance, metric, baseline value, value) for the regressions:
+# a solve that is no longer optimal, a worse objective, a bigger model, or times and memory over the tolerance.
+# Times under min_time seconds are too noisy to compare.
+def find_regressions(results, baseline, tolerance=0.5, min_time=0.05, min_memory=10.0):
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if old['status'] == 'OPTIMAL' and result['status'] != 'OPTIMAL':
+            regressions.append((name, 'status', old['status'], result['status']))
+        if old['objective'] is not None and (result['objective'] is None or result['objective'] < old['objective']):
+            regressions.append((name, 'objective', old['objective'], result['objective']))
+        for metric in ('variables', 'constraints'):
+            if result[metric] > old[metric]:
+                regressions.append((name, metric, old[metric], result[metric]))
+        for metric in ('build_time', 'solve_time'):
+            if result[metric] > max(old[metric] * (1 + tolerance), old[metric] + min_time):
+                regressions.append((name, metric, old[metric], result[metric]))
+        if result['solve_memory_mb'] > max(old['solve_memory_mb'] * (1 + tolerance), old['solve_memory_mb'] + min_memory):
+            regressions.append((name, 'solve_memory_mb', old['solve_memory_mb'], result['solve_memory_mb']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Solver benchmark suite with a baseline regression check.')
+    parser.add_argument('--engine', choices=('boolean', 'interval'), default='interval')
+    parser.add_argument('--seeds', type=int, default=1, help='generated weeks of each shape')
+    parser.add_argument('--max-time', type=float, default=60.0, help='solver time limit for each week, in seconds')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the baseline of this engine')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed relative increase of the times and memory')
+    args = parser.parse_args()
+
+    results = run_suite(args.engine, args.seeds, args.max_time)
+    rows = [dict(Instance=name, **result) for name, result in results.items()]
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.3f'))
+
+    report = {'engine': args.engine, 'seeds': args.seeds, 'max_time': args.max_time, 'python': platform.python_version(),
+              'machine': platform.machine(), 'cpus': os.cpu_count(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+    if args.save_baseline:
+        baselines[args.engine] = report
+        with open(args.baseline, 'w') as file:
+            json.dump(baselines, file, indent=2)
+        return 0
+
+    if args.engine not in baselines:
+        print(f"No {args.engine} baseline in {args.baseline}, run with --save-baseline to store one.")
+        return 0
+    regressions = find_regressions(results, baselines[args.engine]['results'], args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        print(tabulate(regressions, headers=['Instance', 'Metric', 'Baseline', 'Now'], tablefmt='grid', floatfmt='.3f'))
+        return 1
+    print("\nNo regressions against the baseline.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# Benchmarks the time to prove optimality with and without symmetry breaking between the blocks of a project, and the objective
+# reached. The solves stop at the time limit (--max-time, the web app's 20 s by default): the default boolean engine rarely
+# proves optimality, the objective then shows which search got further.
+# Usage: python -m benchmarks.symmetry [--engine boolean|interval] [--repeat N] [--max-time S]
+import argparse
+import time
+from tabulate import tabulate
+from project import schedule_blocks, ENGINES
+from benchmarks.instances import hardcoded_instance, generate_instance
+
+# Instances to benchmark: the hardcoded week plus larger generated weeks with many blocks per project
+def benchmark_instances():
+    return [
+        ('hardcoded', hardcoded_instance()),
+        ('5 days, 08-18, 10 projects', generate_instance(seed=1, num_days=5, num_projects=10)),
+        ('6 days, 08-20, 12 projects', generate_instance(seed=2, num_days=6, end_time='20:00', num_projects=12, max_blocks=6)),
+        ('7 days, 07-22, 15 projects', generate_instance(seed=3, num_days=7, start_time='07:00', end_time='22:00', num_projects=15, max_blocks=7)),
+    ]
+
+# Returns the status name, the best wall time in seconds over the repetitions and the best objective
+def time_solve(instance, engine, symmetry_breaking, repeat, max_time=None):
+    best = None
+    objective = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        status, result, solve_stats = schedule_blocks(*instance, engine=engine, symmetry_breaking=symmetry_breaking, return_stats=True,
+                                                      solver_params={'max_time': max_time})
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        if solve_stats['objective'] is not None:
+            objective = solve_stats['objective'] if objective is None else max(objective, solve_stats['objective'])
+    return status.name, best, objective
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to optimal with and without symmetry breaking.')
+    parser.add_argument('--engine', choices=ENGINES, default='boolean')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-time', type=float, default=20, help='time limit of each solve, in seconds')
+    args = parser.parse_args()
+
+    rows = []
+    for name, instance in benchmark_instances():
+        status, without_time, without_objective = time_solve(instance, args.engine, False, args.repeat, args.max_time)
+        status_sb, with_time, with_objective = time_solve(instance, args.engine, True, args.repeat, args.max_time)
+        rows.append({
+            'Instance': name,
+            'Blocks': sum(project['blocks_per_week'] for project in instance[3]),
+            'Status': status if status == status_sb else f'{status} / {status_sb}',
+            'Without (s)': without_time,
+            'With (s)': with_time,
+            'Speedup': f'{without_time / with_time:.1f}x',
+            'Objective without': without_objective,
+            'Objective with': with_objective,
+        })
+
+    limit = f", {args.max_time:g}s limit" if args.max_time else ''
+    print(f"\nTime to optimal, engine '{args.engine}', best of {args.repeat}{limit}:")
+    print(tabulate(rows, headers="keys", floatfmt=".3f", tablefmt='rounded_grid', stralign="center", numalign="center"))
+
+if __name__ == "__main__":
+    main()
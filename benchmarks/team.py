@@ -0,0 +1,51 @@
+# Benchmarks team scheduling on generated teams of growing size, to check the time grows about linearly with the people.
+# Every team has an all-hands meeting, a sync per group of four and a one-on-one per pair of people.
+# Usage: python -m benchmarks.team [--sizes 2 4 8 16 32] [--workers N] [--engine interval|boolean]
+import argparse
+import time
+from tabulate import tabulate
+from project import ENGINES
+from team import schedule_team, team_executor
+from benchmarks.instances import generate_instance
+
+def generate_team(size, seed=0):
+    people = {}
+    for person in range(size):
+        # Lighter weeks than a single person's benchmark, to leave room for the shared events
+        people[f'Person {person}'] = generate_instance(seed=seed * 1000 + person, num_projects=4, load=0.6)
+    names = list(people)
+    shared_events = [{'name': 'All hands', 'participants': names, 'hours': 1}]
+    for group in range(0, size, 4):
+        shared_events.append({'name': f'Sync {group // 4}', 'participants': names[group:group + 4], 'hours': 1.5})
+    for pair in range(0, size - 1, 2):
+        shared_events.append({'name': f'One-on-one {pair // 2}', 'participants': names[pair:pair + 2], 'hours': 0.5})
+    return people, shared_events
+
+def main():
+    parser = argparse.ArgumentParser(description='Team scheduling time by team size.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2, 4, 8, 16, 32])
+    parser.add_argument('--workers', type=int, default=None, help='processes of the pool (default: one per CPU)')
+    parser.add_argument('--engine', choices=ENGINES, default='interval')
+    args = parser.parse_args()
+
+    rows = []
+    with team_executor(args.workers) as executor:
+        # Start the pool processes before timing
+        schedule_team(*generate_team(2, seed=999), engine=args.engine, executor=executor)
+        for size in args.sizes:
+            people, shared_events = generate_team(size)
+            started = time.perf_counter()
+            outcome = schedule_team(people, shared_events, engine=args.engine, executor=executor)
+            elapsed = time.perf_counter() - started
+            rows.append({
+                'People': size,
+                'Shared events': len(shared_events),
+                'Rounds': outcome.get('rounds'),
+                'Complete': outcome.get('complete', outcome['error']),
+                'Time (s)': elapsed,
+                'Time per person (ms)': elapsed / size * 1000,
+            })
+    print(tabulate(rows, headers='keys', tablefmt='grid', floatfmt='.3f'))
+
+if __name__ == '__main__':
+    main()
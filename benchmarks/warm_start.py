@@ -0,0 +1,74 @@
+# Benchmarks warm starts on edit sequences: after each edit the week is solved cold and with the previous
+# result as hint, measuring the time to the first feasible solution, the time to optimal (or to the time limit) and the objective.
+# Usage: python -m benchmarks.warm_start [--engine interval|boolean] [--max-time SECONDS]
+import argparse
+import copy
+from tabulate import tabulate
+from project import schedule_blocks, ENGINES
+from benchmarks.instances import hardcoded_instance, generate_instance
+
+# Typical edits between two generations: one fixed constraint added, one project changed, added or removed
+def edit_sequence(instance):
+    available_days, start_time, end_time, projects, fixed_constraints = instance
+    edits = []
+
+    def add_meeting(projects, fixed_constraints):
+        fixed_constraints.append({'name': 'New meeting', 'day': available_days[0], 'start_time': '10:00', 'end_time': '11:00'})
+    edits.append(('add fixed constraint', add_meeting))
+
+    def change_hours(projects, fixed_constraints):
+        projects[0]['hours_per_block'] = projects[0]['hours_per_block'] - 0.5 if projects[0]['hours_per_block'] > 0.5 else 1
+    edits.append(('change hours per block', change_hours))
+
+    def add_project(projects, fixed_constraints):
+        projects.append({'name': 'New project', 'hours_per_block': 0.5, 'blocks_per_week': 2})
+    edits.append(('add project', add_project))
+
+    def remove_project(projects, fixed_constraints):
+        projects.pop(1)
+    edits.append(('remove project', remove_project))
+
+    return edits
+
+def solve(instance, engine, max_time, hint=None):
+    status, result, solve_stats = schedule_blocks(*instance, engine=engine, return_stats=True, hint=hint, solver_params={'random_seed': 0, 'max_time': max_time})
+    return result, solve_stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to first feasible and to optimal, cold vs. warm started.')
+    parser.add_argument('--engine', choices=ENGINES, default='interval')
+    # The boolean engine rarely proves the optimum of these weeks, the default is the web app's SOLVER_MAX_TIME
+    parser.add_argument('--max-time', type=float, default=20, help='time limit of each solve, in seconds')
+    args = parser.parse_args()
+
+    instances = [
+        ('hardcoded', hardcoded_instance()),
+        ('6 days, 08-20, 12 projects', generate_instance(seed=2, num_days=6, end_time='20:00', num_projects=12, max_blocks=6)),
+    ]
+
+    rows = []
+    for name, instance in instances:
+        available_days, start_time, end_time, projects, fixed_constraints = copy.deepcopy(instance)
+        previous_result, _ = solve(instance, args.engine, args.max_time)
+        for edit_name, edit in edit_sequence(instance):
+            edit(projects, fixed_constraints)
+            edited = (available_days, start_time, end_time, projects, fixed_constraints)
+            _, cold = solve(edited, args.engine, args.max_time)
+            previous_result, warm = solve(edited, args.engine, args.max_time, hint=previous_result)
+            rows.append({
+                'Instance': name,
+                'Edit': edit_name,
+                'Status': warm['status'],
+                'First cold (s)': cold['first_solution_time'],
+                'First warm (s)': warm['first_solution_time'],
+                'Optimal cold (s)': cold['wall_time'],
+                'Optimal warm (s)': warm['wall_time'],
+                'Objective cold': cold['objective'],
+                'Objective warm': warm['objective'],
+            })
+
+    print(f"\nWarm start on edit sequences, engine '{args.engine}', time limit {args.max_time:g} s:")
+    print(tabulate(rows, headers="keys", floatfmt=".3f", tablefmt='rounded_grid', stralign="center", numalign="center"))
+
+if __name__ == "__main__":
+    main()
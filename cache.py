@@ -0,0 +1,257 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Statuses worth caching: the same inputs will get the same answer again. A FEASIBLE answer is the best one found within
+# the time limit, and the key holds the solver parameters: solving again under the same budget would spend all of it
+# for about the same answer (with the default boolean engine and time limit, most weeks end FEASIBLE).
+CACHEABLE_STATUSES = ('OPTIMAL', 'FEASIBLE', 'INFEASIBLE')
+
+# Canonical hash of a scheduling request. Projects and fixed constraints are sorted, so the same week
+# entered in a different order gets the same key. The days keep their order, since it's the order of the week.
+# options holds everything else that changes the answer (engine, solver parameters, ...).
+def canonical_key(available_days, start_time, end_time, projects, fixed_constraints, **options):
+    # Only the granularity of the slot grid matters, the rest comes from start_time and end_time
+    time_slots = options.pop('time_slots', None)
+    options['slot_minutes'] = time_slots.slot_minutes if time_slots is not None else 30
+    payload = {
+        'available_days': list(available_days),
+        'start_time': start_time,
+        'end_time': end_time,
+        'projects': sorted([project['name'], float(project['hours_per_block']), int(project['blocks_per_week']), int(project.get('weight', 1))] for project in projects),
+        'fixed_constraints': sorted([constraint['day'], constraint['start_time'], constraint['end_time'], constraint['name']] for constraint in fixed_constraints),
+        'options': options,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+# Cache of (status, result, solve_stats) for schedule_blocks, the result being a Schedule or a dict.
+# The first tier is an in-memory LRU limited to max_size entries, each one living ttl seconds.
+# If a directory is given, entries are also stored there as JSON files, so gunicorn workers share them.
+class ResultCache:
+    # The disk tier is trimmed to max_disk_entries every eviction_interval writes (1/16 of max_disk_entries by default),
+    # so it can go over by that much in between, instead of listing the directory on every write.
+    def __init__(self, max_size=256, ttl=3600, directory=None, max_disk_entries=4096, eviction_interval=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.eviction_interval = eviction_interval or max(1, max_disk_entries // 16)
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # The value of key, None on a miss
+    def get(self, key):
+        value = self._lookup(key)
+        with self._lock:
+            self.hits += value is not None
+            self.misses += value is None
+        return value
+
+    # Same as get, without counting a hit or a miss (used to look up previous schedules)
+    def peek(self, key):
+        return self._lookup(key)
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    return copy_value(value)
+                del self._entries[key]
+
+        entry = self._read_disk(key, now)
+        if entry is None:
+            return None
+        with self._lock:
+            self._store_memory(key, entry)
+        return copy_value(entry[1])
+
+    def set(self, key, value):
+        entry = (time.time() + self.ttl, copy_value(value))
+        with self._lock:
+            self._store_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.directory:
+            for filename in os.listdir(self.directory):
+                if filename.endswith('.json'):
+                    remove_file(os.path.join(self.directory, filename))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
+
+    # Must be called with the lock held
+    def _store_memory(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def _read_disk(self, key, now):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if data['expires_at'] <= now:
+            remove_file(self._path(key))
+            return None
+        from ortools.sat.python import cp_model
+        from schedule import Schedule
+        if 'schedule' in data:
+            result = Schedule.from_dict(data['schedule'])
+        else:
+            # JSON turns the slot numbers into strings
+            result = {day: {int(slot): name for slot, name in slots.items()} for day, slots in data['result'].items()}
+        return data['expires_at'], (cp_model.CpSolverStatus(data['status']), result, data['solve_stats'])
+
+    def _write_disk(self, key, entry):
+        if not self.directory:
+            return
+        expires_at, (status, result, solve_stats) = entry
+        data = {'expires_at': expires_at, 'status': int(status), 'solve_stats': solve_stats}
+        # Schedules are stored in their compact form
+        if isinstance(result, dict):
+            data['result'] = result
+        else:
+            data['schedule'] = result.to_dict()
+        # Write to a temporary file and rename it, so other workers never read a partial entry
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temp_path, self._path(key))
+        self._evict_disk()
+
+    # Removes the least recently written files over max_disk_entries, every eviction_interval writes
+    def _evict_disk(self):
+        with self._lock:
+            self._disk_writes += 1
+            if self._disk_writes < self.eviction_interval:
+                return
+            self._disk_writes = 0
+        paths = [os.path.join(self.directory, filename) for filename in os.listdir(self.directory) if filename.endswith('.json')]
+        if len(paths) <= self.max_disk_entries:
+            return
+        paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            remove_file(path)
+
+# LRU of model templates (see project.build_model_template), keyed on the week shape of the requests (project.template_key).
+# Templates are only cloned, never changed, so the threads of a worker share them. They hold a CP-SAT model, which
+# can't be shared with other processes: each pool process has its own cache (see jobs.run_schedule_job).
+class ModelTemplateCache:
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    # The template of key, built with build() on a miss
+    def get(self, key, build):
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                self.hits += 1
+                return template
+            self.misses += 1
+        # Built outside the lock, so other shapes aren't held up. Two requests missing the same shape both build it.
+        template = build()
+        with self._lock:
+            self._templates[key] = template
+            self._templates.move_to_end(key)
+            while len(self._templates) > self.max_size:
+                self._templates.popitem(last=False)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._templates),
+                'max_size': self.max_size,
+            }
+
+# Copies a cached (status, result, solve_stats), so callers can't change the cached entry.
+# Schedules are read-only, they are shared.
+def copy_value(value):
+    status, result, solve_stats = value
+    if isinstance(result, dict):
+        result = {day: dict(slots) for day, slots in result.items()}
+    return status, result, dict(solve_stats)
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# Same as schedule_blocks(..., return_stats=True), looking up the cache first. The solved weeks are cached as Schedules.
+# Cache hits skip model building and solving entirely; solve_stats['cache'] tells if it was a 'hit' or a 'miss',
+# and solve_stats['schedule_id'] is the cache key, to find this result again (for instance as the hint of the next solve).
+# A cancelled solve isn't cached, its result may be worse than the full solve.
+def cached_schedule_blocks(cache, available_days, start_time, end_time, projects, fixed_constraints, hint=None, on_solution=None, cancel=None, **options):
+    # Imported here, so the cache can be created without loading the solver
+    from project import schedule_blocks
+    from schedule import Schedule, as_result
+    from timeslots import SlotGrid
+    options.pop('return_stats', None)
+    as_schedule = options.pop('as_schedule', False)
+    # The hint only speeds up the search, the templates only speed up the build and the callbacks only follow the search,
+    # they aren't part of the key
+    templates = options.pop('templates', None)
+    key = canonical_key(available_days, start_time, end_time, projects, fixed_constraints, **options)
+    cached = cache.get(key)
+    if cached is not None:
+        status, result, solve_stats = cached
+        solve_stats.update(cache='hit', schedule_id=key)
+        if as_schedule:
+            time_slots = options.get('time_slots')
+            if time_slots is None:
+                time_slots = SlotGrid(start_time, end_time)
+            return status, Schedule.of(result, available_days, len(time_slots)), solve_stats
+        return status, as_result(result), solve_stats
+
+    status, schedule, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, return_stats=True, hint=hint,
+                                                    on_solution=on_solution, cancel=cancel, as_schedule=True, templates=templates, **options)
+    if status.name in CACHEABLE_STATUSES and not solve_stats['cancelled']:
+        cache.set(key, (status, schedule, solve_stats))
+    solve_stats = dict(solve_stats, cache='miss', schedule_id=key)
+    return status, schedule if as_schedule else schedule.to_result(), solve_stats
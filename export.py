@@ -0,0 +1,168 @@
+from datetime import date, datetime, timedelta, timezone
+import csv
+import io
+import json
+from schedule import Schedule
+from timeslots import SlotGrid, minutes_to_time
+
+# Exports of solved weeks that calendars and spreadsheets can read: iCalendar, CSV and compact JSON.
+# They read the blocks of the timetable (one per run of slots, see Schedule.runs), without pandas or the PDF, and are
+# generators of text chunks: a batch of weeks is exported one week at a time, so the memory doesn't grow with the batch.
+# A week is a dict with the 'available_days', the 'result' of schedule_blocks (a dict or a Schedule), the 'time_slots'
+# it was solved on and an optional 'id'. Weeks with an 'error' instead (failed items of a batch) have no blocks.
+
+WEEK_DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# The stored form of a solved week, with everything the exports and the PDF need: the days, the slot grid, the names of the
+# projects and constraints (their order sets the colors of the PDF) and the compact schedule. It's JSON-friendly.
+def schedule_document(available_days, result, names, time_slots):
+    return {
+        'available_days': list(available_days),
+        'start_time': time_slots.start_time,
+        'end_time': time_slots.end_time,
+        'slot_minutes': time_slots.slot_minutes,
+        'names': list(names),
+        'schedule': Schedule.of(result, available_days, len(time_slots)).to_dict(),
+    }
+
+# The week of a schedule document, as the exports read it
+def document_week(document, week_id=None):
+    return {
+        'id': week_id,
+        'available_days': document['available_days'],
+        'result': Schedule.from_dict(document['schedule']),
+        'time_slots': SlotGrid(document['start_time'], document['end_time'], document['slot_minutes']),
+    }
+
+# Id of a week in the exports, its index in the batch when it has none
+def export_id(week, index):
+    return week['id'] if week.get('id') is not None else index
+
+# Blocks of a week, day by day: (day, start time, end time, name), with a block per run of slots of the same name
+def week_blocks(week):
+    if week.get('error') or week.get('result') is None:
+        return
+    time_slots = week['time_slots']
+    schedule = Schedule.of(week['result'], week['available_days'], len(time_slots))
+    for day in week['available_days']:
+        for first_slot, length, name in schedule.runs(day):
+            yield (day, minutes_to_time(time_slots.start + first_slot * time_slots.slot_minutes),
+                   minutes_to_time(time_slots.start + (first_slot + length) * time_slots.slot_minutes), name)
+
+# Date of a day of a week: dates (YYYY-MM-DD, as in the weeks of horizon.py) are their own, week days are in the week
+# starting on week_start. None for other day names.
+def day_date(day, week_start):
+    if day in WEEK_DAYS:
+        return week_start + timedelta(days=(WEEK_DAYS.index(day) - week_start.weekday()) % 7)
+    try:
+        return date.fromisoformat(day)
+    except ValueError:
+        return None
+
+# Monday of the coming week, where the week days of a timetable land in the calendar by default
+def next_monday(today=None):
+    today = today or date.today()
+    return today + timedelta(days=7 - today.weekday())
+
+# Escapes a TEXT value of iCalendar (RFC 5545, 3.3.11)
+def ical_text(text):
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+# A content line of iCalendar, folded to 75 octets per line
+def ical_line(line):
+    # Most lines are short ASCII, only the long ones are walked octet by octet
+    if len(line) <= 75 and (line.isascii() or len(line.encode('utf-8')) <= 75):
+        return line + '\r\n'
+    chunks = []
+    current = ''
+    size = 0
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > 75:
+            chunks.append(current)
+            current = ' '
+            size = 1
+        current += char
+        size += char_size
+    chunks.append(current)
+    return '\r\n'.join(chunks) + '\r\n'
+
+# Most weeks the events of week days can repeat for
+MAX_REPEAT_WEEKS = 52
+
+# iCalendar of some weeks: a VEVENT per block. The events of week days are on the week starting on week_start (the coming Monday
+# by default), and repeat for repeat_weeks weeks in all (RRULE with a COUNT, never forever); the ones of dated days happen once.
+# Days that are neither are left out. The times are floating (no TZID): a block at 09:00 is at 09:00 in the calendar's own time zone,
+# which is what a timetable means, and needs no VTIMEZONE.
+def ical_chunks(weeks, week_start=None, repeat_weeks=1):
+    if not 1 <= repeat_weeks <= MAX_REPEAT_WEEKS:
+        raise ValueError(f"The events can repeat for 1 to {MAX_REPEAT_WEEKS} weeks, not {repeat_weeks}")
+    week_start = week_start or next_monday()
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    yield ''.join(ical_line(line) for line in ('BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//timeblocking//timetable//EN', 'CALSCALE:GREGORIAN'))
+    for index, week in enumerate(weeks):
+        lines = []
+        for day, start_time, end_time, name in week_blocks(week):
+            day_of_event = day_date(day, week_start)
+            if day_of_event is None:
+                continue
+            lines += ['BEGIN:VEVENT',
+                      f"UID:{ical_text(export_id(week, index))}-{day_of_event:%Y%m%d}-{start_time.replace(':', '')}@timeblocking",
+                      f'DTSTAMP:{stamp}',
+                      f"DTSTART:{day_of_event:%Y%m%d}T{start_time.replace(':', '')}00",
+                      f"DTEND:{day_of_event:%Y%m%d}T{end_time.replace(':', '')}00"]
+            if day in WEEK_DAYS and repeat_weeks > 1:
+                lines.append(f'RRULE:FREQ=WEEKLY;COUNT={repeat_weeks}')
+            lines += [f'SUMMARY:{ical_text(name)}', 'END:VEVENT']
+        yield ''.join(ical_line(line) for line in lines)
+    yield ical_line('END:VCALENDAR')
+
+# CSV of some weeks: a row per block, with the id of its week (its index in the batch when it has none)
+def csv_chunks(weeks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['id', 'day', 'start_time', 'end_time', 'name'])
+    for index, week in enumerate(weeks):
+        for block in week_blocks(week):
+            writer.writerow([export_id(week, index), *block])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+# Compact JSON of some weeks: a list with each week's id, days, slot grid and blocks as [day, start time, end time, name]
+# (or its error)
+def json_chunks(weeks):
+    yield '['
+    for index, week in enumerate(weeks):
+        if week.get('error'):
+            data = {'id': export_id(week, index), 'error': week['error']}
+        else:
+            time_slots = week['time_slots']
+            data = {'id': export_id(week, index), 'days': list(week['available_days']), 'start_time': time_slots.start_time, 'end_time': time_slots.end_time,
+                    'slot_minutes': time_slots.slot_minutes, 'blocks': [list(block) for block in week_blocks(week)]}
+        yield (',' if index else '') + json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    yield ']'
+
+# Media types of the export formats, by file extension
+EXPORT_FORMATS = {'ics': 'text/calendar', 'csv': 'text/csv', 'json': 'application/json'}
+
+# Chunks of the export of some weeks in a format of EXPORT_FORMATS (week_start and repeat_weeks are only used by iCalendar)
+def export_chunks(export_format, weeks, week_start=None, repeat_weeks=1):
+    if export_format == 'ics':
+        return ical_chunks(weeks, week_start, repeat_weeks)
+    if export_format == 'csv':
+        return csv_chunks(weeks)
+    if export_format == 'json':
+        return json_chunks(weeks)
+    raise ValueError(f"Unknown export format: {export_format}")
+
+# The weeks of the lines of a batch (see jobs.BatchRunner.run), read with the days and slot grid of their items
+def batch_weeks(items, lines):
+    from jobs import schedule_inputs
+    for line in lines:
+        if line['error']:
+            yield {'id': export_id(line, line['index']), 'error': line['error']}
+            continue
+        (available_days, start_time, end_time, projects, fixed_constraints), slot_minutes = schedule_inputs(items[line['index']])
+        yield {'id': export_id(line, line['index']), 'available_days': available_days, 'result': line['result'], 'time_slots': SlotGrid(start_time, end_time, slot_minutes)}
@@ -0,0 +1,209 @@
+from datetime import date, timedelta
+from jobs import schedule_inputs
+from timeslots import SlotGrid
+
+# Rolling-horizon planning: several weeks ahead, with a target for each week and one-off constraints on dates.
+#
+# A single model for the whole horizon grows too fast, so the weeks are planned one after the other with schedule_blocks,
+# each one with the dates of its available days as day names (so a one-off constraint is simply a fixed constraint on its date):
+# - The demand of a week is its target for each project, plus the blocks the weeks before couldn't fit (carried forward).
+# - The demand is trimmed to what the week can take, as check_feasibility finds it, then one block at a time while the solver
+#   proves there is no timetable (INFEASIBLE). The blocks that were dropped are carried forward to the next week.
+# - A week the solver runs out of time on (UNKNOWN), or still has no timetable after MAX_WEEK_SOLVES solves, is left unsolved:
+#   all its demand is carried forward, and it's in the 'unsolved_weeks' of the plan.
+# - The blocks placed in a week are kept: the next weeks only see what it carried forward.
+# Each week is at most MAX_WEEK_SOLVES bounded solves, and usually one, so the time grows linearly with the number of weeks.
+# A week can be planned again with replan_week, from what was carried into it, without solving the others.
+
+WEEK_DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Longest horizon, in weeks
+MAX_WEEKS = 52
+
+# Most solves of a week, trimming a block after each infeasible one
+MAX_WEEK_SOLVES = 5
+
+# Reasons of check_feasibility that come from the demand of a week, and go away by scheduling fewer blocks
+DEMAND_REASONS = ('too_many_blocks', 'block_too_long', 'not_enough_days', 'insufficient_capacity', 'insufficient_day_capacity')
+
+# Reads a horizon from JSON: the 'start_date' of the first week (YYYY-MM-DD), the number of weeks ('num_weeks') and the fields
+# of a week as read by jobs.schedule_inputs, with week day names. The fixed constraints recur every week, the 'dated_constraints'
+# have a 'date' instead of a day. A project can have a target for each week in 'weekly_blocks', blocks_per_week is the target
+# of the weeks it doesn't cover. Returns the inputs of plan_horizon, raises a ValueError if the horizon is malformed.
+def horizon_inputs(data):
+    (available_days, start_time, end_time, projects, fixed_constraints), slot_minutes = schedule_inputs(data)
+    try:
+        start_date = date.fromisoformat(str(data['start_date']))
+        num_weeks = int(data['num_weeks'])
+        for project, project_data in zip(projects, data['projects']):
+            if 'weekly_blocks' in project_data:
+                project['weekly_blocks'] = [int(blocks) for blocks in project_data['weekly_blocks']]
+        dated_constraints = [{'name': str(constraint['name']), 'date': date.fromisoformat(str(constraint['date'])),
+                              'start_time': str(constraint['start_time']), 'end_time': str(constraint['end_time'])}
+                             for constraint in data.get('dated_constraints', [])]
+        time_slots = SlotGrid(start_time, end_time, slot_minutes)
+    except KeyError as e:
+        raise ValueError(f"Missing field: {e.args[0]}")
+    except (TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"Invalid horizon: {e}")
+
+    if not 1 <= num_weeks <= MAX_WEEKS:
+        raise ValueError(f"The horizon must be 1 to {MAX_WEEKS} weeks, not {num_weeks}")
+    unknown = [day for day in available_days if day not in WEEK_DAYS]
+    if unknown:
+        raise ValueError(f"Unknown week days: {', '.join(unknown)}")
+    # The problems of the inputs themselves are found once here, so planning a week only has to deal with its demand
+    for project in projects:
+        if time_slots.duration_slots(project['hours_per_block']) <= 0 or not time_slots.fits_grid(project['hours_per_block']):
+            raise ValueError(f"Blocks of {project['hours_per_block']} hours for '{project['name']}' are not a whole number of {slot_minutes} min slots")
+    for constraint in fixed_constraints + dated_constraints:
+        if constraint.get('day', available_days[0] if available_days else None) not in available_days:
+            raise ValueError(f"Fixed constraint '{constraint['name']}' is on {constraint['day']}, which is not an available day")
+        try:
+            if time_slots.slot(constraint['start_time']) >= time_slots.slot(constraint['end_time']):
+                raise KeyError(constraint['end_time'])
+        except KeyError:
+            raise ValueError(f"Constraint '{constraint['name']}' ({constraint['start_time']} to {constraint['end_time']}) "
+                             f"falls outside the available time ({start_time} to {end_time}) or the {slot_minutes} min grid")
+
+    return {'start_date': start_date, 'num_weeks': num_weeks, 'available_days': available_days, 'start_time': start_time, 'end_time': end_time,
+            'projects': projects, 'fixed_constraints': fixed_constraints, 'dated_constraints': dated_constraints, 'slot_minutes': slot_minutes}
+
+# Dates of the available days of a week (week 0 starts on the start date)
+def week_dates(inputs, week):
+    first = inputs['start_date'] + timedelta(weeks=week)
+    dates = [first + timedelta(days=offset) for offset in range(7)]
+    return [day for day in dates if WEEK_DAYS[day.weekday()] in inputs['available_days']]
+
+# Fixed constraints of a week, on the dates of its days: the recurring ones on every date of their week day, and the dated ones
+def week_constraints(inputs, dates):
+    date_of_day = {WEEK_DAYS[day.weekday()]: day.isoformat() for day in dates}
+    constraints = [dict(constraint, day=date_of_day[constraint['day']]) for constraint in inputs['fixed_constraints']]
+    constraints += [{'name': constraint['name'], 'day': constraint['date'].isoformat(), 'start_time': constraint['start_time'], 'end_time': constraint['end_time']}
+                    for constraint in inputs['dated_constraints'] if constraint['date'] in dates]
+    return constraints
+
+# Target number of blocks of each project in a week
+def week_targets(inputs, week):
+    return {project['name']: project['weekly_blocks'][week] if week < len(project.get('weekly_blocks', [])) else project['blocks_per_week']
+            for project in inputs['projects']}
+
+# Drops what a week can't take from its demand ({name: blocks}). When check_feasibility found that a project can't have that many
+# blocks in the week, it gets as many as the week can take. Otherwise (not enough free time overall, or no timetable found),
+# one block is dropped from the project with the most hours to schedule.
+def trim_demand(demand, projects, problem):
+    reason = problem['reason'] if problem else None
+    if reason == 'too_many_blocks':
+        demand[problem['project']] = problem['available_days']
+    elif reason == 'not_enough_days':
+        demand[problem['project']] = len(problem['fitting_days'])
+    elif reason == 'block_too_long':
+        demand[problem['project']] = 0
+    else:
+        project = max((project for project in projects if demand[project['name']] > 0), key=lambda project: demand[project['name']] * project['hours_per_block'])
+        demand[project['name']] -= 1
+
+# Plans one week: its target plus the blocks carried into it ({name: blocks}), trimmed until it can be scheduled.
+# hint is a previous timetable of the week, to warm start the solver. options are passed on to schedule_blocks.
+# Returns the week: its 'days', 'targets', the blocks 'carried_in', 'scheduled' and 'carried_out', whether it was 'solved', the number
+# of 'solves', the solver 'status' and 'solve_stats' of the last one (None when there was nothing to schedule) and the timetable
+# in 'result' ({date: {slot: name}}).
+def plan_week(inputs, week, carried_in, hint=None, **options):
+    from ortools.sat.python import cp_model
+    from project import schedule_blocks, check_feasibility, get_project_statistics
+
+    time_slots = SlotGrid(inputs['start_time'], inputs['end_time'], inputs['slot_minutes'])
+    dates = week_dates(inputs, week)
+    days = [day.isoformat() for day in dates]
+    constraints = week_constraints(inputs, dates)
+    targets = week_targets(inputs, week)
+    wanted = {name: blocks + carried_in.get(name, 0) for name, blocks in targets.items()}
+
+    demand = dict(wanted)
+    result = {}
+    solve_stats = None
+    solves = 0
+    solved = True
+    while any(demand.values()):
+        week_projects = [dict(project, blocks_per_week=demand[project['name']]) for project in inputs['projects'] if demand[project['name']] > 0]
+        problem = check_feasibility(days, inputs['start_time'], inputs['end_time'], week_projects, constraints, time_slots=time_slots)
+        if problem is not None and problem['reason'] in DEMAND_REASONS:
+            trim_demand(demand, week_projects, problem)
+            continue
+        if solves == MAX_WEEK_SOLVES:
+            solved = False
+            break
+        status, result, solve_stats = schedule_blocks(days, inputs['start_time'], inputs['end_time'], week_projects, constraints,
+                                                      return_stats=True, hint=hint, time_slots=time_slots, **options)
+        solves += 1
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break
+        result = {}
+        # Out of time: a smaller week isn't sure to be any quicker, so the week isn't solved again
+        if status != cp_model.INFEASIBLE:
+            solved = False
+            break
+        trim_demand(demand, week_projects, None)
+
+    stats = get_project_statistics(inputs['projects'], result, time_slots=time_slots)
+    scheduled = {project['Project Name']: min(project['Assigned Blocks'], wanted[project['Project Name']]) for project in stats}
+    # The constraints are in the timetable too, put the week's back so it shows them when nothing was scheduled
+    if not result:
+        result = {day: {} for day in days}
+        for constraint in constraints:
+            result[constraint['day']].update({slot: constraint['name'] for slot in range(time_slots.slot(constraint['start_time']), time_slots.slot(constraint['end_time']))})
+        result = {day: slots for day, slots in result.items() if slots}
+    return {
+        'week': week,
+        'start_date': (inputs['start_date'] + timedelta(weeks=week)).isoformat(),
+        'days': days,
+        'targets': targets,
+        'carried_in': dict(carried_in),
+        'scheduled': scheduled,
+        'carried_out': {name: blocks - scheduled[name] for name, blocks in wanted.items() if blocks > scheduled[name]},
+        'solved': solved,
+        'solves': solves,
+        'status': solve_stats['status'] if solve_stats else None,
+        'solve_stats': solve_stats,
+        'result': result,
+    }
+
+# The plan of the horizon from its weeks: the timetable of all the weeks in 'result' ({date: {slot: name}}), the blocks left 'unmet'
+# at the end of the horizon (with their hours), the 'unsolved_weeks' (see plan_week) and the 'stale_weeks', whose carried in blocks
+# aren't what the week before carried out any more (after replan_week). plan_horizon(inputs, plan, from_week) plans them again.
+def horizon_plan(inputs, weeks):
+    hours_per_block = {project['name']: project['hours_per_block'] for project in inputs['projects']}
+    unmet = weeks[-1]['carried_out'] if weeks else {}
+    unsolved_weeks = [week['week'] for week in weeks if not week.get('solved', True)]
+    stale_weeks = [week['week'] for previous, week in zip(weeks, weeks[1:]) if week['carried_in'] != previous['carried_out']]
+    return {
+        'error': None,
+        'weeks': weeks,
+        'result': {day: slots for week in weeks for day, slots in week['result'].items()},
+        'unmet': {name: {'blocks': blocks, 'hours': blocks * hours_per_block[name]} for name, blocks in unmet.items()},
+        'unsolved_weeks': unsolved_weeks,
+        'stale_weeks': stale_weeks,
+        'complete': not unmet and not unsolved_weeks and not stale_weeks,
+    }
+
+# Plans the weeks of the horizon one after the other, carrying forward what each one couldn't fit (see the top of this module).
+# With a previous plan, the weeks before from_week are kept as they are, and the others are planned again, warm started
+# with their previous timetables. options are passed on to schedule_blocks (engine, objective, solver_params, templates, ...).
+def plan_horizon(inputs, plan=None, from_week=0, **options):
+    weeks = list(plan['weeks'][:from_week]) if plan else []
+    carried = weeks[-1]['carried_out'] if weeks else {}
+    for week in range(len(weeks), inputs['num_weeks']):
+        previous = plan['weeks'][week] if plan and week < len(plan['weeks']) else None
+        planned = plan_week(inputs, week, carried, hint=previous['result'] if previous else None, **options)
+        weeks.append(planned)
+        carried = planned['carried_out']
+    return horizon_plan(inputs, weeks)
+
+# Plans a single week of a plan again (for instance after its inputs changed), from the blocks that were carried into it.
+# The other weeks are kept: if the week now carries out something else, the next week is in the 'stale_weeks' of the new plan.
+def replan_week(inputs, plan, week, **options):
+    if not 0 <= week < len(plan['weeks']):
+        raise ValueError(f"The plan has no week {week}")
+    weeks = list(plan['weeks'])
+    weeks[week] = plan_week(inputs, week, weeks[week]['carried_in'], hint=weeks[week]['result'], **options)
+    return horizon_plan(inputs, weeks)
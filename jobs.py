@@ -0,0 +1,417 @@
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from artifacts import timetable_hash
+from cache import ResultCache, ModelTemplateCache, cached_schedule_blocks
+from metrics import PhaseTimer
+from timeslots import SlotGrid
+import importlib
+import json
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+# Raised by JobQueue.submit when too many jobs are already waiting
+class QueueFull(Exception):
+    pass
+
+# Modules that are slow to import (OR-Tools, pandas, fpdf). They are imported on the first solve (fpdf on the first PDF download),
+# so the web app can start and serve the index page without them.
+HEAVY_MODULES = ('project', 'pdf')
+
+# Imports the heavy modules ahead of time (for long-lived servers, where the first request shouldn't pay for them)
+def preload_solver():
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+
+# Process pool of spawned processes (forking a process with OR-Tools threads isn't safe)
+def spawn_pool(max_workers):
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+# Submits function(*args) to a pool (started if it's None). A pool whose process died (for instance killed for using too much
+# memory) is broken and fails everything it's given from then on, so it's shut down and replaced by a new one.
+# Returns the pool, which may be a new one, and the future.
+def submit_to_pool(executor, max_workers, function, *args):
+    if executor is not None:
+        try:
+            return executor, executor.submit(function, *args)
+        except BrokenProcessPool:
+            executor.shutdown(wait=False)
+    executor = spawn_pool(max_workers)
+    return executor, executor.submit(function, *args)
+
+# Runs the whole pipeline for one week: pre-check, solve and statistics.
+# Used inline by /generate and in the process pool for jobs.
+# Returns a dict with an 'error' message, or the solver 'status', the 'result', the 'stats', the 'solve_stats', and the 'schedule'
+# document the PDF and the exports are made from, with the 'pdf_id' to store it under (see artifacts.timetable_hash).
+# The PDF itself is only rendered when it's downloaded. Errors also have a 'status' when the solver got to answer, or INVALID for a
+# mistake in the request. Those caught before solving have the 'reason' of check_feasibility (or 'invalid_window' for the grid).
+# 'timings' has the seconds spent in each phase: 'feasibility', 'build', 'solve' and 'extract' (or 'cache' on a cache hit),
+# and 'statistics'.
+# hint is a previous result, to warm start the solver (see schedule_blocks). slot_minutes is the granularity of the grid.
+# With pdf=False there is no schedule document (for the batch API).
+# on_solution and cancel follow and stop the solve as it runs (see schedule_blocks and ScheduleStream).
+# templates is a cache.ModelTemplateCache, to clone the model of the week shape instead of building it.
+# objective is one of project.OBJECTIVES.
+def run_schedule(available_days, start_time, end_time, projects, fixed_constraints, engine='boolean', solver_params=None, cache=None, hint=None,
+                 slot_minutes=30, pdf=True, on_solution=None, cancel=None, templates=None, objective='separation'):
+    from ortools.sat.python import cp_model
+    from export import schedule_document
+    from project import schedule_blocks, get_project_statistics, check_feasibility, INPUT_ERROR_REASONS
+
+    # The slot grid is built once and shared by all the steps
+    try:
+        time_slots = SlotGrid(start_time, end_time, slot_minutes)
+    except ValueError as e:
+        return {'error': str(e), 'status': 'INVALID', 'reason': 'invalid_window'}
+
+    timer = PhaseTimer()
+
+    # Catch the mistakes in the request (status INVALID) and the common impossible weeks (INFEASIBLE) before building the model
+    with timer.phase('feasibility'):
+        problem = check_feasibility(available_days, start_time, end_time, projects, fixed_constraints, time_slots=time_slots)
+    if problem:
+        status = 'INVALID' if problem['reason'] in INPUT_ERROR_REASONS else 'INFEASIBLE'
+        return {'error': problem['message'], 'status': status, 'reason': problem['reason'], 'timings': timer.phases}
+
+    # Schedule the blocks. The statistics and the PDF read the result as a Schedule, the outcome has it as a dict.
+    started = time.perf_counter()
+    if cache is not None:
+        status, result, solve_stats = cached_schedule_blocks(cache, available_days, start_time, end_time, projects, fixed_constraints,
+                                                             engine=engine, objective=objective, solver_params=solver_params, hint=hint, time_slots=time_slots,
+                                                             on_solution=on_solution, cancel=cancel, as_schedule=True, templates=templates)
+    else:
+        status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints,
+                                                      engine=engine, objective=objective, solver_params=solver_params, return_stats=True, hint=hint, time_slots=time_slots,
+                                                      on_solution=on_solution, cancel=cancel, as_schedule=True, templates=templates)
+    if solve_stats.get('cache') == 'hit':
+        timer.add('cache', time.perf_counter() - started)
+    else:
+        timer.update({'build': solve_stats['build_time'], 'solve': solve_stats['wall_time'], 'extract': solve_stats['extract_time']})
+
+    # Handle scheduling result
+    if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
+        with timer.phase('statistics'):
+            stats = get_project_statistics(projects, result, time_slots=time_slots)
+        outcome = {
+            'error': None,
+            'status': solve_stats['status'],
+            'result': result.to_result(),
+            'stats': stats,
+            'solve_stats': solve_stats,
+            'slot_minutes': slot_minutes,
+            'timings': timer.phases,
+        }
+        if pdf:
+            names = [project['name'] for project in projects] + [constraint['name'] for constraint in fixed_constraints]
+            outcome['pdf_id'] = timetable_hash(available_days, result, names, time_slots)
+            outcome['schedule'] = schedule_document(available_days, result, names, time_slots)
+        return outcome
+    elif status == cp_model.UNKNOWN and solve_stats.get('cancelled'):
+        return {'error': "The solve was cancelled before a solution was found.", 'status': status.name, 'timings': timer.phases}
+    elif status == cp_model.UNKNOWN:
+        return {'error': f"No solution found within the time limit of {(solver_params or {}).get('max_time')} seconds.", 'status': status.name,
+                'timings': timer.phases}
+    else:
+        return {'error': "No feasible solution found with the given constraints.", 'status': status.name, 'timings': timer.phases}
+
+# Runs run_schedule in a thread and follows its progress, for the streaming mode of /generate.
+# events() yields ('solution', progress) for each improving solution, with the 'result' and the 'objective', 'best_bound',
+# 'wall_time' and 'solutions' of schedule_blocks' on_solution, then ('done', outcome) with the outcome of run_schedule.
+# cancel() stops the solve and keeps the best solution so far, as does closing events() (when the client goes away).
+# on_done is called from the thread with the outcome, even if nobody reads the events any more.
+class ScheduleStream:
+    def __init__(self, inputs, on_done=None, **options):
+        self.inputs = inputs
+        self.options = options
+        self.on_done = on_done
+        self.cancelled = threading.Event()
+        self._events = queue.Queue()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _solution(self, result, progress):
+        self._events.put(('solution', dict(progress, result=result)))
+
+    def _run(self):
+        try:
+            outcome = run_schedule(*self.inputs, on_solution=self._solution, cancel=self.cancelled, **self.options)
+        except Exception as e:
+            outcome = {'error': str(e) or e.__class__.__name__}
+        if self.on_done is not None:
+            self.on_done(outcome)
+        self._events.put(('done', outcome))
+
+    def events(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        try:
+            while True:
+                event = self._events.get()
+                yield event
+                if event[0] == 'done':
+                    return
+        finally:
+            self.cancel()
+
+# Entry point of the pool processes. Each process keeps its own handle on the shared cache directory,
+# and its own model templates.
+_process_cache = None
+_process_templates = None
+
+def run_schedule_job(inputs, options, cache_dir=None):
+    global _process_cache, _process_templates
+    cache = None
+    if cache_dir:
+        if _process_cache is None:
+            _process_cache = ResultCache(directory=cache_dir)
+        cache = _process_cache
+    if _process_templates is None:
+        _process_templates = ModelTemplateCache()
+    return run_schedule(*inputs, cache=cache, templates=_process_templates, **options)
+
+# Reads one week from a JSON object, with the arguments of schedule_blocks and an optional slot_minutes.
+# Returns the inputs of run_schedule and the slot_minutes, raises a ValueError if the object is malformed.
+def schedule_inputs(data):
+    try:
+        available_days = [str(day) for day in data['available_days']]
+        start_time = str(data['start_time'])
+        end_time = str(data['end_time'])
+        projects = []
+        for project in data.get('projects', []):
+            projects.append({'name': str(project['name']), 'hours_per_block': float(project['hours_per_block']), 'blocks_per_week': int(project['blocks_per_week'])})
+            if 'weight' in project:  # Weight of the project with the min_gap objective
+                projects[-1]['weight'] = int(project['weight'])
+        fixed_constraints = [{'name': str(constraint['name']), 'day': str(constraint['day']), 'start_time': str(constraint['start_time']), 'end_time': str(constraint['end_time'])}
+                             for constraint in data.get('fixed_constraints', [])]
+        slot_minutes = int(data.get('slot_minutes', 30))
+    except KeyError as e:
+        raise ValueError(f"Missing field: {e.args[0]}")
+    except (TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"Invalid schedule request: {e}")
+    return (available_days, start_time, end_time, projects, fixed_constraints), slot_minutes
+
+# Entry point of the pool processes for one item of a batch. Returns the line of the batch response.
+# submitted is the time the item was given to the pool, to report how long it waited.
+def run_batch_item(index, item, options, cache_dir=None, submitted=None):
+    started = time.time()
+    try:
+        inputs, slot_minutes = schedule_inputs(item)
+        outcome = run_schedule_job(inputs, dict(options, slot_minutes=slot_minutes, pdf=False), cache_dir)
+    except ValueError as e:
+        outcome = {'error': str(e), 'status': 'INVALID', 'reason': 'malformed_request'}
+    return {
+        'index': index,
+        'id': item.get('id') if isinstance(item, dict) else None,
+        'status': outcome.get('status', 'ERROR'),
+        'error': outcome['error'],
+        'reason': outcome.get('reason'),
+        'result': outcome.get('result'),
+        'stats': outcome.get('stats'),
+        'solve_stats': outcome.get('solve_stats'),
+        'timing': {'queued': started - (submitted or started), 'run': time.time() - started, 'phases': outcome.get('timings')},
+    }
+
+# Solves many independent weeks in a process pool sized to the machine, for the batch API.
+# At most max_in_flight items are in the pool at once over all the batches, the others wait for a free slot.
+# Each item gets at most max_time seconds of solver time (it can ask for less with its own 'max_time').
+class BatchRunner:
+    def __init__(self, max_workers=None, max_in_flight=None, max_time=20.0, cache_dir=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or 2 * self.max_workers
+        self.max_time = max_time
+        self.cache_dir = cache_dir
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    # Submits function(*args) to the pool like an executor, once one of the max_in_flight slots is free (blocking until then).
+    # The weeks of a team are solved this way (the runner is the executor of team.schedule_team), within the same limit as the batches.
+    def submit(self, function, *args):
+        self._slots.acquire()
+        return self._pool_submit(function, *args)
+
+    # Submits function(*args) to the pool, replacing it if it's broken (see submit_to_pool). The caller holds a slot,
+    # it's released when the future is done.
+    def _pool_submit(self, function, *args):
+        try:
+            with self._lock:
+                self._executor, future = submit_to_pool(self._executor, self.max_workers, function, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda future: self._slots.release())
+        return future
+
+    def _submit(self, index, item, engine, objective, solver_params):
+        max_time = self.max_time
+        if isinstance(item, dict) and isinstance(item.get('max_time'), (int, float)) and item['max_time'] > 0:
+            max_time = min(max_time, item['max_time'])
+        options = {'engine': engine, 'objective': objective, 'solver_params': dict(solver_params or {}, max_time=max_time)}
+        return self._pool_submit(run_batch_item, index, item, options, self.cache_dir, time.time())
+
+    # Yields the line of each item (see run_batch_item) as soon as it's solved, in the order they finish.
+    # Closing the generator early cancels the items that haven't started.
+    def run(self, items, engine='boolean', solver_params=None, objective='separation'):
+        futures = {}
+        next_index = 0
+        try:
+            while next_index < len(items) or futures:
+                # Only block on a free slot when there is nothing of this batch to wait for
+                while next_index < len(items) and self._slots.acquire(blocking=not futures):
+                    futures[self._submit(next_index, items[next_index], engine, objective, solver_params)] = next_index
+                    next_index += 1
+                done, _ = wait(futures, timeout=None if next_index == len(items) else 0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = futures.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        item = items[index]
+                        yield {'index': index, 'id': item.get('id') if isinstance(item, dict) else None, 'status': 'ERROR',
+                               'error': str(e) or e.__class__.__name__, 'reason': None, 'result': None, 'stats': None, 'solve_stats': None, 'timing': None}
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+# Job records kept in the memory of a single process
+class MemoryJobStore:
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        with self._lock:
+            self._jobs[job_id] = {'id': job_id, 'status': 'queued', 'created': time.time(), 'outcome': None}
+
+    def update(self, job_id, status, outcome=None):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(status=status, outcome=outcome)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def delete_older_than(self, created):
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job['created'] < created]:
+                del self._jobs[job_id]
+
+# Job records in a SQLite database, so any gunicorn worker can report the status of a job
+class SQLiteJobStore:
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, created REAL, outcome TEXT)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def create(self, job_id):
+        with self._connect() as connection:
+            connection.execute('INSERT INTO jobs (id, status, created) VALUES (?, ?, ?)', (job_id, 'queued', time.time()))
+
+    def update(self, job_id, status, outcome=None):
+        if outcome is not None:
+            # JSON turns the slot numbers into strings, they are restored in get
+            outcome = json.dumps(outcome)
+        with self._connect() as connection:
+            connection.execute('UPDATE jobs SET status = ?, outcome = ? WHERE id = ?', (status, outcome, job_id))
+
+    def get(self, job_id):
+        with self._connect() as connection:
+            row = connection.execute('SELECT id, status, created, outcome FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        outcome = None
+        if row[3] is not None:
+            outcome = json.loads(row[3])
+            if outcome.get('result') is not None:
+                outcome['result'] = {day: {int(slot): name for slot, name in slots.items()} for day, slots in outcome['result'].items()}
+        return {'id': row[0], 'status': row[1], 'created': row[2], 'outcome': outcome}
+
+    def delete_older_than(self, created):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM jobs WHERE created < ?', (created,))
+
+# Runs schedule jobs in a bounded process pool, so slow solves don't block the web workers.
+# Job status is 'queued', 'running', 'done' (outcome from run_schedule) or 'failed' (outcome has the 'error').
+# At most max_pending jobs can be queued or running at once in this process, submit raises QueueFull beyond that.
+# Jobs are forgotten after job_ttl seconds.
+class JobQueue:
+    def __init__(self, store=None, max_workers=None, max_pending=16, job_ttl=3600, cache_dir=None):
+        self.store = store or MemoryJobStore()
+        self.max_workers = max_workers or min(2, os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self.cache_dir = cache_dir
+        self._executor = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def pending(self):
+        with self._lock:
+            return len(self._futures)
+
+    def submit(self, available_days, start_time, end_time, projects, fixed_constraints, **options):
+        with self._lock:
+            if len(self._futures) >= self.max_pending:
+                raise QueueFull(f"Too many timetables are being generated ({len(self._futures)}), please try again later.")
+            job_id = str(uuid.uuid4())
+            self.store.delete_older_than(time.time() - self.job_ttl)
+            self.store.create(job_id)
+            inputs = (available_days, start_time, end_time, projects, fixed_constraints)
+            # The pool is started on the first job, after gunicorn has forked its workers
+            self._executor, future = submit_to_pool(self._executor, self.max_workers, run_schedule_job, inputs, options, self.cache_dir)
+            self._futures[job_id] = future
+        future.add_done_callback(lambda future: self._finish(job_id, future))
+        return job_id
+
+    def _finish(self, job_id, future):
+        try:
+            outcome = future.result()
+            self.store.update(job_id, 'done', outcome)
+        except Exception as e:
+            self.store.update(job_id, 'failed', {'error': str(e) or e.__class__.__name__})
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def get(self, job_id):
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            future = self._futures.get(job_id)
+        if job['status'] == 'queued' and future is not None and future.running():
+            job['status'] = 'running'
+        return job
+
+    # Blocks until the job is finished, mainly for scripts and tests
+    def wait(self, job_id, timeout=None):
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+            # The done callback may still be storing the outcome
+            deadline = time.time() + 5
+            while self.store.get(job_id)['status'] in ('queued', 'running') and time.time() < deadline:
+                time.sleep(0.01)
+        return self.get(job_id)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
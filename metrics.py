@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+import threading
+import time
+
+# Time spent in each phase of a request (parsing, model build, solve, ...), in seconds
+class PhaseTimer:
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def update(self, phases):
+        for name, seconds in phases.items():
+            self.add(name, seconds)
+
+    # Value of the Server-Timing header (durations in milliseconds), shown by the browser's developer tools
+    def server_timing(self):
+        return ', '.join(f'{name};dur={seconds * 1000:.2f}' for name, seconds in self.phases.items())
+
+# Upper bounds of the histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def format_labels(names, values):
+    return ','.join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+
+# Prometheus histogram with one label (like the phase)
+class Histogram:
+    def __init__(self, name, help, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # Label value -> [count per bucket, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, seconds):
+        with self._lock:
+            series = self._series.setdefault(value, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for value, (bucket_counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f'{self.name}_bucket{{{format_labels((self.label, "le"), (value, bound))}}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{format_labels((self.label, "le"), (value, "+Inf"))}}} {count}')
+                lines.append(f'{self.name}_sum{{{format_labels((self.label,), (value,))}}} {total}')
+                lines.append(f'{self.name}_count{{{format_labels((self.label,), (value,))}}} {count}')
+        return lines
+
+# Prometheus counter with labels
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                labels = f'{{{format_labels(self.labels, values)}}}' if self.labels else ''
+                lines.append(f'{self.name}{labels} {total}')
+        return lines
+
+# Metrics of a process, in the Prometheus text format. With gunicorn every worker has its own.
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(line for metric in self.metrics for line in metric.render()) + '\n'
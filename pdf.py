@@ -1,7 +1,7 @@
-from io import BytesIO, StringIO
+from functools import lru_cache
 from fpdf import FPDF
-import pandas as pd
-import os
+from schedule import Schedule
+from timeslots import SlotGrid
 
 def generate_project_colors(project_names):
     # List of pastel colors
@@ -56,46 +56,69 @@ class PDF(FPDF):
             self.cell(width, 10, str(item), 1, 0, 'C', 1)
         self.ln()
 
-def generate_pdf(timetable, filename, start_time, end_time, project_names):
-    if not isinstance(timetable, pd.DataFrame):
-        raise ValueError("Unsupported timetable format")
-
+# Layout of the pages drawn by render_pdf, in mm (A4, the sizes of the PDF.table_header and PDF.table_row cells)
+TABLE_WIDTH = 180
+TABLE_X = (210 - TABLE_WIDTH) / 2
+TABLE_Y = 30  # Below the title and the header row
+ROW_HEIGHT = 10
+ROWS_PER_PAGE = 24  # Rows that fit above the bottom margin of 2 cm
+
+# Renders the static part of the pages for some days and time slots: the title, the header row, the time column and the empty grid.
+# Returns the content of each page. It's the same for every week with the same shape, so it's cached.
+@lru_cache(maxsize=64)
+def page_skeletons(days, labels):
     pdf = PDF()
-    pdf.add_page()
-
-    timetable = timetable.fillna('')
-
-    # Generate time slots
-    time_slots = pd.date_range(start=start_time, end=end_time, freq='30min')[:-1].strftime('%H:%M').tolist()
-
-    # Ensure that the number of time slots matches the number of rows in the timetable
-    if len(time_slots) != len(timetable):
-        raise ValueError("Number of time slots does not match the number of timetable rows")
-
-    # Create a new DataFrame with time slots as the first column
-    timetable_with_times = pd.DataFrame({
-        'Time': time_slots
-    }).join(timetable.reset_index(drop=True))  # Reset index to avoid mismatched rows
-
-    # Generate project colors
+    pdf.set_auto_page_break(False)
+    headers = ['Time'] + list(days)
+    column_width = TABLE_WIDTH / len(headers)
+    for first_row in range(0, max(len(labels), 1), ROWS_PER_PAGE):
+        pdf.add_page()
+        pdf.table_header(headers, [column_width] * len(headers))
+        pdf.set_font('Arial', '', 12)
+        pdf.set_fill_color(255, 255, 255)
+        for row, label in enumerate(labels[first_row:first_row + ROWS_PER_PAGE]):
+            pdf.set_xy(TABLE_X, TABLE_Y + row * ROW_HEIGHT)
+            pdf.cell(column_width, ROW_HEIGHT, label, 1, 0, 'C', 1)
+            for _ in days:
+                pdf.cell(column_width, ROW_HEIGHT, '', 1, 0, 'C', 1)
+    return tuple(pdf.pages[page] for page in range(1, pdf.page + 1))
+
+# Renders the timetable of a result (see schedule_blocks, a dict or a Schedule) straight to PDF bytes, without building a DataFrame.
+# Each block is drawn as one tall colored cell instead of a cell per slot, on top of the cached page skeletons.
+# Blocks going past the bottom of a page are split between the pages.
+def render_pdf(available_days, result, project_names, time_slots):
+    schedule = Schedule.of(result, available_days, len(time_slots))
+    skeletons = page_skeletons(tuple(available_days), tuple(time_slots.labels))
     project_colors = generate_project_colors(project_names)
+    column_width = TABLE_WIDTH / (len(available_days) + 1)
 
-    # Set headers and column widths
-    headers = timetable_with_times.columns.tolist()
-    column_widths = [180 / len(headers)] * len(headers)
-
-    # Add table header
-    pdf.table_header(headers, column_widths)
-
-    # Add table rows
-    for _, row in timetable_with_times.iterrows():
-        pdf.table_row(row, column_widths, project_colors)
-
-    # pdf.output(os.path.join('tmp', filename))
-
-    # Save PDF to a buffer
-    byte_string = pdf.output(dest="S")
-    pdf_buffer = StringIO(byte_string)
-    pdf_buffer.seek(0)
-
-    return pdf_buffer
+    pdf = PDF()
+    pdf.set_auto_page_break(False)
+    for skeleton in skeletons:
+        pdf.add_page()
+        # Registers the fonts of the skeleton in this document, in the same order
+        pdf.set_font('Arial', '', 12)
+        pdf.pages[pdf.page] = skeleton
+
+    for column, day in enumerate(available_days, start=1):
+        x = TABLE_X + column * column_width
+        for first_slot, length, name in schedule.runs(day):
+            color = project_colors.get(name, (255, 255, 255))
+            while length > 0:
+                page, row = divmod(first_slot, ROWS_PER_PAGE)
+                rows = min(length, ROWS_PER_PAGE - row)
+                pdf.page = page + 1
+                pdf.set_fill_color(*color)
+                pdf.set_xy(x, TABLE_Y + row * ROW_HEIGHT)
+                pdf.cell(column_width, rows * ROW_HEIGHT, str(name), 1, 0, 'C', 1)
+                first_slot += rows
+                length -= rows
+
+    pdf.page = len(skeletons)
+    # fpdf builds the document as a latin-1 string
+    return pdf.output(dest='S').encode('latin1')
+
+# Renders the PDF of a stored week (see export.schedule_document)
+def render_document(document):
+    time_slots = SlotGrid(document['start_time'], document['end_time'], document['slot_minutes'])
+    return render_pdf(document['available_days'], Schedule.from_dict(document['schedule']), document['names'], time_slots)
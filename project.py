@@ -1,8 +1,12 @@
 from ortools.sat.python import cp_model
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from tabulate import tabulate
-import json
+from schedule import Schedule, as_result, id_dtype
+from timeslots import SlotGrid, time_to_minutes, minutes_to_time
+import threading
+import time
 
 def get_user_inputs(hardcoded = False):
     if hardcoded:
@@ -77,152 +81,763 @@ def get_user_inputs(hardcoded = False):
 def to_time(time_str):
     return datetime.strptime(time_str, '%H:%M').time()
 
-# Converts time string to slot index using the pre-defined time_slots
+# Converts time string to slot index using the pre-defined time_slots (a timeslots.SlotGrid)
 def time_to_slot(time_str, time_slots):
     return time_slots.get_loc(time_str)
 
+# Returns the longest run of consecutive free slots in a day
+def longest_free_window(busy_slots, num_slots):
+    longest = current = 0
+    for slot in range(num_slots):
+        current = 0 if slot in busy_slots else current + 1
+        longest = max(longest, current)
+    return longest
+
+# Free slots of each day as a bitmask (bit s is set when slot s is free), computed once from the fixed constraints
+def availability_masks(available_days, time_slots, fixed_constraints):
+    masks = [(1 << len(time_slots)) - 1 for _ in available_days]
+    for constraint in fixed_constraints:
+        constraint_day = available_days.index(constraint['day'])
+        constraint_start_slot = time_to_slot(constraint['start_time'], time_slots)
+        constraint_end_slot = time_to_slot(constraint['end_time'], time_slots)
+        masks[constraint_day] &= ~(((1 << (constraint_end_slot - constraint_start_slot)) - 1) << constraint_start_slot)
+    return masks
+
+# Slots where a block of block_slots slots can start in a day, with all its slots free in the day's mask
+def valid_starts(mask, num_slots, block_slots):
+    block = (1 << block_slots) - 1
+    return [slot for slot in range(num_slots - block_slots + 1) if (mask >> slot) & block == block]
+
+# Reasons of check_feasibility that are mistakes in the request (times off the window or the grid, unknown days), not weeks too busy
+INPUT_ERROR_REASONS = ('invalid_window', 'constraint_day_unavailable', 'constraint_outside_window', 'block_off_grid')
+
+# Pre-solve analysis of the inputs: catches the common reasons why schedule_blocks can't succeed,
+# without building the model or calling the solver.
+# Returns None if no problem was found, or a dict with a 'reason' code, a human readable 'message'
+# and the details of the problem. Passing this check doesn't guarantee a feasible solution.
+# The reasons in INPUT_ERROR_REASONS are mistakes in the request, the others are weeks that can't fit the projects.
+def check_feasibility(available_days, start_time, end_time, projects, fixed_constraints, time_slots=None):
+    try:
+        if time_slots is None:
+            time_slots = SlotGrid(start_time, end_time)
+    except (ValueError, AttributeError):
+        return {'reason': 'invalid_window', 'message': f"Invalid available time: {start_time} to {end_time}."}
+    num_slots = len(time_slots)
+    if num_slots == 0:
+        return {'reason': 'invalid_window', 'message': f"The available time {start_time} to {end_time} is empty."}
+
+    # Slots taken by fixed constraints on each day
+    busy = {day: set() for day in available_days}
+    for constraint in fixed_constraints:
+        if constraint['day'] not in busy:
+            return {'reason': 'constraint_day_unavailable', 'constraint': constraint['name'], 'day': constraint['day'],
+                    'message': f"Fixed constraint '{constraint['name']}' is on {constraint['day']}, which is not an available day."}
+        try:
+            constraint_start_slot = time_to_slot(constraint['start_time'], time_slots)
+            constraint_end_slot = time_to_slot(constraint['end_time'], time_slots)
+        except KeyError:
+            return {'reason': 'constraint_outside_window', 'constraint': constraint['name'], 'day': constraint['day'],
+                    'message': f"Fixed constraint '{constraint['name']}' on {constraint['day']} ({constraint['start_time']} to {constraint['end_time']}) "
+                               f"falls outside the available time ({start_time} to {end_time}) or the {time_slots.slot_minutes} min grid."}
+        busy[constraint['day']].update(range(constraint_start_slot, constraint_end_slot))
+
+    free_slots = {day: num_slots - len(busy[day]) for day in available_days}
+    longest_window = {day: longest_free_window(busy[day], num_slots) for day in available_days}
+    longest_free_hours = time_slots.hours(max(longest_window.values(), default=0))
+
+    # Each project gets at most one block per day, on days with a free window long enough for it
+    for project in projects:
+        block_duration_slots = time_slots.duration_slots(project['hours_per_block'])
+        if block_duration_slots <= 0 or not time_slots.fits_grid(project['hours_per_block']):
+            return {'reason': 'block_off_grid', 'project': project['name'], 'hours_per_block': project['hours_per_block'],
+                    'message': f"Blocks of {project['hours_per_block']} hours for '{project['name']}' are not a whole number of {time_slots.slot_minutes} min slots."}
+        if project['blocks_per_week'] > len(available_days):
+            return {'reason': 'too_many_blocks', 'project': project['name'], 'blocks_per_week': project['blocks_per_week'], 'available_days': len(available_days),
+                    'message': f"'{project['name']}' needs {project['blocks_per_week']} blocks, but only one block per day can be scheduled in {len(available_days)} days."}
+        fitting_days = [day for day in available_days if longest_window[day] >= block_duration_slots]
+        if not fitting_days and project['blocks_per_week'] > 0:
+            return {'reason': 'block_too_long', 'project': project['name'], 'hours_per_block': project['hours_per_block'],
+                    'longest_free_hours': longest_free_hours,
+                    'message': f"Blocks of {project['hours_per_block']} hours for '{project['name']}' are longer than any free window "
+                               f"(the longest is {longest_free_hours} hours)."}
+        if len(fitting_days) < project['blocks_per_week']:
+            return {'reason': 'not_enough_days', 'project': project['name'], 'blocks_per_week': project['blocks_per_week'], 'fitting_days': fitting_days,
+                    'message': f"'{project['name']}' needs {project['blocks_per_week']} blocks of {project['hours_per_block']} hours, "
+                               f"but only {len(fitting_days)} days have a free window long enough for one."}
+
+    # Total demand vs. free slots in the week
+    required_slots = sum(project['blocks_per_week'] * time_slots.duration_slots(project['hours_per_block']) for project in projects)
+    total_free_slots = sum(free_slots.values())
+    if required_slots > total_free_slots:
+        return {'reason': 'insufficient_capacity', 'required_hours': time_slots.hours(required_slots), 'available_hours': time_slots.hours(total_free_slots),
+                'message': f"The projects need {time_slots.hours(required_slots)} hours, but only {time_slots.hours(total_free_slots)} hours are free after the fixed constraints."}
+
+    # Per day capacity: a day can't take more than its free slots, nor more than one block of each project that fits in it
+    day_capacity = {day: min(free_slots[day], sum(time_slots.duration_slots(project['hours_per_block']) for project in projects
+                                                  if project['blocks_per_week'] > 0 and time_slots.duration_slots(project['hours_per_block']) <= longest_window[day]))
+                    for day in available_days}
+    if required_slots > sum(day_capacity.values()):
+        return {'reason': 'insufficient_day_capacity', 'required_hours': time_slots.hours(required_slots), 'available_hours': time_slots.hours(sum(day_capacity.values())),
+                'day_capacity_hours': {day: time_slots.hours(capacity) for day, capacity in day_capacity.items()},
+                'message': f"The projects need {time_slots.hours(required_slots)} hours, but with one block per project per day the available days can only fit "
+                           f"{time_slots.hours(sum(day_capacity.values()))} hours."}
+
+    return None
+
+# Available model formulations for schedule_blocks:
+# - 'boolean': one start/allocation bool per project, block, day and slot (original formulation).
+# - 'interval': one optional interval per project, block and day, with a no-overlap constraint per day.
+ENGINES = ('boolean', 'interval')
+
+# Objectives of schedule_blocks, the blocks of each project being spread over the week:
+# - 'separation': the placed blocks plus the days between consecutive blocks of each project (original objective). The days between
+#   consecutive blocks add up to the days between the first and the last block, so the days in between are left to chance,
+#   and the solver has to go through many equally good timetables before proving one optimal.
+# - 'min_gap': the smallest number of days between consecutive blocks of each project, weighted by its 'weight' (an int, 1 by default).
+#   Every block must be placed, and each smallest gap has a precomputed upper bound (see add_min_gap_objective).
+OBJECTIVES = ('separation', 'min_gap')
+
+# Solver parameters that can be set per call (solver_params) or per deployment (see app.py):
+# - max_time: time limit in seconds, the best solution found so far is returned when it's reached.
+# - num_workers: number of parallel search workers (0 lets CP-SAT use all the cores).
+# - relative_gap: stop as soon as the solution is proven within this relative gap of the best bound.
+# - random_seed: seed for reproducible searches.
+SOLVER_PARAMS = ('max_time', 'num_workers', 'relative_gap', 'random_seed')
+
+# Creates the CP-SAT solver with the given parameters (missing or None parameters keep CP-SAT's defaults)
+def create_solver(solver_params=None):
+    solver_params = solver_params or {}
+    unknown = set(solver_params) - set(SOLVER_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown solver parameters: {', '.join(sorted(unknown))}")
+
+    solver = cp_model.CpSolver()
+    solver.parameters.linearization_level = 0
+    if solver_params.get('max_time') is not None:
+        solver.parameters.max_time_in_seconds = float(solver_params['max_time'])
+    if solver_params.get('num_workers') is not None:
+        solver.parameters.num_workers = int(solver_params['num_workers'])
+    if solver_params.get('relative_gap') is not None:
+        solver.parameters.relative_gap_limit = float(solver_params['relative_gap'])
+    if solver_params.get('random_seed') is not None:
+        solver.parameters.random_seed = int(solver_params['random_seed'])
+    return solver
+
+# Records when the solver finds each improving solution, for the time-to-first-feasible statistics.
+# With on_solution, each improving solution is also passed on as it's found (see schedule_blocks): read_result turns
+# the callback into a result, and on_solution returning True stops the search with this solution.
+class SolutionTimer(cp_model.CpSolverSolutionCallback):
+    def __init__(self, on_solution=None, read_result=None):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.solutions = 0
+        self.first_solution_time = None
+        self.on_solution = on_solution
+        self.read_result = read_result
+        self.stopped = False
+
+    def on_solution_callback(self):
+        if self.solutions == 0:
+            self.first_solution_time = self.WallTime()
+        self.solutions += 1
+        if self.on_solution is None:
+            return
+        progress = {'objective': self.ObjectiveValue(), 'best_bound': self.BestObjectiveBound(), 'wall_time': self.WallTime(), 'solutions': self.solutions}
+        if self.on_solution(self.read_result(self), progress):
+            self.stopped = True
+            self.StopSearch()
+
+# Stops the solver once cancel (a threading.Event) is set, until done is set.
+# StopSearch does nothing before Solve has started, so it's repeated until the solve returns.
+def stop_on_cancel(solver, cancel, done):
+    while not done.wait(0.05):
+        if cancel.is_set():
+            solver.StopSearch()
+
+# Collects the statistics of a solve, to tell an optimal answer from a time-limited best effort
+def get_solve_stats(solver, status, timer=None):
+    solved = status == cp_model.OPTIMAL or status == cp_model.FEASIBLE
+    objective = solver.ObjectiveValue() if solved else None
+    best_bound = solver.BestObjectiveBound() if solved else None
+    gap = None
+    if solved:
+        gap = abs(best_bound - objective) / max(1.0, abs(objective))
+    return {
+        'status': solver.StatusName(status),
+        'optimal': status == cp_model.OPTIMAL,
+        'wall_time': solver.WallTime(),
+        'branches': solver.NumBranches(),
+        'conflicts': solver.NumConflicts(),
+        'objective': objective,
+        'best_bound': best_bound,
+        'gap': gap,
+        'solutions': timer.solutions if timer else None,
+        'first_solution_time': timer.first_solution_time if timer else None,
+    }
+
+# Reads the blocks of a previous result, to seed a new solve with them (warm start).
+# Every project that is unchanged (same name, no more slots than its blocks take) gets its previous blocks as hints, in day order.
+# Blocks on days that are no longer available or overlapping the new fixed constraints are left out.
+# The boolean engine may also allocate slots of a project outside its whole blocks: when all of them are still free, the
+# blocks that had no start get the days left free (the first and last days of the week first, as the separation counts
+# from them) and those slots, so the hint is a whole timetable.
+# Returns a dict (project_idx, block) -> (day, start_slot, extra_slots), start_slot being None for a block without a start
+# and extra_slots the (day, slot) it allocates outside its start.
+def solution_hints(previous_result, available_days, time_slots, projects, fixed_constraints):
+    previous_result = as_result(previous_result)
+    busy = {day: set() for day in available_days}
+    for constraint in fixed_constraints:
+        if constraint['day'] in busy:
+            busy[constraint['day']].update(range(time_to_slot(constraint['start_time'], time_slots), time_to_slot(constraint['end_time'], time_slots)))
+
+    hints = {}
+    num_days = len(available_days)
+    for project_idx, project in enumerate(projects):
+        block_duration_slots = time_slots.duration_slots(project['hours_per_block'])
+        blocks_per_week = project['blocks_per_week']
+        previous_slots = [sorted(int(slot) for slot, name in previous_result.get(day, {}).items() if name == project['name']) for day in available_days]
+        # More slots than the blocks take now: the project changed
+        if sum(map(len, previous_slots)) > blocks_per_week * block_duration_slots:
+            continue
+        starts = {}
+        extra_slots = []
+        for day_idx, (day, project_slots) in enumerate(zip(available_days, previous_slots)):
+            # A project has at most one block per day: the first run of slots as long as its blocks are now
+            start = first_run(project_slots, block_duration_slots)
+            block = range(start, start + block_duration_slots) if start is not None else range(0)
+            if start is not None and block[-1] < len(time_slots) and not busy[day].intersection(block) and len(starts) < blocks_per_week:
+                starts[day_idx] = start
+            else:
+                block = range(0)
+            extra_slots.extend((day_idx, slot) for slot in project_slots if slot not in block)
+
+        days = sorted(starts)
+        missing = blocks_per_week - len(starts)
+        if missing and blocks_per_week <= num_days and len(extra_slots) == missing * block_duration_slots and \
+                all(slot < len(time_slots) and slot not in busy[available_days[day]] for day, slot in extra_slots):
+            free_days = sorted((day for day in range(num_days) if day not in starts), key=lambda day: (day not in (0, num_days - 1), day))
+            days = sorted(days + free_days[:missing])
+        else:
+            extra_slots = []
+        for block, day in enumerate(days):
+            if day in starts:
+                hints[(project_idx, block)] = (day, starts[day], ())
+            else:
+                # The first block without a start allocates all the extra slots
+                hints[(project_idx, block)] = (day, None, tuple(extra_slots))
+                extra_slots = []
+    return hints
+
+# First slot of the first run of length consecutive slots in sorted slots, None if there is none
+def first_run(slots, length):
+    run_start = None
+    for index, slot in enumerate(slots):
+        if index == 0 or slot != slots[index - 1] + 1:
+            run_start = slot
+        if slot - run_start + 1 == length:
+            return run_start
+    return None
+
 # Uses ortools to optimize the allocation of the available time to the project blocks.
-def schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints):
+# symmetry_breaking orders the interchangeable blocks of each project by day, so the solver doesn't have to
+# rule out every permutation of block indices before proving optimality.
+# solver_params is a dict with any of SOLVER_PARAMS. With return_stats, the solve statistics from
+# get_solve_stats are returned as a third value.
+# hint is a previous result of schedule_blocks: the blocks of unchanged projects seed the new solve.
+# time_slots is the SlotGrid of the request (a 30 min grid from start_time to end_time by default),
+# the slot numbers of the result are indexes in it.
+# on_solution is called from the solver thread with each improving solution, as (result, progress) where progress has the
+# 'objective', 'best_bound', 'wall_time' and number of 'solutions' so far. It can return True to accept this solution and stop.
+# cancel is a threading.Event: setting it from another thread stops the solve, returning the best solution so far (FEASIBLE)
+# or none (UNKNOWN). The stats then have 'cancelled' set, unless the solve had already proved optimality.
+# With as_schedule, the result is a schedule.Schedule (a matrix of activity ids) instead of a {day: {slot: name}} dict.
+# templates is a cache.ModelTemplateCache: the model is then cloned from the template of the week shape of the request
+# (built by the first request of this shape) instead of being built from scratch, see model_from_template.
+# objective is one of OBJECTIVES.
+def schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='boolean', symmetry_breaking=True,
+                    solver_params=None, return_stats=False, hint=None, time_slots=None, on_solution=None, cancel=None, as_schedule=False,
+                    templates=None, objective='separation'):
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown scheduling engine: {engine}")
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective}")
+
+    if time_slots is None:
+        time_slots = SlotGrid(start_time, end_time)
+
+    hints = solution_hints(hint, available_days, time_slots, projects, fixed_constraints) if hint else None
+
+    build_started = time.perf_counter()
+    if templates is not None:
+        template = templates.get(template_key(engine, available_days, time_slots, projects, symmetry_breaking, objective),
+                                 lambda: build_model_template(engine, len(available_days), time_slots, projects, symmetry_breaking, objective))
+        model, extract_allocation = model_from_template(template, available_days, time_slots, projects, fixed_constraints, hints)
+    elif engine == 'interval':
+        model, extract_allocation = build_interval_model(available_days, time_slots, projects, fixed_constraints, symmetry_breaking, hints, objective)
+    else:
+        model, extract_allocation = build_boolean_model(available_days, time_slots, projects, fixed_constraints, symmetry_breaking, hints, objective)
+    build_time = time.perf_counter() - build_started
+
+    def read_schedule(solution):
+        return build_schedule(available_days, time_slots, projects, fixed_constraints, extract_allocation(solution))
+
+    # Solve the model
+    solver = create_solver(solver_params)
+    timer = SolutionTimer(on_solution, lambda solution: read_schedule(solution).to_result())
+    if cancel is not None and cancel.is_set():
+        solver.parameters.max_time_in_seconds = 0.0  # Cancelled before it started
+    if cancel is not None:
+        done = threading.Event()
+        watcher = threading.Thread(target=stop_on_cancel, args=(solver, cancel, done), daemon=True)
+        watcher.start()
+    try:
+        status = solver.Solve(model, timer)
+    finally:
+        if cancel is not None:
+            done.set()
+            watcher.join()
+
+    # Extract the allocation from the solution
+    extract_started = time.perf_counter()
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        schedule = read_schedule(solver)
+    else:
+        schedule = Schedule.from_result({}, available_days, len(time_slots))
+    result = schedule if as_schedule else schedule.to_result()
+    extract_time = time.perf_counter() - extract_started
+
+    # print(json.dumps(result, indent=4, skipkeys=False))
+
+    if return_stats:
+        cancelled = status != cp_model.OPTIMAL and (timer.stopped or (cancel is not None and cancel.is_set()))
+        return status, result, dict(get_solve_stats(solver, status, timer), build_time=build_time, extract_time=extract_time, cancelled=cancelled,
+                                    **model_size(model))
+    return status, result
+
+# The solved week as a Schedule: the fixed constraints first, then the allocated (day, slot, project_idx) of the projects
+# in the slots left free. The name table has the names of the projects, then the ones of the fixed constraints.
+def build_schedule(available_days, time_slots, projects, fixed_constraints, allocated):
+    ids = {}
+    for name in [project['name'] for project in projects] + [constraint['name'] for constraint in fixed_constraints]:
+        ids.setdefault(name, len(ids) + 1)
+    grid = np.zeros((len(available_days), len(time_slots)), dtype=id_dtype(len(ids)))
+
+    for constraint in fixed_constraints:
+        constraint_start_slot = time_to_slot(constraint['start_time'], time_slots)
+        constraint_end_slot = time_to_slot(constraint['end_time'], time_slots)
+        grid[available_days.index(constraint['day']), constraint_start_slot:constraint_end_slot] = ids[constraint['name']]
+
+    # Project allocations only go to slots not already occupied by a fixed constraint
+    if len(allocated):
+        allocated = np.asarray(allocated)
+        days, slots = allocated[:, 0], allocated[:, 1]
+        free = grid[days, slots] == 0
+        project_ids = np.array([ids[project['name']] for project in projects])
+        grid[days[free], slots[free]] = project_ids[allocated[free, 2]]
+    return Schedule(available_days, ids, grid)
+
+# Number of variables and constraints of a model
+def model_size(model):
+    proto = model.Proto()
+    return {'variables': len(proto.variables), 'constraints': len(proto.constraints)}
+
+# Builds the original formulation: a start and an allocation bool for every project, block, day and slot.
+# hints is a dict (project_idx, block) -> (day, start_slot, extra_slots) from solution_hints.
+# Returns the model and a function that yields the allocated (day, slot, project_idx) from a solved model.
+def build_boolean_model(available_days, time_slots, projects, fixed_constraints, symmetry_breaking=True, hints=None, objective='separation'):
+    masks = availability_masks(available_days, time_slots, fixed_constraints)
+    model, variables = boolean_formulation(len(available_days), time_slots, projects, masks, symmetry_breaking, objective)
+    add_boolean_hints(model, variables, time_slots, projects, hints)
+    return model, boolean_extractor(variables, len(available_days), time_slots, projects)
+
+# The boolean formulation of a week of num_days days, with masks holding the free slots of each day (see availability_masks).
+# Returns the model and its variables, a dict with the 'block_start', 'allocation', 'day_assigned' and 'separation' dicts.
+def boolean_formulation(num_days, time_slots, projects, masks, symmetry_breaking=True, objective='separation'):
     model = cp_model.CpModel()
 
     allocation = {}
     block_start = {}
     day_assigned = {}
 
-    time_slots = pd.date_range(start=start_time, end=end_time, freq='30min')[:-1].strftime('%H:%M')
-    num_days = len(available_days)
     num_slots = len(time_slots)
     # print("Num days:", num_days)
     # print("Num slots:", num_slots)
 
+    # Valid start slots of each block length on each day, from the free slots left by the fixed constraints.
+    # Only these starts (and the slots they cover) get variables: blocked slots need no variables nor constraints,
+    # so the busier the calendar, the smaller the model.
+    starts = {}
+    for project in projects:
+        block_duration_slots = time_slots.duration_slots(project['hours_per_block'])
+        for day in range(num_days):
+            if (day, block_duration_slots) not in starts:
+                starts[(day, block_duration_slots)] = valid_starts(masks[day], num_slots, block_duration_slots)
+
     # Define decision variables
     for project_idx, project in enumerate(projects):
-        block_duration_slots = int(project['hours_per_block'] * 2)
+        block_duration_slots = time_slots.duration_slots(project['hours_per_block'])
         for block in range(project['blocks_per_week']):
             for day in range(num_days):
-                for slot in range(num_slots - block_duration_slots + 1):  # Ensure enough slots for a full block
+                for slot in starts[(day, block_duration_slots)]:  # Blocks that fit in the free time
                     block_start[(project_idx, block, day, slot)] = model.NewBoolVar(f'start_{project_idx}_{block}_{day}_{slot}')
                     for s in range(slot, slot + block_duration_slots):
-                        allocation[(project_idx, block, day, s)] = model.NewBoolVar(f'alloc_{project_idx}_{block}_{day}_{s}')
-            day_assigned[(project_idx, block)] = model.NewIntVar(0, num_days - 1, f'day_assigned_{project_idx}_{block}')
+                        if (project_idx, block, day, s) not in allocation:
+                            allocation[(project_idx, block, day, s)] = model.NewBoolVar(f'alloc_{project_idx}_{block}_{day}_{s}')
+            # The min_gap objective orders the blocks by day, so each one only has the days its rank leaves
+            first_day, last_day = block_days(block, project['blocks_per_week'], num_days) if objective == 'min_gap' else (0, num_days - 1)
+            day_assigned[(project_idx, block)] = model.NewIntVar(first_day, last_day, f'day_assigned_{project_idx}_{block}')
 
-    # Set the fixed constraints
-    for constraint in fixed_constraints:
-        constraint_day = available_days.index(constraint['day'])
-        constraint_start_slot = time_to_slot(constraint['start_time'], time_slots)
-        constraint_end_slot = time_to_slot(constraint['end_time'], time_slots)
-        
-        for slot in range(constraint_start_slot, constraint_end_slot):
-            for project_idx, project in enumerate(projects):
-                block_duration_slots = int(project['hours_per_block'] * 2)
-                for block in range(project['blocks_per_week']):
-                    # Prevent the block from starting during fixed constraints
-                    if slot < num_slots - block_duration_slots + 1:
-                        model.Add(block_start[(project_idx, block, constraint_day, slot)] == 0)
-                    # Prevent any allocation during fixed constraints
-                    model.Add(allocation[(project_idx, block, constraint_day, slot)] == 0)
-    
     # Each project block should be assigned through consecutive slots on the same day
-    for project_idx, project in enumerate(projects):
-        block_duration_slots = int(project['hours_per_block'] * 2)
-        for block in range(project['blocks_per_week']):
-            for day in range(num_days):
-                for slot in range(num_slots - block_duration_slots + 1):
-                    # Ensure consecutive allocation for the block
-                    model.Add(sum(allocation[(project_idx, block, day, s)] for s in range(slot, slot + block_duration_slots)) == block_duration_slots).OnlyEnforceIf(block_start[(project_idx, block, day, slot)])
-                    model.Add(day_assigned[(project_idx, block)] == day).OnlyEnforceIf(block_start[(project_idx, block, day, slot)])
+    for (project_idx, block, day, slot), start in block_start.items():
+        block_duration_slots = time_slots.duration_slots(projects[project_idx]['hours_per_block'])
+        # Ensure consecutive allocation for the block
+        model.Add(sum(allocation[(project_idx, block, day, s)] for s in range(slot, slot + block_duration_slots)) == block_duration_slots).OnlyEnforceIf(start)
+        model.Add(day_assigned[(project_idx, block)] == day).OnlyEnforceIf(start)
 
     # Each slot should be assigned at most one project
-    for day in range(num_days):
-        for slot in range(num_slots):
-            model.Add(sum(allocation[(project_idx, block, day, slot)]
-                          for project_idx, project in enumerate(projects)
-                          for block in range(project['blocks_per_week'])
-                          if (project_idx, block, day, slot) in allocation) <= 1)
-    
+    slot_allocations = {}
+    for (project_idx, block, day, slot), variable in allocation.items():
+        slot_allocations.setdefault((day, slot), []).append(variable)
+    for variables in slot_allocations.values():
+        if len(variables) > 1:
+            model.Add(sum(variables) <= 1)
+
     # For a given day, only one full block should be assigned for a given project
-    for project_idx, project in enumerate(projects):
-        for day in range(num_days):
-            # Sum over all blocks and possible start slots to ensure only one block starts per day for each project
-            model.Add(sum(block_start[(project_idx, block, day, slot)]
-                        for block in range(project['blocks_per_week'])
-                        for slot in range(num_slots - int(project['hours_per_block'] * 2) + 1)) <= 1)
-    
+    day_starts = {}
+    for (project_idx, block, day, slot), start in block_start.items():
+        day_starts.setdefault((project_idx, day), []).append(start)
+    for variables in day_starts.values():
+        if len(variables) > 1:
+            model.Add(sum(variables) <= 1)
+
     # Ensure all blocks specified per project are allocated
+    project_allocations = {project_idx: [] for project_idx in range(len(projects))}
+    for (project_idx, block, day, slot), variable in allocation.items():
+        project_allocations[project_idx].append(variable)
     for project_idx, project in enumerate(projects):
-        model.Add(sum(allocation[(project_idx, block, day, slot )] 
-                      for block in range(project['blocks_per_week']) 
-                      for day in range(num_days) 
-                      for slot in range(num_slots)) == int(project['blocks_per_week'] * project['hours_per_block'] * 2))
-        
+        model.Add(sum(project_allocations[project_idx]) == project['blocks_per_week'] * time_slots.duration_slots(project['hours_per_block']))
+
     # Define a variable to store total separation days for a project
-    separation_variables = []
+    separation_variables = {}
     for project_idx, project in enumerate(projects):
         blocks_per_week = project['blocks_per_week']
         
-        if blocks_per_week > 1:  # Only consider projects with more than one block
+        if blocks_per_week > 1 and objective == 'separation':  # Only consider projects with more than one block
             for block in range(blocks_per_week - 1):
                 # Create variable for separation between current block and the next block
                 separation = model.NewIntVar(0, num_days - 1, f'separation_{project_idx}_{block}')
                 # Ensure separation calculation
                 model.Add(separation == day_assigned[(project_idx, block + 1)] - day_assigned[(project_idx, block)])
-                separation_variables.append(separation)
-    
-    # Maximize the number of slots used (somehow also enforces consecutive slots)
-    slot_usage_objective = sum(block_start[(project_idx, block, day, slot)]
-                           for project_idx, project in enumerate(projects)
-                           for block in range(project['blocks_per_week'])
-                           for day in range(num_days)
-                           for slot in range(num_slots - int(project['hours_per_block'] * 2) + 1))
-
-    # Maximize the total separation across all blocks
-    separation_objective = sum(separation_variables)
-
-    # Combine both objectives
-    model.Maximize(slot_usage_objective + separation_objective)
-      
-    # Solve the model
-    solver = cp_model.CpSolver()
-    solver.parameters.linearization_level = 0
-    status = solver.Solve(model)
+                separation_variables[(project_idx, block)] = separation
+
+    if symmetry_breaking:
+        add_block_ordering(model, projects, day_assigned)
+
+    if objective == 'min_gap':
+        # The placed blocks aren't in the objective, so every block must have a start
+        block_starts = {}
+        for (project_idx, block, day, slot), start in block_start.items():
+            block_starts.setdefault((project_idx, block), []).append(start)
+        for key in day_assigned:
+            model.AddExactlyOne(block_starts.get(key, []))
+        # and every allocated slot must be covered by a start of its block
+        covering_starts = {}
+        for (project_idx, block, day, slot), start in block_start.items():
+            for s in range(slot, slot + time_slots.duration_slots(projects[project_idx]['hours_per_block'])):
+                covering_starts.setdefault((project_idx, block, day, s), []).append(start)
+        for key, variable in allocation.items():
+            model.AddBoolOr(covering_starts[key]).OnlyEnforceIf(variable)
+        add_min_gap_objective(model, projects, day_assigned, num_days)
+    else:
+        # Maximize the number of slots used (somehow also enforces consecutive slots)
+        slot_usage_objective = sum(block_start.values())
 
-    # Extract the allocation from the solution
-    result = {}
-    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        # Initialize result dictionary with fixed constraints
-        for constraint in fixed_constraints:
-            constraint_day = available_days.index(constraint['day'])
-            constraint_start_slot = time_to_slot(constraint['start_time'], time_slots)
-            constraint_end_slot = time_to_slot(constraint['end_time'], time_slots)
-            for slot in range(constraint_start_slot, constraint_end_slot):
-                result.setdefault(constraint['day'], {})[slot] = constraint['name']
+        # Maximize the total separation across all blocks
+        separation_objective = sum(separation_variables.values())
+
+        # Combine both objectives
+        model.Maximize(slot_usage_objective + separation_objective)
 
-        # Add project allocations to the result
+    return model, {'block_start': block_start, 'allocation': allocation, 'day_assigned': day_assigned, 'separation': separation_variables}
+
+# Rules out the variables of a boolean formulation built with more free slots than masks has (a model template):
+# the starts of blocks that don't fit in the free time any more, and the allocations of slots no remaining start covers.
+# Their domain is set to 0 in the proto rather than adding a constraint each, CP-SAT's presolve then removes them.
+def restrict_boolean_model(model, variables, masks, time_slots, projects):
+    proto_variables = model.Proto().variables
+    num_slots = len(time_slots)
+    durations = [time_slots.duration_slots(project['hours_per_block']) for project in projects]
+    starts = {}
+    covered = {}
+    for block_duration_slots in set(durations):
+        for day, mask in enumerate(masks):
+            starts[(day, block_duration_slots)] = set(valid_starts(mask, num_slots, block_duration_slots))
+            covered[(day, block_duration_slots)] = {s for slot in starts[(day, block_duration_slots)] for s in range(slot, slot + block_duration_slots)}
+    for (project_idx, block, day, slot), start in variables['block_start'].items():
+        if slot not in starts[(day, durations[project_idx])]:
+            proto_variables[start.Index()].domain[1] = 0
+    for (project_idx, block, day, slot), variable in variables['allocation'].items():
+        if slot not in covered[(day, durations[project_idx])]:
+            proto_variables[variable.Index()].domain[1] = 0
+
+# Seeds the search of a boolean formulation with the hinted blocks. CP-SAT only follows a hint it can complete, so every
+# start and allocation of the hinted blocks is hinted, the zeros included, as well as the allocations of the other blocks
+# on the slots the hinted ones take, and the separations between hinted blocks.
+def add_boolean_hints(model, variables, time_slots, projects, hints):
+    block_start, allocation, day_assigned, separation = variables['block_start'], variables['allocation'], variables['day_assigned'], variables['separation']
+    hints = {key: hint for key, hint in (hints or {}).items() if hint[1] is None or (key[0], key[1], hint[0], hint[1]) in block_start}
+    if not hints:
+        return
+    hinted_slots = {}
+    for (project_idx, block), (day, slot, extra_slots) in hints.items():
+        block_slots = {(day, s) for s in range(slot, slot + time_slots.duration_slots(projects[project_idx]['hours_per_block']))} if slot is not None else set()
+        hinted_slots[(project_idx, block)] = block_slots.union(extra_slots)
+    taken = set().union(*hinted_slots.values())
+    for (project_idx, block, day, slot), start in block_start.items():
+        if (project_idx, block) in hints:
+            model.AddHint(start, hints[(project_idx, block)][:2] == (day, slot))
+    for (project_idx, block, day, slot), variable in allocation.items():
+        if (project_idx, block) in hints:
+            model.AddHint(variable, (day, slot) in hinted_slots[(project_idx, block)])
+        elif (day, slot) in taken:
+            model.AddHint(variable, 0)
+    for (project_idx, block), (day, slot, extra_slots) in hints.items():
+        model.AddHint(day_assigned[(project_idx, block)], day)
+    for (project_idx, block), variable in separation.items():
+        if (project_idx, block) in hints and (project_idx, block + 1) in hints:
+            model.AddHint(variable, hints[(project_idx, block + 1)][0] - hints[(project_idx, block)][0])
+
+# The extract_allocation function of a boolean formulation.
+# With bulk=True the values of all the variables are read at once from the solver response, and only the
+# allocation variables that exist are looked at. bulk=False is the original scan of every (day, slot, project, block)
+# with a solver.Value() call each, kept for comparison. Both return the same sorted list.
+# solver can also be a solution callback, to read the solution it was called with.
+def boolean_extractor(variables, num_days, time_slots, projects):
+    allocation = variables['allocation']
+    num_slots = len(time_slots)
+
+    def extract_allocation(solver, bulk=True):
+        if bulk:
+            values = solver.response_proto.solution
+            return sorted((day, slot, project_idx) for (project_idx, block, day, slot), variable in allocation.items() if values[variable.Index()])
+        allocated = []
         for day in range(num_days):
             for slot in range(num_slots):
                 for project_idx, project in enumerate(projects):
                     for block in range(project['blocks_per_week']):
                         if (project_idx, block, day, slot) in allocation and solver.Value(allocation[(project_idx, block, day, slot)]):
-                            project_name = projects[project_idx]['name']
-                            # Only set project name if not already occupied by a fixed constraint
-                            if slot not in result.get(available_days[day], {}):
-                                result.setdefault(available_days[day], {})[slot] = project_name
+                            allocated.append((day, slot, project_idx))
+        return allocated
+
+    return extract_allocation
+
+# Breaks the symmetry between the blocks of a project: they are interchangeable, so we only keep
+# the solutions where block b is assigned to an earlier day than block b + 1.
+# Since a project gets at most one block per day, this doesn't remove any distinct timetable.
+# The separations (and the gaps of min_gap) can't be negative, so they already imply this order. Stating it directly still
+# helps the boolean engine, which finds better timetables within the time limit with it (see benchmarks/symmetry.py);
+# the interval engine mostly gains from the days block_days leaves to each block.
+def add_block_ordering(model, projects, day_assigned):
+    for project_idx, project in enumerate(projects):
+        for block in range(project['blocks_per_week'] - 1):
+            model.Add(day_assigned[(project_idx, block)] < day_assigned[(project_idx, block + 1)])
+
+# First and last day block can have when the blocks_per_week blocks of a project are ordered by day:
+# block b needs b days before it and the remaining blocks after it
+def block_days(block, blocks_per_week, num_days):
+    if blocks_per_week > num_days:  # More blocks than days, the model is infeasible anyway
+        return 0, num_days - 1
+    return block, num_days - blocks_per_week + block
+
+# The 'min_gap' objective: maximizes the weighted sum of the smallest gap, in days, between the consecutive blocks of each project.
+# The gaps are at least 1 day, which also orders the blocks by day (as add_block_ordering does). n blocks on num_days days
+# can't all be more than (num_days - 1) // (n - 1) days apart, which bounds each smallest gap from the start, so a timetable
+# reaching the bounds is proved optimal right away, and the others get a tight bound to prove against.
+def add_min_gap_objective(model, projects, day_assigned, num_days):
+    terms = []
+    for project_idx, project in enumerate(projects):
+        blocks_per_week = project['blocks_per_week']
+        if blocks_per_week < 2:  # A single block has no gap
+            continue
+        min_gap = model.NewIntVar(1, max(1, (num_days - 1) // (blocks_per_week - 1)), f'min_gap_{project_idx}')
+        for block in range(blocks_per_week - 1):
+            model.Add(day_assigned[(project_idx, block + 1)] - day_assigned[(project_idx, block)] >= min_gap)
+        terms.append(int(project.get('weight', 1)) * min_gap)
+    model.Maximize(sum(terms))
+
+# Builds the interval formulation: every project block gets one optional fixed-size interval per day,
+# and the intervals of each day (including the fixed constraints) can't overlap.
+# The model grows with projects x blocks x days, independently of the number of slots.
+# Returns the model and a function that yields the allocated (day, slot, project_idx) from a solved model.
+def build_interval_model(available_days, time_slots, projects, fixed_constraints, symmetry_breaking=True, hints=None, objective='separation'):
+    model, variables = interval_formulation(len(available_days), time_slots, projects, symmetry_breaking, objective)
+    add_fixed_intervals(model, variables, available_days, time_slots, fixed_constraints)
+    add_interval_hints(model, variables, len(available_days), hints)
+    return model, interval_extractor(variables, time_slots, projects)
+
+# The interval formulation of a week of num_days days, without the fixed constraints (see add_fixed_intervals).
+# Returns the model and its variables, a dict with the 'block_present', 'block_start', 'day_assigned' and 'separation' dicts,
+# and the index of the no-overlap constraint of each day in 'no_overlap'.
+def interval_formulation(num_days, time_slots, projects, symmetry_breaking=True, objective='separation'):
+    model = cp_model.CpModel()
 
+    block_present = {}
+    block_start = {}
+    day_assigned = {}
+    day_intervals = [[] for _ in range(num_days)]
 
-    # print(json.dumps(result, indent=4, skipkeys=False))
+    num_slots = len(time_slots)
 
-    return status, result
+    # Define decision variables: one optional interval per project block and day
+    for project_idx, project in enumerate(projects):
+        block_duration_slots = time_slots.duration_slots(project['hours_per_block'])
+        for block in range(project['blocks_per_week']):
+            for day in range(num_days):
+                if block_duration_slots > num_slots:  # The block doesn't fit in a day
+                    continue
+                # With ordered blocks (symmetry breaking or the min_gap objective), block b only goes on the days of block_days
+                first_day, last_day = block_days(block, project['blocks_per_week'], num_days)
+                if (symmetry_breaking or objective == 'min_gap') and not first_day <= day <= last_day:
+                    continue
+                present = model.NewBoolVar(f'present_{project_idx}_{block}_{day}')
+                start = model.NewIntVar(0, num_slots - block_duration_slots, f'start_{project_idx}_{block}_{day}')
+                day_intervals[day].append(model.NewOptionalFixedSizeIntervalVar(start, block_duration_slots, present, f'interval_{project_idx}_{block}_{day}'))
+                block_present[(project_idx, block, day)] = present
+                block_start[(project_idx, block, day)] = start
+            day_assigned[(project_idx, block)] = model.NewIntVar(0, num_days - 1, f'day_assigned_{project_idx}_{block}')
 
-# Function to create a timetable
-def create_timetable(available_days, start_time, end_time, result):
-    time_slots = pd.date_range(start=start_time, end=end_time, freq='30min')[:-1].strftime('%H:%M')
-    timetable = pd.DataFrame(index=time_slots, columns=available_days)
-    
-    for day, slots in result.items():
-        for slot, project_name in slots.items():
-            timetable.at[time_slots[slot], day] = project_name
-       
-    return timetable
+    # Each slot should be assigned at most one project or fixed constraint
+    no_overlap = [model.AddNoOverlap(intervals).Index() for intervals in day_intervals]
+
+    for project_idx, project in enumerate(projects):
+        for block in range(project['blocks_per_week']):
+            presences = [block_present[key] for key in ((project_idx, block, day) for day in range(num_days)) if key in block_present]
+            # Ensure all blocks specified per project are allocated, each one on a single day
+            model.AddExactlyOne(presences)
+            model.Add(day_assigned[(project_idx, block)] == sum(day * block_present[(project_idx, block, day)] for day in range(num_days) if (project_idx, block, day) in block_present))
+
+        # For a given day, only one full block should be assigned for a given project
+        for day in range(num_days):
+            model.AddAtMostOne(block_present[(project_idx, block, day)] for block in range(project['blocks_per_week']) if (project_idx, block, day) in block_present)
+
+    # Define a variable to store total separation days for a project
+    separation_variables = {}
+    for project_idx, project in enumerate(projects):
+        blocks_per_week = project['blocks_per_week']
+
+        if blocks_per_week > 1 and objective == 'separation':  # Only consider projects with more than one block
+            for block in range(blocks_per_week - 1):
+                separation = model.NewIntVar(0, num_days - 1, f'separation_{project_idx}_{block}')
+                model.Add(separation == day_assigned[(project_idx, block + 1)] - day_assigned[(project_idx, block)])
+                separation_variables[(project_idx, block)] = separation
+
+    if symmetry_breaking:
+        add_block_ordering(model, projects, day_assigned)
+
+    if objective == 'min_gap':
+        add_min_gap_objective(model, projects, day_assigned, num_days)
+    else:
+        # Same objective as the boolean formulation: placed blocks plus the total separation
+        model.Maximize(sum(block_present.values()) + sum(separation_variables.values()))
+
+    return model, {'block_present': block_present, 'block_start': block_start, 'day_assigned': day_assigned, 'separation': separation_variables,
+                   'no_overlap': no_overlap}
+
+# Fixed constraints are mandatory intervals on their day, added to the no-overlap constraint of the day.
+# Overlapping constraints are allowed, so the busy slots of each day are merged into runs before creating the intervals.
+def add_fixed_intervals(model, variables, available_days, time_slots, fixed_constraints):
+    busy_slots = [set() for _ in available_days]
+    for constraint in fixed_constraints:
+        constraint_day = available_days.index(constraint['day'])
+        constraint_start_slot = time_to_slot(constraint['start_time'], time_slots)
+        constraint_end_slot = time_to_slot(constraint['end_time'], time_slots)
+        busy_slots[constraint_day].update(range(constraint_start_slot, constraint_end_slot))
+    constraints = model.Proto().constraints
+    for day in range(len(available_days)):
+        for slot in sorted(busy_slots[day]):
+            if slot - 1 not in busy_slots[day]:
+                run_end = slot
+                while run_end in busy_slots[day]:
+                    run_end += 1
+                interval = model.NewFixedSizeIntervalVar(slot, run_end - slot, f'fixed_{day}_{slot}')
+                constraints[variables['no_overlap'][day]].no_overlap.intervals.append(interval.Index())
+
+# Seeds the search of an interval formulation with the hinted blocks
+def add_interval_hints(model, variables, num_days, hints):
+    block_present, block_start, day_assigned = variables['block_present'], variables['block_start'], variables['day_assigned']
+    # The blocks without a start of a boolean result have no interval
+    hints = {key: hint for key, hint in (hints or {}).items() if hint[1] is not None and (key[0], key[1], hint[0]) in block_present}
+    for (project_idx, block), (day, slot, extra_slots) in hints.items():
+        for other_day in range(num_days):
+            if (project_idx, block, other_day) in block_present:
+                model.AddHint(block_present[(project_idx, block, other_day)], other_day == day)
+        model.AddHint(block_start[(project_idx, block, day)], slot)
+        model.AddHint(day_assigned[(project_idx, block)], day)
+    for (project_idx, block), variable in variables['separation'].items():
+        if (project_idx, block) in hints and (project_idx, block + 1) in hints:
+            model.AddHint(variable, hints[(project_idx, block + 1)][0] - hints[(project_idx, block)][0])
+
+# The extract_allocation function of an interval formulation: it reads the presence and the start of each block once
+# (bulk=True reads them from the solver response, see boolean_extractor)
+def interval_extractor(variables, time_slots, projects):
+    block_present, block_start = variables['block_present'], variables['block_start']
+
+    def extract_allocation(solver, bulk=True):
+        values = solver.response_proto.solution if bulk else None
+        allocated = []
+        for (project_idx, block, day), present in block_present.items():
+            if values[present.Index()] if bulk else solver.BooleanValue(present):
+                start_variable = block_start[(project_idx, block, day)]
+                start = values[start_variable.Index()] if bulk else solver.Value(start_variable)
+                block_duration_slots = time_slots.duration_slots(projects[project_idx]['hours_per_block'])
+                allocated.extend((day, slot, project_idx) for slot in range(start, start + block_duration_slots))
+        return sorted(allocated)
+
+    return extract_allocation
+
+# Key of the model template of a request: what the model depends on apart from the fixed constraints and the hints,
+# i.e. the engine and objective, the number of days and slots, and the length, number and weight of the blocks of each project
+# (not their names).
+def template_key(engine, available_days, time_slots, projects, symmetry_breaking=True, objective='separation'):
+    shapes = tuple((time_slots.duration_slots(project['hours_per_block']), project['blocks_per_week'], int(project.get('weight', 1))) for project in projects)
+    return (engine, objective, bool(symmetry_breaking), len(available_days), len(time_slots), shapes)
+
+# Builds the model template of a week shape (see template_key): the formulation of the engine for a week without fixed constraints.
+# Requests with the same shape clone it and only add their own fixed constraints and hints (model_from_template).
+def build_model_template(engine, num_days, time_slots, projects, symmetry_breaking=True, objective='separation'):
+    if engine == 'interval':
+        model, variables = interval_formulation(num_days, time_slots, projects, symmetry_breaking, objective)
+    else:
+        model, variables = boolean_formulation(num_days, time_slots, projects, [(1 << len(time_slots)) - 1] * num_days, symmetry_breaking, objective)
+    return {'engine': engine, 'model': model, 'variables': variables}
+
+# The model of a request from the template of its week shape, and its extract_allocation, as the build_*_model functions return them.
+# The template is cloned (a copy of its proto, instead of building the model in Python) and isn't changed, so it can be shared.
+# The variables of the template are the ones of the clone, they are only used through their index.
+def model_from_template(template, available_days, time_slots, projects, fixed_constraints, hints=None):
+    model = template['model'].clone()
+    variables = template['variables']
+    if template['engine'] == 'interval':
+        add_fixed_intervals(model, variables, available_days, time_slots, fixed_constraints)
+        add_interval_hints(model, variables, len(available_days), hints)
+        return model, interval_extractor(variables, time_slots, projects)
+    restrict_boolean_model(model, variables, availability_masks(available_days, time_slots, fixed_constraints), time_slots, projects)
+    add_boolean_hints(model, variables, time_slots, projects, hints)
+    return model, boolean_extractor(variables, len(available_days), time_slots, projects)
+
+# Function to create a timetable (time_slots is the SlotGrid the result was scheduled on)
+# The result is read as a Schedule: its matrix of ids is turned into names (NaN for free slots) in one numpy lookup,
+# then wrapped in a DataFrame (instead of setting the cells one by one).
+def create_timetable(available_days, start_time, end_time, result, time_slots=None):
+    if time_slots is None:
+        time_slots = SlotGrid(start_time, end_time)
+    schedule = Schedule.of(result, available_days, len(time_slots))
+    names = np.array([np.nan] + list(schedule.names), dtype=object)
+    ids = np.zeros((len(time_slots), len(available_days)), dtype=schedule.grid.dtype)
+    for column, day in enumerate(available_days):
+        if day in schedule.days:
+            row = schedule.grid[schedule.days.index(day), :len(time_slots)]
+            ids[:len(row), column] = row
+    return pd.DataFrame(names[ids], index=time_slots.labels, columns=available_days, dtype=object)
 
 # Function to display timetable with tabulate
 def print_timetable(timetable, available_days):
@@ -231,18 +846,21 @@ def print_timetable(timetable, available_days):
     print("\nWeekly Timetable:")
     print(table)
 
-# Function to print project statistics
-def get_project_statistics(projects, result, print_stats=False):
+# Function to print project statistics (time_slots is the SlotGrid the result was scheduled on, 30 min slots by default)
+# result is a {day: {slot: name}} dict or a Schedule.
+def get_project_statistics(projects, result, print_stats=False, time_slots=None):
+    slot_hours = time_slots.slot_minutes / 60 if time_slots else 0.5
+
     project_stats = {project['name']: {'assigned_slots': 0, 'total_hours': 0} for project in projects}
 
-    for day, slots in result.items():
-        for slot, name in slots.items():
-            if name in project_stats:
-                project_stats[name]['assigned_slots'] += 1
+    # Slots of each name, counted on the matrix of the schedule
+    slot_counts = Schedule.of(result).slot_counts()
+    for name in project_stats:
+        project_stats[name]['assigned_slots'] = slot_counts.get(name, 0)
 
     for project in projects:
         project_name = project['name']
-        project_stats[project_name]['total_hours'] = (project_stats[project_name]['assigned_slots'] / 2)  # Each slot is 30 minutes
+        project_stats[project_name]['total_hours'] = project_stats[project_name]['assigned_slots'] * slot_hours
 
     stats = []
     for project in projects:
@@ -260,7 +878,7 @@ def get_project_statistics(projects, result, print_stats=False):
             "Hours per Block": project['hours_per_block'],
             "Total Target Hours": initial_hours,
             "Assigned Slots": assigned_slots,
-            "Assigned Blocks": int(assigned_slots / 2 / project['hours_per_block']),
+            "Assigned Blocks": int(assigned_slots * slot_hours / project['hours_per_block']),
             "Total Assigned Hours": assigned_hours
         })
 
@@ -0,0 +1,121 @@
+from itertools import groupby
+import base64
+import json
+import struct
+import numpy as np
+
+# Header of the binary serialization, followed by the length of the JSON header and the raw matrix
+MAGIC = b'SCH1'
+
+# Smallest unsigned int type for the activity ids of a name table (0 is a free slot), little-endian so the bytes are portable
+def id_dtype(num_names):
+    return np.dtype('<u1') if num_names < 2**8 else np.dtype('<u2') if num_names < 2**16 else np.dtype('<u4')
+
+# A solved week as a small-int matrix of activity ids, one row per day and one column per slot, plus the name table.
+# Slot (day, slot) holds names[id - 1], or nothing when the id is 0. Statistics, timetables and PDFs read the matrix,
+# instead of walking the {day: {slot: name}} dicts of schedule_blocks (to_result and from_result convert between both).
+# The matrix is read-only, so a Schedule can be shared (by the result cache for instance) without copying it.
+class Schedule:
+    __slots__ = ('days', 'names', 'grid')
+
+    def __init__(self, days, names, grid):
+        self.days = tuple(days)
+        self.names = tuple(names)
+        self.grid = np.asarray(grid, dtype=id_dtype(len(self.names)))
+        self.grid.setflags(write=False)
+
+    def __eq__(self, other):
+        if not isinstance(other, Schedule):
+            return NotImplemented
+        return self.days == other.days and self.names == other.names and np.array_equal(self.grid, other.grid)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Schedule({len(self.days)} days, {self.num_slots} slots, {len(self.names)} names)"
+
+    @property
+    def num_slots(self):
+        return self.grid.shape[1]
+
+    # Builds a schedule from a {day: {slot: name}} result. The days are the keys of the result unless given,
+    # and there are at least as many slots as the last slot used.
+    @classmethod
+    def from_result(cls, result, days=None, num_slots=None):
+        days = list(result) if days is None else list(days)
+        rows = {day: row for row, day in enumerate(days)}
+        ids = {}
+        cells = []
+        for day, slots in result.items():
+            if day not in rows:
+                continue
+            for slot, name in slots.items():
+                cells.append((rows[day], int(slot), ids.setdefault(name, len(ids) + 1)))
+        num_slots = max([num_slots or 0] + [slot + 1 for row, slot, activity in cells])
+        grid = np.zeros((len(days), num_slots), dtype=id_dtype(len(ids)))
+        if cells:
+            cells = np.array(cells)
+            grid[cells[:, 0], cells[:, 1]] = cells[:, 2]
+        return cls(days, ids, grid)
+
+    # A result as a Schedule: schedules are returned as they are, dicts are converted with from_result
+    @classmethod
+    def of(cls, result, days=None, num_slots=None):
+        return result if isinstance(result, Schedule) else cls.from_result(result, days, num_slots)
+
+    # The {day: {slot: name}} result, as returned by schedule_blocks (days without anything are left out)
+    def to_result(self):
+        result = {}
+        for row, day in enumerate(self.days):
+            slots = np.flatnonzero(self.grid[row])
+            if len(slots):
+                ids = self.grid[row, slots]
+                result[day] = {int(slot): self.names[activity - 1] for slot, activity in zip(slots, ids)}
+        return result
+
+    # Number of slots of each name
+    def slot_counts(self):
+        counts = np.bincount(self.grid.ravel(), minlength=len(self.names) + 1)
+        return {name: int(count) for name, count in zip(self.names, counts[1:])}
+
+    # Runs of consecutive slots with the same name in a day: [first slot, number of slots, name] (the block cells of the PDF).
+    # A day is a few dozen slots, grouping the row as a list is faster than numpy there.
+    def runs(self, day):
+        if day not in self.days:
+            return []
+        cells = []
+        slot = 0
+        for activity, group in groupby(self.grid[self.days.index(day)].tolist()):
+            length = sum(1 for _ in group)
+            if activity:
+                cells.append([slot, length, self.names[activity - 1]])
+            slot += length
+        return cells
+
+    # JSON-friendly form, with the matrix as base64 (a few hundred bytes for a week)
+    def to_dict(self):
+        return {'days': list(self.days), 'names': list(self.names), 'slots': self.num_slots,
+                'grid': base64.b64encode(self.grid.tobytes()).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        grid = np.frombuffer(base64.b64decode(data['grid']), dtype=id_dtype(len(data['names'])))
+        return cls(data['days'], data['names'], grid.reshape(len(data['days']), data['slots']))
+
+    # Binary form: MAGIC, the length of a JSON header with the days, names and slots, the header and the raw matrix
+    def to_bytes(self):
+        header = json.dumps({'days': self.days, 'names': self.names, 'slots': self.num_slots}, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        return MAGIC + struct.pack('<I', len(header)) + header + self.grid.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError("Not a serialized schedule")
+        header_length, = struct.unpack('<I', data[4:8])
+        header = json.loads(data[8:8 + header_length].decode('utf-8'))
+        grid = np.frombuffer(data[8 + header_length:], dtype=id_dtype(len(header['names'])))
+        return cls(header['days'], header['names'], grid.reshape(len(header['days']), header['slots']))
+
+# A result as a {day: {slot: name}} dict
+def as_result(result):
+    return result.to_result() if isinstance(result, Schedule) else result
@@ -18,6 +18,19 @@ document.getElementById('end_time').addEventListener('change', function () {
     });
 });
 
+// Hours per block must be a whole number of time slots
+function hoursStep() {
+    return parseInt(document.getElementById('slot_minutes').value) / 60;
+}
+
+function updateHoursStep() {
+    var step = hoursStep();
+    document.querySelectorAll('input[name$="[hours_per_block]"]').forEach(function (input) {
+        input.step = step;
+        input.min = step;
+    });
+}
+
 function addProject() {
     var projectCount = parseInt(document.getElementById('project_count').value);
     var projectsContainer = document.getElementById('projects-container');
@@ -26,7 +39,7 @@ function addProject() {
     newRow.innerHTML = `
         <td><input type="text" class="form-control" name="projects[${projectCount}][name]" required></td>
         <td><input type="number" class="form-control" name="projects[${projectCount}][blocks_per_week]" value="3" min="1" required></td>
-        <td><input type="number" class="form-control" name="projects[${projectCount}][hours_per_block]" value="1" step="0.5" min="0.5" max="24" required></td>
+        <td><input type="number" class="form-control" name="projects[${projectCount}][hours_per_block]" value="1" step="${hoursStep()}" min="${hoursStep()}" max="24" required></td>
         <td><button type="button" class="btn btn-danger remove-btn" onclick="removeProject(this)">Remove</button></td>
     `;
 
@@ -93,4 +106,127 @@ function validateConstraints() {
         }
     }
     return true;
-}
\ No newline at end of file
+}
+
+// Streaming mode: the timetables found by the solver are shown as they come, and the current one can be kept
+// before the solver has proved it's the best. The events come from /generate/stream (Server-Sent Events, read with fetch
+// since EventSource can't post the form).
+var streamCancelUrl = null;
+
+function submitSchedule(form) {
+    if (!document.getElementById('stream_solutions').checked) {
+        return true;
+    }
+    streamSchedule(form);
+    return false;
+}
+
+function streamSchedule(form) {
+    var status = document.getElementById('stream-status');
+    document.getElementById('stream-preview').style.display = 'block';
+    document.getElementById('stream-timetable').innerHTML = '';
+    status.className = 'alert alert-info';
+    status.textContent = 'Searching for a timetable...';
+
+    fetch('/generate/stream', {method: 'POST', body: new FormData(form)})
+        .then(response => {
+            if (!response.ok) {
+                return response.json().then(body => { throw new Error(body.error); });
+            }
+            var reader = response.body.getReader();
+            var decoder = new TextDecoder();
+            var buffer = '';
+            function read() {
+                return reader.read().then(chunk => {
+                    if (chunk.done) {
+                        return;
+                    }
+                    buffer += decoder.decode(chunk.value, {stream: true});
+                    var events = buffer.split('\n\n');
+                    buffer = events.pop();
+                    events.forEach(handleStreamEvent);
+                    return read();
+                });
+            }
+            return read();
+        })
+        .catch(error => {
+            status.className = 'alert alert-danger';
+            status.textContent = error.message;
+        });
+}
+
+function handleStreamEvent(text) {
+    var event = null;
+    var data = '';
+    text.split('\n').forEach(line => {
+        if (line.startsWith('event: ')) {
+            event = line.slice(7);
+        } else if (line.startsWith('data: ')) {
+            data += line.slice(6);
+        }
+    });
+    data = JSON.parse(data);
+    var status = document.getElementById('stream-status');
+    var accept = document.getElementById('stream-accept');
+
+    if (event === 'start') {
+        streamCancelUrl = data.cancel_url;
+    } else if (event === 'solution') {
+        status.textContent = `Timetable #${data.solutions} found in ${data.wall_time.toFixed(2)} seconds (score ${data.objective}, ` +
+                             `best possible ${data.best_bound}). Still searching for a better one...`;
+        accept.disabled = false;
+        renderStreamedTimetable(data.result);
+    } else if (event === 'done') {
+        streamCancelUrl = null;
+        accept.disabled = true;
+        if (data.error) {
+            status.className = 'alert alert-danger';
+            status.textContent = data.error;
+        } else {
+            window.location = data.results_url;
+        }
+    }
+}
+
+// Stops the search, the stream then ends with the current timetable
+function acceptStreamedSolution() {
+    if (streamCancelUrl) {
+        document.getElementById('stream-accept').disabled = true;
+        fetch(streamCancelUrl, {method: 'POST'});
+    }
+}
+
+// Slot labels of the grid of the form, as in timeslots.SlotGrid
+function slotLabels() {
+    var start = document.getElementById('start_time').value.split(':').map(Number);
+    var end = document.getElementById('end_time').value.split(':').map(Number);
+    var slotMinutes = parseInt(document.getElementById('slot_minutes').value);
+    var labels = [];
+    for (var minute = start[0] * 60 + start[1]; minute < end[0] * 60 + end[1]; minute += slotMinutes) {
+        labels.push(`${String(Math.floor(minute / 60)).padStart(2, '0')}:${String(minute % 60).padStart(2, '0')}`);
+    }
+    return labels;
+}
+
+function renderStreamedTimetable(result) {
+    var days = Array.from(document.querySelectorAll('input[name="available_days"]:checked')).map(cb => cb.value);
+    var table = document.createElement('table');
+    table.className = 'table table-bordered table-sm';
+    var header = table.insertRow();
+    ['Time'].concat(days).forEach(day => {
+        var cell = document.createElement('th');
+        cell.textContent = day;
+        header.appendChild(cell);
+    });
+    slotLabels().forEach((label, slot) => {
+        var row = table.insertRow();
+        row.insertCell().textContent = label;
+        days.forEach(day => {
+            row.insertCell().textContent = (result[day] || {})[slot] || '';
+        });
+    });
+    var container = document.getElementById('stream-timetable');
+    container.innerHTML = '';
+    container.appendChild(table);
+}
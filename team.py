@@ -0,0 +1,226 @@
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from jobs import run_schedule, run_schedule_job, schedule_inputs
+from timeslots import SlotGrid, time_to_minutes, minutes_to_time
+import multiprocessing
+import os
+
+# Team scheduling: several people, each with their own week (the inputs of schedule_blocks), plus shared events
+# that must be at the same time for all their participants.
+#
+# A single model with everybody's blocks grows too fast, so the problem is decomposed:
+# - A small master model places the shared events, at times when all their participants are free.
+# - With the shared events added to their fixed constraints, the weeks of the people are independent. They are solved in parallel.
+# - If someone's blocks don't all fit, that placement of their shared events is excluded from the master and both are solved again,
+#   only re-solving the people whose shared events moved. This stops when everybody's week is complete, or after max_rounds.
+# The people only interact through the master, so the time grows roughly linearly with the size of the team.
+
+# Reads the shared events of a team from JSON. An event has a 'name' and the names of its 'participants', and either
+# a fixed 'day', 'start_time' and 'end_time', or a duration in 'hours' (and optionally the 'days' it can be on) to be placed.
+# Raises a ValueError if an event is malformed.
+def shared_event_inputs(shared_events, people):
+    events = []
+    for event in shared_events:
+        try:
+            name = str(event['name'])
+            participants = [str(person) for person in event['participants']]
+            if 'day' in event:
+                fixed = {'day': str(event['day']), 'start_time': str(event['start_time']), 'end_time': str(event['end_time'])}
+                minutes = time_to_minutes(fixed['end_time']) - time_to_minutes(fixed['start_time'])
+            else:
+                fixed = None
+                minutes = int(float(event['hours']) * 60)
+            days = [str(day) for day in event.get('days') or []]
+        except KeyError as e:
+            raise ValueError(f"Missing field of a shared event: {e.args[0]}")
+        except (TypeError, ValueError, AttributeError) as e:
+            raise ValueError(f"Invalid shared event: {e}")
+        unknown = [person for person in participants if person not in people]
+        if unknown:
+            raise ValueError(f"Unknown participants of {name}: {', '.join(unknown)}")
+        if not participants or minutes <= 0:
+            raise ValueError(f"{name} needs participants and a duration")
+        events.append({'name': name, 'participants': participants, 'fixed': fixed, 'minutes': minutes, 'days': days})
+    return events
+
+# Possible (day, start minute) of an event: on the slot grid of all its participants, in their available days and hours,
+# and not overlapping their own fixed constraints.
+def candidate_placements(event, people, slot_minutes):
+    if event['fixed']:
+        return [(event['fixed']['day'], time_to_minutes(event['fixed']['start_time']))]
+
+    participants = [people[name] for name in event['participants']]
+    first = participants[0]
+    days = event['days'] or first[0]
+    start = max(time_to_minutes(person[1]) for person in participants)
+    end = min(time_to_minutes(person[2]) for person in participants)
+    # Align the first start with the grid of the first participant, the others are checked below
+    start += (time_to_minutes(first[1]) - start) % slot_minutes
+
+    candidates = []
+    for day in days:
+        if not all(day in person[0] for person in participants):
+            continue
+        busy = [(time_to_minutes(constraint['start_time']), time_to_minutes(constraint['end_time']))
+                for person in participants for constraint in person[4] if constraint['day'] == day]
+        for minute in range(start, end - event['minutes'] + 1, slot_minutes):
+            if any((minute - time_to_minutes(person[1])) % slot_minutes for person in participants):
+                continue
+            if any(minute < busy_end and busy_start < minute + event['minutes'] for busy_start, busy_end in busy):
+                continue
+            candidates.append((day, minute))
+    return candidates
+
+# How much a placement shrinks the longest free window of the day of each participant, in slots.
+# Placements that keep long windows free leave room for the blocks of the projects.
+def placement_cost(event, placement, people, slot_minutes):
+    from project import longest_free_window
+
+    day, minute = placement
+    cost = 0
+    for name in event['participants']:
+        available_days, start_time, end_time, projects, fixed_constraints = people[name]
+        time_slots = SlotGrid(start_time, end_time, slot_minutes)
+        busy = set()
+        for constraint in fixed_constraints:
+            if constraint['day'] == day:
+                try:
+                    busy.update(range(time_slots.slot(constraint['start_time']), time_slots.slot(constraint['end_time'])))
+                except KeyError:
+                    continue  # Off the grid, check_feasibility reports it when the week is solved
+        before = longest_free_window(busy, len(time_slots))
+        first = (minute - time_slots.start) // slot_minutes
+        busy.update(range(first, first + event['minutes'] // slot_minutes))
+        cost += before - longest_free_window(busy, len(time_slots))
+    return cost
+
+# The master model: picks a candidate for each event, so that no one has two events at once, at the lowest total cost.
+# cuts are placements to exclude ({event index: candidate index}). Returns {event index: candidate index}, or None if there is none left.
+def place_shared_events(events, candidates, costs, slot_minutes, cuts=(), solver_params=None):
+    from ortools.sat.python import cp_model
+    from project import create_solver
+
+    model = cp_model.CpModel()
+    chosen = {}
+    for e, event in enumerate(events):
+        for c in range(len(candidates[e])):
+            chosen[e, c] = model.NewBoolVar(f'event_{e}_{c}')
+        model.AddExactlyOne(chosen[e, c] for c in range(len(candidates[e])))
+
+    # The events of a person can't overlap
+    events_of = defaultdict(list)
+    for e, event in enumerate(events):
+        for person in event['participants']:
+            events_of[person].append(e)
+    for person, event_ids in events_of.items():
+        covering = defaultdict(list)
+        for e in event_ids:
+            for c, (day, minute) in enumerate(candidates[e]):
+                for covered in range(minute, minute + events[e]['minutes'], slot_minutes):
+                    covering[day, covered].append(chosen[e, c])
+        for variables in covering.values():
+            if len(variables) > 1:
+                model.AddAtMostOne(variables)
+
+    for cut in cuts:
+        model.AddBoolOr([chosen[e, c].Not() for e, c in cut.items()])
+
+    model.Minimize(sum(costs[e][c] * chosen[e, c] for e, c in chosen))
+    solver = create_solver(solver_params)
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+    return {e: next(c for c in range(len(candidates[e])) if solver.Value(chosen[e, c])) for e in range(len(events))}
+
+# True if all the blocks of a person's projects were scheduled
+def complete(outcome):
+    return outcome['error'] is None and all(project['Assigned Blocks'] >= project['Target Blocks'] for project in outcome['stats'])
+
+def assigned_blocks(outcome):
+    return sum(project['Assigned Blocks'] for project in outcome['stats']) if outcome['error'] is None else 0
+
+# Schedules a team. people maps each name to the inputs of schedule_blocks (a tuple, or a dict as read by jobs.schedule_inputs),
+# shared_events are read by shared_event_inputs. The weeks of the people are solved with executor (a concurrent.futures executor,
+# for instance a process pool, or a jobs.BatchRunner), or one after the other if it's None.
+# Returns a dict with an 'error' message, or the 'shared_events' with their times, the outcome of each person in 'people'
+# (see jobs.run_schedule, without the PDF), the number of 'rounds' and whether everybody's week is 'complete'.
+def schedule_team(people, shared_events, engine='boolean', solver_params=None, slot_minutes=30, max_rounds=5, executor=None, objective='separation'):
+    try:
+        people = {name: inputs if isinstance(inputs, tuple) else schedule_inputs(inputs)[0] for name, inputs in people.items()}
+        events = shared_event_inputs(shared_events, people)
+    except ValueError as e:
+        return {'error': str(e)}
+
+    candidates = []
+    costs = []
+    for event in events:
+        if event['minutes'] % slot_minutes:
+            return {'error': f"{event['name']} doesn't fit the {slot_minutes} minute time slots"}
+        event_candidates = candidate_placements(event, people, slot_minutes)
+        if not event_candidates:
+            return {'error': f"There is no time when all the participants of {event['name']} are available"}
+        candidates.append(event_candidates)
+        costs.append([placement_cost(event, placement, people, slot_minutes) if not event['fixed'] else 0 for placement in event_candidates])
+
+    options = {'engine': engine, 'objective': objective, 'solver_params': solver_params, 'slot_minutes': slot_minutes, 'pdf': False}
+    solved = defaultdict(dict)  # Outcome of each person, by the placements of their shared events
+    cuts = []
+    best = None
+    rounds = 0
+    for rounds in range(1, max_rounds + 1):
+        placement = place_shared_events(events, candidates, costs, slot_minutes, cuts, solver_params)
+        if placement is None:
+            break
+
+        # The week of each person, with their shared events as fixed constraints
+        pending = {}
+        keys = {}
+        for name, (available_days, start_time, end_time, projects, fixed_constraints) in people.items():
+            attended = [e for e, event in enumerate(events) if name in event['participants']]
+            keys[name] = tuple((e, placement[e]) for e in attended)
+            if keys[name] in solved[name]:
+                continue
+            shared = []
+            for e in attended:
+                day, minute = candidates[e][placement[e]]
+                shared.append({'name': events[e]['name'], 'day': day, 'start_time': minutes_to_time(minute), 'end_time': minutes_to_time(minute + events[e]['minutes'])})
+            inputs = (available_days, start_time, end_time, projects, fixed_constraints + shared)
+            if executor is None:
+                solved[name][keys[name]] = run_schedule(*inputs, **options)
+            else:
+                pending[name] = executor.submit(run_schedule_job, inputs, options)
+        for name, future in pending.items():
+            solved[name][keys[name]] = future.result()
+
+        outcomes = {name: solved[name][keys[name]] for name in people}
+        score = sum(assigned_blocks(outcome) for outcome in outcomes.values())
+        if best is None or score > best[0]:
+            best = (score, placement, outcomes)
+
+        incomplete = [name for name, outcome in outcomes.items() if not complete(outcome)]
+        if not incomplete:
+            break
+        # Try other times for the shared events of the people whose week didn't fit
+        for name in incomplete:
+            if keys[name]:
+                cuts.append(dict(keys[name]))
+
+    if best is None:
+        return {'error': "The shared events can't be placed without overlapping."}
+    score, placement, outcomes = best
+    placed = []
+    for e, event in enumerate(events):
+        day, minute = candidates[e][placement[e]]
+        placed.append({'name': event['name'], 'participants': event['participants'], 'day': day,
+                       'start_time': minutes_to_time(minute), 'end_time': minutes_to_time(minute + event['minutes'])})
+    return {
+        'error': None,
+        'shared_events': placed,
+        'people': outcomes,
+        'rounds': rounds,
+        'complete': all(complete(outcome) for outcome in outcomes.values()),
+    }
+
+# Process pool for schedule_team, sized to the machine
+def team_executor(max_workers=None):
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1, mp_context=multiprocessing.get_context('spawn'))
@@ -0,0 +1,257 @@
+from app import app, job_queue, batch_runner, pdf_store, schedule_store
+from project import get_user_inputs
+from test_project import valid_user_inputs
+import json
+import pdf
+import pytest
+import threading
+import time
+
+@pytest.fixture
+def client(monkeypatch):
+    # The interval engine proves the test weeks optimal right away
+    monkeypatch.setitem(app.config, 'SCHEDULER_ENGINE', 'interval')
+    with app.test_client() as client:
+        yield client
+
+# The form of the index page for a week
+def schedule_form(available_days, start_time, end_time, projects, fixed_constraints, slot_minutes=30):
+    form = {'available_days': available_days, 'start_time': start_time, 'end_time': end_time, 'slot_minutes': str(slot_minutes),
+            'project_count': str(len(projects)), 'constraint_count': str(len(fixed_constraints))}
+    for index, project in enumerate(projects):
+        form.update({f'projects[{index}][name]': project['name'], f'projects[{index}][blocks_per_week]': str(project['blocks_per_week']),
+                     f'projects[{index}][hours_per_block]': str(project['hours_per_block'])})
+    for index, constraint in enumerate(fixed_constraints):
+        form.update({f'constraints[{index}][{field}]': constraint[field] for field in ('name', 'day', 'start_time', 'end_time')})
+    return form
+
+
+def test_generate_job_mode(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOB_MODE', True)
+    try:
+        # Verify /generate queues a job and redirects to its results page, which shows the timetable once it's done:
+        response = client.post('/generate', data=schedule_form(*valid_user_inputs()))
+        assert response.status_code == 302
+        job_id = response.headers['Location'].rsplit('/', 1)[-1]
+        assert job_queue.wait(job_id, timeout=60)['status'] == 'done'
+        status = client.get(f'/jobs/{job_id}/status').get_json()
+        assert status['status'] == 'done' and status['error'] is None
+        assert status['solve_stats']['status'] == 'OPTIMAL'
+        response = client.get(f'/jobs/{job_id}')
+        assert response.status_code == 200
+        with client.session_transaction() as session:
+            assert session['pdf_ids']
+        assert f"/download_pdf/{session['pdf_ids'][-1]}".encode() in response.data
+
+        # Verify POST /jobs returns the job id right away:
+        response = client.post('/jobs', data=schedule_form(*valid_user_inputs()))
+        assert response.status_code == 202
+        job_id = response.get_json()['job_id']
+        assert job_queue.wait(job_id, timeout=60)['status'] == 'done'
+        assert client.get(response.get_json()['status_url']).get_json()['status'] == 'done'
+    finally:
+        job_queue.shutdown()
+
+    # Verify unknown jobs are not found:
+    assert client.get('/jobs/unknown/status').status_code == 404
+    assert client.get('/jobs/unknown').status_code == 404
+
+
+# Generates the timetable of a week with /generate, returns the response and the id of its PDF
+def generate(client, inputs):
+    response = client.post('/generate', data=schedule_form(*inputs))
+    with client.session_transaction() as session:
+        return response, session.get('pdf_ids', [None])[-1]
+
+
+def test_download_pdf(client):
+    # Verify the timetable is kept on the server, the session only holds its id:
+    response, pdf_id = generate(client, valid_user_inputs())
+    assert response.status_code == 200
+    assert schedule_store.open(pdf_id) is not None
+
+    # Verify the PDF is served from the store, for viewing and for downloading:
+    response = client.get(f'/download_pdf/{pdf_id}?mode=download')
+    assert response.status_code == 200 and response.mimetype == 'application/pdf'
+    assert response.data.startswith(b'%PDF')
+    assert 'attachment' in response.headers['Content-Disposition']
+    assert pdf_store.open(pdf_id).read() == response.data
+    response = client.get(f'/download_pdf/{pdf_id}?mode=view')
+    assert response.status_code == 200 and 'attachment' not in response.headers.get('Content-Disposition', '')
+
+    # Verify other sessions and unknown ids get a 404:
+    with app.test_client() as other_client:
+        assert other_client.get(f'/download_pdf/{pdf_id}').status_code == 404
+    assert client.get('/download_pdf/unknown').status_code == 404
+
+
+# A week of /batch, /team and /plan
+def week_json(available_days, start_time, end_time, projects, fixed_constraints, **fields):
+    return dict(fields, available_days=available_days, start_time=start_time, end_time=end_time, projects=projects, fixed_constraints=fixed_constraints)
+
+
+def test_batch(client, monkeypatch):
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    late_meeting = {'name': 'Late meeting', 'day': available_days[0], 'start_time': '19:00', 'end_time': '20:00'}
+    items = [week_json(*valid_user_inputs(), id='valid'), week_json(available_days, start_time, end_time, projects, fixed_constraints + [late_meeting], id='invalid')]
+    try:
+        # Verify every week gets an NDJSON line, with its status and the reason of the weeks that can't be scheduled:
+        response = client.post('/batch', json=items)
+        assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+        lines = {line['id']: line for line in map(json.loads, response.data.decode().splitlines())}
+        assert lines['valid']['status'] == 'OPTIMAL' and lines['valid']['result']
+        assert lines['invalid']['status'] == 'INVALID' and lines['invalid']['reason'] == 'constraint_outside_window'
+        # Verify the weeks can also be given as {"requests": [...]}:
+        response = client.post('/batch', json={'requests': items[:1]})
+        assert [json.loads(line)['status'] for line in response.data.decode().splitlines()] == ['OPTIMAL']
+    finally:
+        batch_runner.shutdown()
+
+    # Verify malformed batches, batches over the limit and unknown formats are refused:
+    assert client.post('/batch', json={'week': items[0]}).status_code == 400
+    assert client.post('/batch?format=pdf', json=items).status_code == 400
+    monkeypatch.setitem(app.config, 'BATCH_MAX_ITEMS', 1)
+    assert client.post('/batch', json=items).status_code == 413
+
+
+# Value of a series of /metrics, 0 if it isn't there yet
+def metric_value(client, series):
+    for line in client.get('/metrics').data.decode().splitlines():
+        if line.startswith(series + ' '):
+            return float(line.split()[-1])
+    return 0
+
+
+def test_metrics(client):
+    requests = metric_value(client, 'scheduler_requests_total{endpoint="generate",status="200"}')
+    parse_phases = metric_value(client, 'scheduler_phase_seconds_count{phase="parse"}')
+
+    # Verify each response has the time of its phases in the Server-Timing header:
+    response, pdf_id = generate(client, valid_user_inputs())
+    phases = dict(timing.split(';dur=') for timing in response.headers['Server-Timing'].split(', '))
+    assert {'parse', 'feasibility', 'statistics', 'render', 'total'} <= set(phases)
+    assert 'solve' in phases or 'cache' in phases
+    assert all(float(duration) >= 0 for duration in phases.values())
+    assert 'total' in client.get('/').headers['Server-Timing']
+
+    # Verify the requests and their phases are counted in the Prometheus metrics:
+    response = client.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    assert '# TYPE scheduler_phase_seconds histogram' in response.data.decode()
+    assert metric_value(client, 'scheduler_requests_total{endpoint="generate",status="200"}') == requests + 1
+    assert metric_value(client, 'scheduler_phase_seconds_count{phase="parse"}') == parse_phases + 1
+
+
+# Reads the Server-Sent Events of a response as (event, data) as they come
+def sse_events(response):
+    buffer = ''
+    for chunk in response.response:
+        buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while '\n\n' in buffer:
+            message, buffer = buffer.split('\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in message.splitlines())
+            yield fields['event'], json.loads(fields['data'])
+
+
+def test_generate_stream(client, monkeypatch):
+    # Verify the stream starts with its URLs, sends the improving timetables and ends with the outcome:
+    response = client.post('/generate/stream', data=schedule_form(*valid_user_inputs()), buffered=False)
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    events = list(sse_events(response))
+    assert events[0][0] == 'start' and {'cancel_url', 'results_url'} <= set(events[0][1])
+    assert events[-1][0] == 'done' and events[-1][1]['error'] is None
+    assert events[-1][1]['status'] in ('OPTIMAL', 'FEASIBLE')
+    assert all(event == 'solution' and data['result'] for event, data in events[1:-1])
+    # Verify the results page of the stream shows the timetable:
+    assert b'/download_pdf/' in client.get(events[0][1]['results_url']).data
+
+    # Verify cancelling a stream keeps the best timetable so far, on a week the boolean engine takes its time on:
+    monkeypatch.setitem(app.config, 'SCHEDULER_ENGINE', 'boolean')
+    monkeypatch.setitem(app.config, 'SOLVER_PARAMS', dict(app.config['SOLVER_PARAMS'], max_time=60))
+    response = client.post('/generate/stream', data=schedule_form(*get_user_inputs(hardcoded=True)), buffered=False)
+    events = sse_events(response)
+    event, start = next(events)
+    assert next(events)[0] == 'solution'
+    assert client.post(start['cancel_url']).status_code == 202
+    event, done = list(events)[-1]
+    assert event == 'done' and done['status'] == 'FEASIBLE' and done['solve_stats']['cancelled']
+
+    # Verify unknown streams can't be cancelled:
+    assert client.post('/generate/stream/unknown/cancel').status_code == 404
+
+
+def test_export(client):
+    response, pdf_id = generate(client, valid_user_inputs())
+    blocks = json.loads(client.get(f'/export/{pdf_id}.json').data)[0]['blocks']
+    assert blocks and all(len(block) == 4 for block in blocks)
+
+    # Verify the iCalendar export has an event per block, in the week asked for and repeated as asked:
+    response = client.get(f'/export/{pdf_id}.ics?week_start=2026-11-02&repeat_weeks=4')
+    assert response.status_code == 200 and response.mimetype == 'text/calendar'
+    assert 'attachment; filename=timetable.ics' in response.headers['Content-Disposition']
+    calendar = response.data.decode()
+    assert calendar.count('BEGIN:VEVENT') == len(blocks)
+    assert calendar.count('RRULE:FREQ=WEEKLY;COUNT=4') == len(blocks)
+    assert 'DTSTART:20261102T' in calendar
+    assert 'RRULE' not in client.get(f'/export/{pdf_id}.ics').data.decode()
+
+    # Verify the CSV export has a row per block:
+    response = client.get(f'/export/{pdf_id}.csv')
+    assert response.mimetype == 'text/csv'
+    assert response.data.decode().splitlines()[0] == 'id,day,start_time,end_time,name'
+    assert len(response.data.decode().splitlines()) == len(blocks) + 1
+
+    # Verify invalid arguments, unknown formats and timetables of other sessions are refused:
+    assert client.get(f'/export/{pdf_id}.ics?week_start=next').status_code == 400
+    assert client.get(f'/export/{pdf_id}.ics?repeat_weeks=0').status_code == 400
+    assert client.get(f'/export/{pdf_id}.pdf').status_code == 404
+    with app.test_client() as other_client:
+        assert other_client.get(f'/export/{pdf_id}.csv').status_code == 404
+
+
+def test_batch_export(client):
+    try:
+        # Verify the timetables of a batch are streamed in the export format asked for:
+        response = client.post('/batch?format=csv', json=[week_json(*valid_user_inputs(), id='week')])
+        assert response.status_code == 200 and response.mimetype == 'text/csv'
+        rows = response.data.decode().splitlines()
+        assert rows[0] == 'id,day,start_time,end_time,name'
+        assert len(rows) > 1 and all(row.startswith('week,') for row in rows[1:])
+    finally:
+        batch_runner.shutdown()
+
+
+def test_download_pdf_lazy_render(client, monkeypatch):
+    renders = []
+    render = pdf.render_document
+
+    def render_document(document):
+        renders.append(document)
+        time.sleep(0.2)  # Long enough for the downloads to arrive during the render
+        return render(document)
+    monkeypatch.setattr(pdf, 'render_document', render_document)
+
+    # Verify the PDF isn't rendered by /generate, a week no other test renders:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    response, pdf_id = generate(client, (available_days, start_time, end_time, projects[:-1], fixed_constraints))
+    assert response.status_code == 200
+    assert pdf_store.open(pdf_id) is None and not renders
+
+    # Verify concurrent downloads of the PDF share its render, and it's kept for the next ones:
+    responses = []
+
+    def download():
+        with app.test_client() as other_client:
+            with other_client.session_transaction() as session:
+                session['pdf_ids'] = [pdf_id]
+            responses.append(other_client.get(f'/download_pdf/{pdf_id}'))
+    threads = [threading.Thread(target=download) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len({response.data for response in responses}) == 1 and responses[0].data.startswith(b'%PDF')
+    assert len(renders) == 1
+    assert client.get(f'/download_pdf/{pdf_id}').data == responses[0].data
+    assert len(renders) == 1
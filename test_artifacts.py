@@ -0,0 +1,102 @@
+from artifacts import MemoryBlobStore, FileBlobStore, SQLiteBlobStore, BlobTooLarge, SingleFlight, timetable_hash
+from timeslots import SlotGrid
+import hashlib
+import pytest
+import threading
+import time
+
+def make_store(kind, tmp_path, **limits):
+    if kind == 'memory':
+        return MemoryBlobStore(**limits)
+    if kind == 'file':
+        return FileBlobStore(str(tmp_path / 'pdfs'), **limits)
+    return SQLiteBlobStore(str(tmp_path / 'pdfs.db'), **limits)
+
+def key(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def test_timetable_hash():
+    time_slots = SlotGrid('08:00', '12:00')
+    result = {'Monday': {0: 'Write', 1: 'Write'}}
+    # Verify the hash only depends on what the timetable shows:
+    assert timetable_hash(['Monday'], result, ['Write'], time_slots) == timetable_hash(['Monday'], {'Monday': {1: 'Write', 0: 'Write'}}, ['Write'], time_slots)
+    assert timetable_hash(['Monday'], result, ['Write'], time_slots) != timetable_hash(['Monday'], result, ['Write'], SlotGrid('08:00', '12:00', 15))
+    assert timetable_hash(['Monday'], result, ['Write'], time_slots) != timetable_hash(['Monday'], {'Monday': {0: 'Write'}}, ['Write'], time_slots)
+
+@pytest.mark.parametrize('kind', ['memory', 'file', 'sqlite'])
+def test_blob_store(kind, tmp_path):
+    store = make_store(kind, tmp_path, max_bytes=100, max_blob_bytes=60, ttl=3600)
+
+    # Verify blobs are stored under their key, and stored once:
+    assert store.put(key('a'), b'%PDF a') == key('a')
+    store.put(key('a'), b'%PDF a')
+    assert store.open(key('a')).read() == b'%PDF a'
+    assert store.stats()['blobs'] == 1
+    assert store.open(key('b')) is None
+
+    # Verify invalid ids and blobs over the size limit are refused:
+    assert store.open('../secret') is None
+    with pytest.raises(ValueError):
+        store.put('../secret', b'data')
+    with pytest.raises(BlobTooLarge):
+        store.put(key('big'), b'x' * 61)
+
+    # Verify the oldest blobs are evicted past max_bytes:
+    for name in 'bcd':
+        time.sleep(0.01)
+        store.put(key(name), name.encode() * 40)
+    assert store.open(key('a')) is None
+    assert store.open(key('b')) is None
+    assert store.open(key('d')).read() == b'd' * 40
+    assert store.stats()['bytes'] <= 100
+
+    # Verify blobs expire after the TTL:
+    (tmp_path / 'expired').mkdir()
+    store = make_store(kind, tmp_path / 'expired', ttl=0)
+    store.put(key('a'), b'%PDF a')
+    assert store.open(key('a')) is None
+
+def test_sqlite_blob_tables(tmp_path):
+    # Verify stores sharing a database keep their blobs apart:
+    pdfs = SQLiteBlobStore(str(tmp_path / 'store.db'))
+    schedules = SQLiteBlobStore(str(tmp_path / 'store.db'), table='schedules')
+    pdfs.put(key('a'), b'%PDF a')
+    schedules.put(key('a'), b'{}')
+    assert pdfs.open(key('a')).read() == b'%PDF a'
+    assert schedules.open(key('a')).read() == b'{}'
+    assert schedules.stats()['blobs'] == 1
+    with pytest.raises(ValueError):
+        SQLiteBlobStore(str(tmp_path / 'store.db'), table='blobs; DROP TABLE blobs')
+
+def test_single_flight():
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def render():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b'%PDF'
+
+    # Verify concurrent calls for the same key share a single call:
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.run(key('a'), render))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == [b'%PDF'] * 4
+    assert len(calls) == 1
+    assert flight.in_flight() == 0
+
+    # Verify the next call runs again, and errors are raised to the caller:
+    assert flight.run(key('a'), lambda: b'again') == b'again'
+    with pytest.raises(ZeroDivisionError):
+        flight.run(key('a'), lambda: 1 / 0)
+    assert flight.in_flight() == 0
@@ -0,0 +1,120 @@
+from cache import ResultCache, ModelTemplateCache, canonical_key, cached_schedule_blocks
+from ortools.sat.python import cp_model
+from test_project import valid_user_inputs, invalid_user_inputs
+import os
+import time
+
+def test_canonical_key():
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    key = canonical_key(available_days, start_time, end_time, projects, fixed_constraints, engine='interval')
+
+    # Verify the order of projects and constraints doesn't change the key:
+    assert key == canonical_key(available_days, start_time, end_time, projects[::-1], fixed_constraints[::-1], engine='interval')
+
+    # Verify a different week or different options change the key:
+    assert key != canonical_key(available_days, start_time, '17:00', projects, fixed_constraints, engine='interval')
+    assert key != canonical_key(available_days, start_time, end_time, projects[1:], fixed_constraints, engine='interval')
+    assert key != canonical_key(available_days, start_time, end_time, projects, fixed_constraints, engine='boolean')
+    assert key != canonical_key(available_days, start_time, end_time, projects, fixed_constraints, engine='interval', objective='min_gap')
+    assert key != canonical_key(available_days, start_time, end_time, [dict(projects[0], weight=2)] + projects[1:], fixed_constraints, engine='interval')
+
+
+def test_cached_schedule_blocks(tmp_path):
+    cache = ResultCache(max_size=2, ttl=60, directory=str(tmp_path))
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+
+    # Verify the first call solves and the second one is a cache hit with the same answer:
+    status, result, solve_stats = cached_schedule_blocks(cache, available_days, start_time, end_time, projects, fixed_constraints, engine='interval')
+    assert status == cp_model.OPTIMAL
+    assert solve_stats['cache'] == 'miss'
+    cached_status, cached_result, cached_stats = cached_schedule_blocks(cache, available_days, start_time, end_time, projects[::-1], fixed_constraints, engine='interval')
+    assert cached_stats['cache'] == 'hit'
+    assert (cached_status, cached_result) == (status, result)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    # Verify the disk tier is shared with another cache (another worker), keeping the slot numbers:
+    other_cache = ResultCache(directory=str(tmp_path))
+    other_status, other_result, other_stats = cached_schedule_blocks(other_cache, available_days, start_time, end_time, projects, fixed_constraints, engine='interval')
+    assert other_stats['cache'] == 'hit'
+    assert other_status == cp_model.OPTIMAL
+    assert other_result == result
+
+    # Verify infeasible answers are cached too:
+    cached_schedule_blocks(cache, *invalid_user_inputs(), engine='interval')
+    status, result, solve_stats = cached_schedule_blocks(cache, *invalid_user_inputs(), engine='interval')
+    assert status == cp_model.INFEASIBLE
+    assert solve_stats['cache'] == 'hit'
+
+
+def test_cached_schedule_blocks_default_engine():
+    cache = ResultCache()
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    options = dict(engine='boolean', solver_params={'max_time': 2})
+
+    # Verify a week solved with the default engine within its time limit is served from the cache, even if it wasn't proven optimal:
+    status, result, solve_stats = cached_schedule_blocks(cache, available_days, start_time, end_time, projects, fixed_constraints, **options)
+    assert status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    assert solve_stats['cache'] == 'miss'
+    cached_status, cached_result, cached_stats = cached_schedule_blocks(cache, available_days, start_time, end_time, projects, fixed_constraints, **options)
+    assert cached_stats['cache'] == 'hit'
+    assert (cached_status, cached_result) == (status, result)
+
+    # Verify a FEASIBLE answer is served, and a different time limit is another entry:
+    key = canonical_key(available_days, start_time, end_time, projects, fixed_constraints, **options)
+    cache.set(key, (cp_model.FEASIBLE, result, solve_stats))
+    assert cached_schedule_blocks(cache, available_days, start_time, end_time, projects, fixed_constraints, **options)[0] == cp_model.FEASIBLE
+    other_stats = cached_schedule_blocks(cache, available_days, start_time, end_time, projects, fixed_constraints, engine='boolean', solver_params={'max_time': 1})[2]
+    assert other_stats['cache'] == 'miss'
+
+
+def test_result_cache_eviction():
+    cache = ResultCache(max_size=2, ttl=0.05)
+    value = (cp_model.OPTIMAL, {'Monday': {0: 'Gym'}}, {})
+
+    # Verify the least recently used entry is evicted:
+    cache.set('a', value)
+    cache.set('b', value)
+    cache.get('a')
+    cache.set('c', value)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+    # Verify entries expire after the TTL:
+    time.sleep(0.1)
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 1
+
+
+def test_result_cache_disk_eviction(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), max_disk_entries=4, eviction_interval=3)
+    value = (cp_model.OPTIMAL, {'Monday': {0: 'Gym'}}, {})
+
+    # Verify the directory is trimmed every eviction_interval writes, keeping the last written entries:
+    for index in range(5):
+        cache.set(f'{index:064x}', value)
+    assert len(os.listdir(tmp_path)) == 5
+    cache.set(f'{5:064x}', value)
+    assert sorted(os.listdir(tmp_path)) == [f'{index:064x}.json' for index in range(2, 6)]
+
+
+def test_model_template_cache():
+    cache = ModelTemplateCache(max_size=2)
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+
+    # Verify the template of a week shape is built once, and the solve is the same as with a model built from scratch:
+    status, result, solve_stats = cached_schedule_blocks(ResultCache(), available_days, start_time, end_time, projects, fixed_constraints,
+                                                         engine='interval', templates=cache)
+    other_status, other_result, other_stats = cached_schedule_blocks(ResultCache(), available_days, start_time, end_time, projects, fixed_constraints[:2],
+                                                                     engine='interval', templates=cache)
+    assert (status, other_status) == (cp_model.OPTIMAL, cp_model.OPTIMAL)
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    assert solve_stats['objective'] == cached_schedule_blocks(ResultCache(), available_days, start_time, end_time, projects, fixed_constraints,
+                                                              engine='interval')[2]['objective']
+
+    # Verify the least recently used template is evicted:
+    cache.get('a', lambda: 'template a')
+    cache.get('b', lambda: 'template b')
+    assert cache.get('a', lambda: 'rebuilt a') == 'template a'
+    cache.get('c', lambda: 'template c')
+    assert cache.get('b', lambda: 'rebuilt b') == 'rebuilt b'
+    assert cache.stats()['size'] == 2
@@ -0,0 +1,95 @@
+from datetime import date
+from export import week_blocks, ical_chunks, csv_chunks, json_chunks, export_chunks, schedule_document, document_week, day_date, ical_line
+from schedule import Schedule
+from timeslots import SlotGrid
+import csv
+import io
+import json
+import pytest
+
+def week(week_id=None):
+    result = {
+        'Monday': {0: 'Write', 1: 'Write', 2: 'Lunch, with Ana', 4: 'Write'},
+        'Tuesday': {1: 'Read', 2: 'Read'},
+    }
+    return {'id': week_id, 'available_days': ['Monday', 'Tuesday'], 'result': result, 'time_slots': SlotGrid('08:00', '11:00')}
+
+def test_week_blocks():
+    # Verify a block is exported for each run of slots, not for each slot:
+    blocks = [('Monday', '08:00', '09:00', 'Write'), ('Monday', '09:00', '09:30', 'Lunch, with Ana'), ('Monday', '10:00', '10:30', 'Write'),
+              ('Tuesday', '08:30', '09:30', 'Read')]
+    assert list(week_blocks(week())) == blocks
+    # Verify the compact schedule gives the same blocks:
+    assert list(week_blocks(dict(week(), result=Schedule.from_result(week()['result'], ['Monday', 'Tuesday'], 6)))) == blocks
+    assert list(week_blocks({'id': 'bad', 'error': 'Missing field: start_time'})) == []
+
+def test_ical_export():
+    calendar = ''.join(ical_chunks([week('ana')], date(2026, 11, 2)))
+    lines = calendar.split('\r\n')
+    assert lines[0] == 'BEGIN:VCALENDAR' and lines[-2:] == ['END:VCALENDAR', '']
+    assert calendar.count('BEGIN:VEVENT') == 4
+    assert 'DTSTART:20261103T083000' in lines and 'DTEND:20261103T093000' in lines
+    assert 'UID:ana-20261102-0800@timeblocking' in lines
+    # Verify the events happen once by default, at floating times, and the text is escaped:
+    assert 'RRULE' not in calendar
+    assert 'TZID' not in calendar and not any(line.startswith('DTSTART') and line.endswith('Z') for line in lines)
+    assert 'SUMMARY:Lunch\\, with Ana' in lines
+
+    # Verify the week days repeat for a bounded number of weeks:
+    calendar = ''.join(ical_chunks([week('ana')], date(2026, 11, 2), repeat_weeks=12))
+    assert calendar.count('RRULE:FREQ=WEEKLY;COUNT=12') == 4
+    with pytest.raises(ValueError):
+        ''.join(ical_chunks([week('ana')], repeat_weeks=0))
+
+    # Verify dated days happen once, and other days are left out:
+    dated = dict(week(), available_days=['2026-12-24', 'Day 2'], result={'2026-12-24': {0: 'Write'}, 'Day 2': {0: 'Read'}})
+    calendar = ''.join(ical_chunks([dated]))
+    assert calendar.count('BEGIN:VEVENT') == 1
+    assert 'DTSTART:20261224T080000' in calendar and 'RRULE' not in calendar
+
+    # Verify long lines are folded to 75 octets:
+    folded = ical_line('SUMMARY:' + 'é' * 80)
+    assert all(len(line.encode('utf-8')) <= 75 for line in folded.split('\r\n'))
+    assert folded.replace('\r\n ', '') == 'SUMMARY:' + 'é' * 80 + '\r\n'
+
+def test_day_date():
+    assert day_date('Monday', date(2026, 11, 2)) == date(2026, 11, 2)
+    assert day_date('Sunday', date(2026, 11, 2)) == date(2026, 11, 8)
+    assert day_date('Monday', date(2026, 11, 4)) == date(2026, 11, 9)
+    assert day_date('2026-12-24', date(2026, 11, 2)) == date(2026, 12, 24)
+    assert day_date('Day 2', date(2026, 11, 2)) is None
+
+def test_csv_and_json_exports():
+    weeks = [week('ana'), {'id': 'ben', 'error': 'No feasible solution found with the given constraints.'}, week()]
+    rows = list(csv.reader(io.StringIO(''.join(csv_chunks(weeks)))))
+    assert rows[0] == ['id', 'day', 'start_time', 'end_time', 'name']
+    assert rows[2] == ['ana', 'Monday', '09:00', '09:30', 'Lunch, with Ana']
+    assert [row[0] for row in rows[1:]] == ['ana'] * 4 + ['2'] * 4
+
+    exported = json.loads(''.join(json_chunks(weeks)))
+    assert exported[0]['blocks'][0] == ['Monday', '08:00', '09:00', 'Write']
+    assert exported[0]['slot_minutes'] == 30
+    assert exported[1] == {'id': 'ben', 'error': 'No feasible solution found with the given constraints.'}
+    assert json.loads(''.join(json_chunks([]))) == []
+
+    with pytest.raises(ValueError):
+        export_chunks('xml', weeks)
+
+def test_streaming_export():
+    # Verify the weeks are read one at a time, as the chunks are sent:
+    read = []
+    def weeks():
+        for index in range(3):
+            read.append(index)
+            yield week(index)
+    chunks = export_chunks('csv', weeks())
+    assert next(chunks).count('\n') == 1 + 4
+    assert read == [0]
+
+def test_schedule_document():
+    time_slots = SlotGrid('08:00', '11:00')
+    document = json.loads(json.dumps(schedule_document(['Monday', 'Tuesday'], week()['result'], ['Write', 'Read'], time_slots)))
+    assert document['names'] == ['Write', 'Read']
+    restored = document_week(document, 'ana')
+    assert restored['time_slots'].labels == time_slots.labels
+    assert list(week_blocks(restored)) == list(week_blocks(week()))
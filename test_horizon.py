@@ -0,0 +1,103 @@
+import json
+import pytest
+from horizon import horizon_inputs, plan_horizon, replan_week, week_constraints, week_dates
+
+def horizon_data():
+    return {
+        'start_date': '2026-11-02',
+        'num_weeks': 3,
+        'available_days': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'],
+        'start_time': '09:00',
+        'end_time': '13:00',
+        'projects': [
+            {'name': 'Thesis', 'hours_per_block': 2, 'blocks_per_week': 3, 'weekly_blocks': [5]},
+            {'name': 'Reading', 'hours_per_block': 1, 'blocks_per_week': 2},
+        ],
+        'fixed_constraints': [{'name': 'Standup', 'day': 'Monday', 'start_time': '09:00', 'end_time': '10:00'}],
+        'dated_constraints': [{'name': 'Offsite', 'date': '2026-11-04', 'start_time': '09:00', 'end_time': '13:00'}],
+    }
+
+def test_horizon_inputs():
+    inputs = horizon_inputs(horizon_data())
+    dates = week_dates(inputs, 1)
+    assert [day.isoformat() for day in dates] == ['2026-11-09', '2026-11-10', '2026-11-11', '2026-11-12', '2026-11-13']
+
+    # Verify the recurring constraints are on every week and the dated ones only on theirs:
+    assert [(constraint['name'], constraint['day']) for constraint in week_constraints(inputs, week_dates(inputs, 0))] == [('Standup', '2026-11-02'), ('Offsite', '2026-11-04')]
+    assert [(constraint['name'], constraint['day']) for constraint in week_constraints(inputs, dates)] == [('Standup', '2026-11-09')]
+
+    # Verify malformed horizons are rejected up front:
+    for change in ({'num_weeks': 0}, {'start_date': 'next monday'}, {'available_days': ['Moonday']},
+                   {'dated_constraints': [{'name': 'Offsite', 'date': '2026-11-04', 'start_time': '08:00', 'end_time': '13:00'}]}):
+        with pytest.raises(ValueError):
+            horizon_inputs(dict(horizon_data(), **change))
+
+def test_plan_horizon():
+    inputs = horizon_inputs(horizon_data())
+    plan = plan_horizon(inputs, engine='interval')
+    assert plan['error'] is None
+    assert plan['complete'] and plan['unsolved_weeks'] == []
+
+    # The offsite leaves 4 days in the first week: the fifth block of the thesis is carried forward to the second
+    first, second, third = plan['weeks']
+    assert first['targets'] == {'Thesis': 5, 'Reading': 2}
+    assert first['scheduled'] == {'Thesis': 4, 'Reading': 2}
+    assert first['carried_out'] == {'Thesis': 1}
+    assert second['carried_in'] == {'Thesis': 1}
+    assert second['scheduled'] == {'Thesis': 4, 'Reading': 2}
+    assert third['carried_in'] == {} and third['scheduled'] == {'Thesis': 3, 'Reading': 2}
+    # The demand is trimmed by the pre-check, so each week is solved once
+    assert [week['solves'] for week in plan['weeks']] == [1, 1, 1]
+
+    # Verify the timetable has the constraints on their dates and the blocks everywhere else:
+    assert set(plan['result']['2026-11-04'].values()) == {'Offsite'}
+    assert list(plan['result']['2026-11-09'].values())[:2] == ['Standup', 'Standup']
+    thesis_days = [day for day, slots in plan['result'].items() if 'Thesis' in slots.values()]
+    assert len(thesis_days) == 4 + 4 + 3
+
+def test_unmet_demand():
+    data = horizon_data()
+    data['num_weeks'] = 1
+    data['dated_constraints'] = [{'name': 'Holiday', 'date': date, 'start_time': '09:00', 'end_time': '13:00'}
+                                 for date in ('2026-11-02', '2026-11-03', '2026-11-04')]
+    plan = plan_horizon(horizon_inputs(data), engine='interval')
+    assert not plan['complete']
+    assert plan['weeks'][0]['status'] == 'OPTIMAL'
+    assert plan['unmet'] == {'Thesis': {'blocks': 3, 'hours': 6}}
+
+def test_replan_week():
+    inputs = horizon_inputs(horizon_data())
+    plan = plan_horizon(inputs, engine='interval')
+    # The plan goes through JSON, as with the /plan endpoint
+    plan = json.loads(json.dumps(plan))
+
+    # A workshop on two days of the second week: only that week is planned again
+    data = horizon_data()
+    data['dated_constraints'] += [{'name': 'Workshop', 'date': date, 'start_time': '09:00', 'end_time': '13:00'} for date in ('2026-11-12', '2026-11-13')]
+    replanned = replan_week(horizon_inputs(data), plan, 1, engine='interval')
+    assert replanned['weeks'][0] == plan['weeks'][0]
+    assert replanned['weeks'][2] == plan['weeks'][2]
+    assert set(replanned['result']['2026-11-12'].values()) == {'Workshop'}
+    assert replanned['weeks'][1]['carried_out'] == {'Thesis': 1}
+    assert replanned['stale_weeks'] == [2]
+    assert not replanned['complete']
+
+    # Planning again from the stale week carries the block forward
+    updated = plan_horizon(horizon_inputs(data), replanned, from_week=2, engine='interval')
+    assert updated['weeks'][:2] == replanned['weeks'][:2]
+    assert updated['weeks'][2]['carried_in'] == {'Thesis': 1}
+    assert updated['complete']
+
+    with pytest.raises(ValueError):
+        replan_week(inputs, plan, 3, engine='interval')
+
+def test_solver_timeout():
+    # Without time to solve, each week is solved once and left unsolved, instead of being trimmed and solved again
+    plan = plan_horizon(horizon_inputs(horizon_data()), engine='interval', solver_params={'max_time': 0.0})
+    assert [(week['status'], week['solves'], week['solved']) for week in plan['weeks']] == [('UNKNOWN', 1, False)] * 3
+    assert plan['unsolved_weeks'] == [0, 1, 2]
+    assert not plan['complete']
+    # Their demand is carried forward: the last week carries out the targets of the three weeks
+    assert plan['weeks'][0]['scheduled'] == {'Thesis': 0, 'Reading': 0}
+    assert plan['weeks'][1]['carried_in'] == {'Thesis': 5, 'Reading': 2}
+    assert plan['unmet'] == {'Thesis': {'blocks': 11, 'hours': 22}, 'Reading': {'blocks': 6, 'hours': 6}}
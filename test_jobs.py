@@ -0,0 +1,156 @@
+from jobs import JobQueue, MemoryJobStore, SQLiteJobStore, QueueFull, BatchRunner, ScheduleStream, run_schedule, schedule_inputs
+from test_project import valid_user_inputs, invalid_user_inputs
+import multiprocessing
+import os
+import pytest
+import signal
+import subprocess
+import sys
+import threading
+
+def test_run_schedule():
+    # Verify a valid week is solved, and kept as a schedule to render later:
+    outcome = run_schedule(*valid_user_inputs(), engine='interval')
+    assert outcome['error'] is None
+    assert outcome['status'] == 'OPTIMAL'
+    assert 'pdf' not in outcome
+    assert len(outcome['pdf_id']) == 64
+    assert outcome['schedule']['available_days'] == valid_user_inputs()[0]
+    for project in outcome['stats']:
+        assert project["Assigned"] == "100%"
+    # Verify the time of each phase is reported:
+    assert set(outcome['timings']) == {'feasibility', 'build', 'solve', 'extract', 'statistics'}
+
+    # Verify impossible weeks are reported with an error message and the reason check_feasibility found:
+    outcome = run_schedule(*invalid_user_inputs(), engine='interval')
+    assert outcome['error']
+    assert outcome['status'] == 'INFEASIBLE' and outcome['reason'] == 'insufficient_capacity'
+
+    # Verify mistakes in the request aren't reported as infeasible:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    late_meeting = {'name': 'Late meeting', 'day': available_days[0], 'start_time': '19:00', 'end_time': '20:00'}
+    outcome = run_schedule(available_days, start_time, end_time, projects, fixed_constraints + [late_meeting], engine='interval')
+    assert outcome['status'] == 'INVALID' and outcome['reason'] == 'constraint_outside_window'
+    outcome = run_schedule(available_days, start_time, end_time, projects, fixed_constraints, engine='interval', slot_minutes=7)
+    assert outcome['status'] == 'INVALID' and outcome['reason'] == 'invalid_window'
+
+# Kills the processes of the pools, as the OOM killer would
+def kill_pool_processes():
+    for process in multiprocessing.active_children():
+        os.kill(process.pid, signal.SIGKILL)
+
+
+@pytest.mark.parametrize('store', ['memory', 'sqlite'])
+def test_job_queue(store, tmp_path):
+    store = MemoryJobStore() if store == 'memory' else SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    job_queue = JobQueue(store=store, max_workers=1, max_pending=1)
+    try:
+        # Verify the job id is returned right away and the job finishes in the pool:
+        job_id = job_queue.submit(*valid_user_inputs(), engine='interval')
+        assert job_queue.get(job_id)['status'] in ('queued', 'running', 'done')
+
+        # Verify the queue refuses jobs beyond max_pending:
+        with pytest.raises(QueueFull):
+            job_queue.submit(*valid_user_inputs(), engine='interval')
+
+        job = job_queue.wait(job_id, timeout=60)
+        assert job['status'] == 'done'
+        assert job['outcome']['status'] == 'OPTIMAL'
+        assert job['outcome']['schedule']['names']
+        assert all(isinstance(slot, int) for slots in job['outcome']['result'].values() for slot in slots)
+        assert job_queue.pending() == 0
+
+        # Verify failures in the pool are reported:
+        job_id = job_queue.submit(*valid_user_inputs(), engine='unknown')
+        job = job_queue.wait(job_id, timeout=60)
+        assert job['status'] == 'failed'
+        assert job['outcome']['error']
+
+        # Verify a pool whose process died is replaced, instead of failing every later job:
+        job_id = job_queue.submit(*valid_user_inputs(), engine='boolean', solver_params={'max_time': 30})
+        kill_pool_processes()
+        assert job_queue.wait(job_id, timeout=60)['status'] == 'failed'
+        job_id = job_queue.submit(*valid_user_inputs(), engine='interval')
+        assert job_queue.wait(job_id, timeout=60)['status'] == 'done'
+    finally:
+        job_queue.shutdown()
+
+    # Verify unknown jobs are not found:
+    assert job_queue.get('unknown') is None
+
+
+def test_schedule_inputs():
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    data = {'available_days': available_days, 'start_time': start_time, 'end_time': end_time, 'projects': projects,
+            'fixed_constraints': fixed_constraints, 'slot_minutes': 15}
+    # Verify a JSON week is read as the inputs of run_schedule:
+    assert schedule_inputs(data) == (valid_user_inputs(), 15)
+    # Verify the weights of the projects are kept when given:
+    weighted = [dict(project, weight=2) for project in projects]
+    assert schedule_inputs(dict(data, projects=weighted))[0][3] == weighted
+    # Verify malformed weeks are refused:
+    with pytest.raises(ValueError, match='available_days'):
+        schedule_inputs({'start_time': '08:00'})
+    with pytest.raises(ValueError):
+        schedule_inputs(dict(data, projects=[{'name': 'Write', 'hours_per_block': 'two', 'blocks_per_week': 1}]))
+
+
+def test_batch_runner():
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    week = {'available_days': available_days, 'start_time': start_time, 'end_time': end_time, 'projects': projects, 'fixed_constraints': fixed_constraints}
+    items = [dict(week, id='valid'), dict(week, id='slow', max_time=1000), {'id': 'malformed'}, dict(week, id='invalid', projects=invalid_user_inputs()[3])]
+    batch_runner = BatchRunner(max_workers=1, max_in_flight=2, max_time=10)
+    try:
+        lines = {line['id']: line for line in batch_runner.run(items, engine='interval')}
+        # Verify a pool whose process died during a batch is replaced, instead of failing every later batch:
+        threading.Timer(0.5, kill_pool_processes).start()
+        assert [line['status'] for line in batch_runner.run([dict(week, max_time=30)], engine='boolean')] == ['ERROR']
+        assert [line['status'] for line in batch_runner.run(items[:1], engine='interval')] == ['OPTIMAL']
+    finally:
+        batch_runner.shutdown()
+
+    # Verify every item gets one line, in whatever order they finished:
+    assert sorted(line['index'] for line in lines.values()) == [0, 1, 2, 3]
+    assert lines['valid']['status'] == 'OPTIMAL'
+    assert lines['valid']['stats'] and lines['valid']['timing']['run'] >= 0
+    # Verify items can set their own time limit:
+    assert lines['slow']['status'] == 'OPTIMAL'
+    assert lines['malformed']['status'] == 'INVALID' and lines['malformed']['error']
+    assert lines['invalid']['status'] == 'INFEASIBLE' and lines['invalid']['result'] is None
+    assert lines['invalid']['reason'] == 'insufficient_capacity'
+
+
+def test_schedule_stream():
+    outcomes = []
+    stream = ScheduleStream(valid_user_inputs(), on_done=outcomes.append, engine='interval')
+    events = list(stream.events())
+
+    # Verify the improving solutions come first, then the outcome of the whole pipeline:
+    assert [event for event, data in events[:-1]] == ['solution'] * (len(events) - 1)
+    assert len(events) > 1
+    event, outcome = events[-1]
+    assert event == 'done'
+    assert outcome['status'] == 'OPTIMAL'
+    assert events[-2][1]['result'] == outcome['result']
+    assert outcome['schedule']
+    assert outcomes == [outcome]
+
+    # Verify a stream cancelled before the first solution reports it:
+    stream = ScheduleStream(valid_user_inputs(), engine='interval')
+    stream.cancel()
+    events = list(stream.events())
+    assert events[-1][0] == 'done'
+    assert events[-1][1]['status'] == 'UNKNOWN'
+    assert 'cancelled' in events[-1][1]['error']
+
+
+def test_cold_start_imports():
+    # Verify the web app starts without importing the solver, pandas or fpdf:
+    code = "import sys, app; print(sorted(m for m in ('ortools', 'pandas', 'fpdf', 'project', 'pdf') if m in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '[]'
+
+    # Verify they are imported at startup with PRELOAD_SOLVER=1:
+    code = "import os; os.environ['PRELOAD_SOLVER'] = '1'; import sys, app; print('ortools' in sys.modules and 'fpdf' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == 'True'
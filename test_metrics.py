@@ -0,0 +1,34 @@
+from metrics import PhaseTimer, Histogram, Counter, MetricsRegistry
+
+def test_phase_timer():
+    timer = PhaseTimer()
+    with timer.phase('parse'):
+        pass
+    timer.add('solve', 0.5)
+    timer.update({'solve': 0.25, 'pdf': 0.002})
+
+    # Verify the phases are added up and reported in milliseconds, in order:
+    assert timer.phases['solve'] == 0.75
+    assert timer.phases['parse'] >= 0
+    assert timer.server_timing().startswith('parse;dur=')
+    assert timer.server_timing().endswith('solve;dur=750.00, pdf;dur=2.00')
+
+def test_metrics_registry():
+    metrics = MetricsRegistry()
+    histogram = metrics.register(Histogram('phase_seconds', 'Time by phase.', 'phase', buckets=(0.1, 1.0)))
+    counter = metrics.register(Counter('requests_total', 'Requests.', ('endpoint', 'status')))
+    histogram.observe('solve', 0.05)
+    histogram.observe('solve', 0.5)
+    histogram.observe('solve', 5)
+    counter.inc('generate', 200)
+    counter.inc('generate', 200)
+
+    # Verify the Prometheus text format, with cumulative buckets:
+    lines = metrics.render().splitlines()
+    assert '# TYPE phase_seconds histogram' in lines
+    assert 'phase_seconds_bucket{phase="solve",le="0.1"} 1' in lines
+    assert 'phase_seconds_bucket{phase="solve",le="1.0"} 2' in lines
+    assert 'phase_seconds_bucket{phase="solve",le="+Inf"} 3' in lines
+    assert 'phase_seconds_sum{phase="solve"} 5.55' in lines
+    assert 'phase_seconds_count{phase="solve"} 3' in lines
+    assert 'requests_total{endpoint="generate",status="200"} 2' in lines
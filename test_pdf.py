@@ -0,0 +1,42 @@
+from export import schedule_document
+from pdf import render_pdf, render_document, page_skeletons, ROWS_PER_PAGE
+from timeslots import SlotGrid
+import re
+import zlib
+
+# Text drawn on the pages of a PDF (fpdf compresses the page contents)
+def page_texts(pdf):
+    streams = re.findall(rb'stream\n(.*?)\nendstream', pdf, re.S)
+    return [zlib.decompress(stream) for stream in streams]
+
+def test_render_pdf():
+    days = ['Monday', 'Tuesday']
+    result = {'Monday': {0: 'Write', 1: 'Write', 2: 'Lunch'}, 'Tuesday': {5: 'Read'}}
+
+    # Verify the PDF is returned as bytes, with one page for a short day:
+    pdf = render_pdf(days, result, ['Write', 'Read', 'Lunch'], SlotGrid('08:00', '12:00'))
+    assert isinstance(pdf, bytes)
+    assert pdf.startswith(b'%PDF')
+    assert len(re.findall(rb'/Type /Page\b', pdf)) == 1
+    assert sum(page.count(b'(Write) Tj') for page in page_texts(pdf)) == 1
+
+    # Verify the skeleton is reused for the same days and slots:
+    page_skeletons.cache_clear()
+    render_pdf(days, result, ['Write', 'Read', 'Lunch'], SlotGrid('08:00', '12:00'))
+    render_pdf(days, {}, [], SlotGrid('08:00', '12:00'))
+    assert page_skeletons.cache_info().hits == 1
+
+    # Verify long days continue on more pages, with the blocks split between them:
+    time_slots = SlotGrid('08:00', '18:00', 15)
+    result = {'Monday': {slot: 'Write' for slot in range(ROWS_PER_PAGE - 2, ROWS_PER_PAGE + 2)}}
+    pdf = render_pdf(days, result, ['Write'], time_slots)
+    assert len(re.findall(rb'/Type /Page\b', pdf)) == 2
+    assert [page.count(b'(Write) Tj') for page in page_texts(pdf)] == [1, 1]
+
+def test_render_document():
+    # Verify a stored week renders the same pages as its result:
+    days = ['Monday', 'Tuesday']
+    result = {'Monday': {0: 'Write', 1: 'Write', 2: 'Lunch'}, 'Tuesday': {5: 'Read'}}
+    time_slots = SlotGrid('08:00', '12:00')
+    document = schedule_document(days, result, ['Write', 'Read', 'Lunch'], time_slots)
+    assert page_texts(render_document(document)) == page_texts(render_pdf(days, result, ['Write', 'Read', 'Lunch'], time_slots))
@@ -1,9 +1,12 @@
-from project import schedule_blocks, create_timetable, get_project_statistics, print_timetable
+from project import schedule_blocks, create_timetable, get_project_statistics, print_timetable, check_feasibility, solution_hints, get_user_inputs
+from project import build_boolean_model, build_interval_model, create_solver, availability_masks, valid_starts, model_size, template_key, build_model_template, model_from_template, ENGINES
+from timeslots import SlotGrid
 from ortools.sat.python import cp_model
 import pytest
 import pandas as pd
 from io import StringIO
 import sys
+import threading
 
 def test_schedule_blocks():
     # Get a valid set of user inputs:
@@ -36,6 +39,320 @@ def test_schedule_blocks():
     assert status == cp_model.INFEASIBLE
 
 
+def test_schedule_blocks_interval_engine():
+    # Get a valid set of user inputs:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    status, result = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval')
+
+    # Verify the interval formulation also finds an optimal solution:
+    assert status == cp_model.OPTIMAL
+
+    #Verify that all projects were assigned at 100%:
+    for project in get_project_statistics(projects, result):
+        assert project["Assigned"] == "100%"
+
+    # Verify fixed constraints are kept in the result:
+    for constraint in fixed_constraints:
+        assert constraint['name'] in result[constraint['day']].values()
+
+    # Verify each project gets at most one consecutive block per day:
+    for day, slots in result.items():
+        for project in projects:
+            project_slots = sorted(slot for slot, name in slots.items() if name == project['name'])
+            if project_slots:
+                assert project_slots == list(range(project_slots[0], project_slots[0] + int(project['hours_per_block'] * 2)))
+
+    # Verify constraints outside of the available time still throw a KeyError:
+    with pytest.raises(KeyError):
+        schedule_blocks(available_days, start_time, "15:00", projects, fixed_constraints, engine='interval')
+
+    # Check the impossible problem can't be solved either:
+    available_days, start_time, end_time, projects, fixed_constraints = invalid_user_inputs()
+    status, result = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval')
+    assert status == cp_model.INFEASIBLE
+
+    # Verify unknown engines are rejected:
+    with pytest.raises(ValueError):
+        schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='unknown')
+
+
+def test_schedule_blocks_symmetry_breaking():
+    # Get a valid set of user inputs:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+
+    # Verify ordering the blocks doesn't change the optimal objective:
+    objectives = []
+    for symmetry_breaking in [True, False]:
+        status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval',
+                                                      symmetry_breaking=symmetry_breaking, return_stats=True)
+        assert status == cp_model.OPTIMAL
+        for project in get_project_statistics(projects, result):
+            assert project["Assigned"] == "100%"
+        objectives.append(solve_stats['objective'])
+    assert objectives[0] == objectives[1]
+
+    # Verify the ordering helps the default boolean engine, which doesn't prove this week optimal within the time limit:
+    # it gets at least as good a timetable, and a tighter bound
+    solves = []
+    for symmetry_breaking in [True, False]:
+        status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='boolean',
+                                                      symmetry_breaking=symmetry_breaking, return_stats=True, solver_params={'max_time': 2, 'random_seed': 0})
+        assert status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        solves.append(solve_stats)
+    assert solves[0]['objective'] >= solves[1]['objective']
+    assert solves[0]['best_bound'] < solves[1]['best_bound']
+
+    # Verify a project can't have more blocks than available days:
+    projects = [{'name': 'Gym', 'hours_per_block': 1, 'blocks_per_week': len(available_days) + 1}]
+    status, result = schedule_blocks(available_days, start_time, end_time, projects, [], engine='interval')
+    assert status == cp_model.INFEASIBLE
+
+
+def test_check_feasibility():
+    # Verify a valid set of user inputs passes the check:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    assert check_feasibility(available_days, start_time, end_time, projects, fixed_constraints) is None
+
+    # Verify constraints outside of the available time are reported instead of throwing a KeyError:
+    problem = check_feasibility(available_days, start_time, "15:00", projects, fixed_constraints)
+    assert problem['reason'] == 'constraint_outside_window'
+    assert problem['constraint'] == 'Writing group'
+
+    # Verify constraints on days that are not available are reported:
+    problem = check_feasibility(available_days[:-1], start_time, end_time, projects, fixed_constraints)
+    assert problem['reason'] == 'constraint_day_unavailable'
+
+    # Verify a project can't have more blocks than days:
+    problem = check_feasibility(available_days, start_time, end_time, [{'name': 'Gym', 'hours_per_block': 1, 'blocks_per_week': 6}], [])
+    assert problem['reason'] == 'too_many_blocks'
+
+    # Verify blocks longer than any free window are reported:
+    problem = check_feasibility(available_days, start_time, end_time, [{'name': 'Write', 'hours_per_block': 6, 'blocks_per_week': 1}], fixed_constraints)
+    assert problem['reason'] == 'block_too_long'
+
+    # Verify the total demand is compared to the free time:
+    problem = check_feasibility(*invalid_user_inputs())
+    assert problem['reason'] == 'insufficient_capacity'
+
+    # Verify the per day capacity is checked, with only one block per project per day:
+    projects = [{'name': 'Write', 'hours_per_block': 2, 'blocks_per_week': 2}, {'name': 'Read', 'hours_per_block': 2, 'blocks_per_week': 2}]
+    fixed_constraints = [{'name': 'Meeting', 'day': 'Tuesday', 'start_time': '08:00', 'end_time': '13:30'}]
+    problem = check_feasibility(['Monday', 'Tuesday'], start_time, "16:00", projects, fixed_constraints)
+    assert problem['reason'] == 'insufficient_day_capacity'
+
+
+def test_schedule_blocks_solver_params():
+    # Get a valid set of user inputs:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    solver_params = {'max_time': 10, 'num_workers': 1, 'relative_gap': 0, 'random_seed': 42}
+    status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval',
+                                                  solver_params=solver_params, return_stats=True)
+
+    # Verify the solve statistics are returned with the solution:
+    assert status == cp_model.OPTIMAL
+    assert solve_stats['status'] == 'OPTIMAL'
+    assert solve_stats['optimal']
+    assert solve_stats['wall_time'] <= 10
+    assert solve_stats['objective'] == solve_stats['best_bound']
+    for key in ['branches', 'conflicts', 'gap']:
+        assert key in solve_stats
+    # Verify the size and build time of the model are reported:
+    assert solve_stats['variables'] > 0 and solve_stats['constraints'] > 0
+    assert solve_stats['build_time'] >= 0
+
+    # Verify unknown solver parameters are rejected:
+    with pytest.raises(ValueError):
+        schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, solver_params={'max_seconds': 10})
+
+
+def test_schedule_blocks_hint():
+    # Get a valid set of user inputs:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    status, result = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval')
+
+    # Verify the previous blocks of every project become hints, in day order:
+    time_slots = SlotGrid(start_time, end_time)
+    hints = solution_hints(result, available_days, time_slots, projects, fixed_constraints)
+    assert len(hints) == sum(project['blocks_per_week'] for project in projects)
+    for (project_idx, block), (day, slot, extra_slots) in hints.items():
+        assert result[available_days[day]][slot] == projects[project_idx]['name'] and extra_slots == ()
+        if block > 0:
+            assert hints[(project_idx, block - 1)][0] < day
+
+    # Verify changed projects and blocks overlapping new constraints don't get hints:
+    projects = [dict(project) for project in projects]
+    projects[0]['hours_per_block'] = 0.5
+    new_constraint = {'name': 'Meeting', 'day': available_days[hints[(1, 0)][0]], 'start_time': time_slots[hints[(1, 0)][1]], 'end_time': time_slots[hints[(1, 0)][1] + 1]}
+    fixed_constraints = fixed_constraints + [new_constraint]
+    hints = solution_hints(result, available_days, time_slots, projects, fixed_constraints)
+    assert not any(project_idx == 0 for project_idx, block in hints)
+    assert len([key for key in hints if key[0] == 1]) == projects[1]['blocks_per_week'] - 1
+
+    # Verify the edited week is still solved with the hint:
+    status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval', hint=result, return_stats=True)
+    assert status == cp_model.OPTIMAL
+    assert solve_stats['first_solution_time'] is not None
+
+
+def test_schedule_blocks_boolean_hint():
+    # Get a week the boolean engine doesn't prove optimal within the time limit:
+    available_days, start_time, end_time, projects, fixed_constraints = get_user_inputs(hardcoded=True)
+    solver_params = {'max_time': 2, 'random_seed': 0}
+    status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, return_stats=True, solver_params=solver_params)
+
+    # Verify the hint is a whole timetable, every variable of the model gets a value:
+    time_slots = SlotGrid(start_time, end_time)
+    hints = solution_hints(result, available_days, time_slots, projects, fixed_constraints)
+    assert len(hints) == sum(project['blocks_per_week'] for project in projects)
+    model, extract_allocation = build_boolean_model(available_days, time_slots, projects, fixed_constraints, hints=hints)
+    assert len(model.Proto().solution_hint.vars) == len(model.Proto().variables)
+
+    # Verify the first solution of the hinted solve is the hinted timetable, and the solve doesn't end worse:
+    objectives = []
+    status, hinted_result, hinted_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, return_stats=True, solver_params=solver_params,
+                                                          hint=result, on_solution=lambda result, progress: objectives.append(progress['objective']))
+    assert objectives[0] == solve_stats['objective']
+    assert hinted_stats['objective'] >= solve_stats['objective']
+
+
+def test_schedule_blocks_slot_grid():
+    # Get a valid set of user inputs, with a 15 minutes standup on Monday:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    fixed_constraints = fixed_constraints + [{'name': 'Standup', 'day': 'Monday', 'start_time': '09:00', 'end_time': '09:15'}]
+    time_slots = SlotGrid(start_time, end_time, 15)
+    assert check_feasibility(available_days, start_time, end_time, projects, fixed_constraints, time_slots=time_slots) is None
+
+    # Verify the week is solved on the 15 minutes grid and the statistics use it:
+    status, result = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval', time_slots=time_slots)
+    assert status == cp_model.OPTIMAL
+    assert result['Monday'][time_slots.slot('09:00')] == 'Standup'
+    for project in get_project_statistics(projects, result, time_slots=time_slots):
+        assert project["Assigned"] == "100%"
+        assert project["Assigned Blocks"] == project["Target Blocks"]
+
+    # Verify the timetable uses the same grid:
+    timetable = create_timetable(available_days, start_time, end_time, result, time_slots=time_slots)
+    assert len(timetable) == 40
+    assert timetable.at['09:00', 'Monday'] == 'Standup'
+
+    # Verify a constraint can end with the available time:
+    fixed_constraints = [{'name': 'Wrap up', 'day': 'Friday', 'start_time': '17:00', 'end_time': '18:00'}]
+    status, result = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval')
+    assert status == cp_model.OPTIMAL
+    assert result['Friday'][19] == 'Wrap up'
+
+    # Verify blocks that aren't a whole number of slots are reported:
+    problem = check_feasibility(available_days, start_time, end_time, projects, [], time_slots=SlotGrid(start_time, end_time, 60))
+    assert problem is None
+    problem = check_feasibility(available_days, start_time, end_time, [{'name': 'Standup', 'hours_per_block': 0.25, 'blocks_per_week': 5}], [])
+    assert problem['reason'] == 'block_off_grid'
+
+    # Verify an empty grid that is passed in is used, not replaced by the default grid:
+    empty = SlotGrid(start_time, start_time)
+    assert len(empty) == 0
+    assert check_feasibility(available_days, start_time, end_time, projects, [], time_slots=empty)['reason'] == 'invalid_window'
+    assert len(create_timetable(available_days, start_time, end_time, {}, time_slots=empty)) == 0
+
+
+def test_schedule_blocks_on_solution():
+    # Get a valid set of user inputs:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    solutions = []
+    def on_solution(result, progress):
+        solutions.append((result, progress))
+    status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval',
+                                                  return_stats=True, on_solution=on_solution)
+
+    # Verify every improving solution is passed on as it's found, the last one being the result:
+    assert status == cp_model.OPTIMAL
+    assert len(solutions) == solve_stats['solutions'] > 0
+    assert solutions[-1][0] == result
+    assert solutions[-1][1]['objective'] == solve_stats['objective']
+    assert [progress['solutions'] for result, progress in solutions] == list(range(1, len(solutions) + 1))
+    assert not solve_stats['cancelled']
+
+    # Verify the first solution can be accepted, stopping the search:
+    status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval',
+                                                  return_stats=True, on_solution=lambda result, progress: True)
+    assert status in (cp_model.FEASIBLE, cp_model.OPTIMAL)
+    assert solve_stats['solutions'] == 1
+    assert solve_stats['cancelled'] == (status == cp_model.FEASIBLE)
+    for constraint in fixed_constraints:
+        assert constraint['name'] in result[constraint['day']].values()
+
+
+def test_schedule_blocks_cancel():
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    # Verify a cancelled solve stops, without a solution if it was cancelled from the start:
+    cancel = threading.Event()
+    cancel.set()
+    status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval',
+                                                  return_stats=True, cancel=cancel)
+    assert status == cp_model.UNKNOWN
+    assert result == {}
+    assert solve_stats['cancelled']
+
+    # Verify a solve that isn't cancelled isn't affected:
+    status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval',
+                                                  return_stats=True, cancel=threading.Event())
+    assert status == cp_model.OPTIMAL
+    assert not solve_stats['cancelled']
+
+
+def test_availability_masks():
+    available_days = ['Monday', 'Tuesday']
+    time_slots = SlotGrid('08:00', '12:00')
+    fixed_constraints = [{'name': 'Meeting', 'day': 'Monday', 'start_time': '09:00', 'end_time': '10:00'},
+                         {'name': 'Standup', 'day': 'Monday', 'start_time': '11:30', 'end_time': '12:00'}]
+
+    # Verify the free slots of each day are a bitmask, and blocks only start where all their slots are free:
+    masks = availability_masks(available_days, time_slots, fixed_constraints)
+    assert masks == [0b01110011, 0b11111111]
+    assert valid_starts(masks[0], len(time_slots), 2) == [0, 4, 5]
+    assert valid_starts(masks[0], len(time_slots), 3) == [4]
+    assert valid_starts(masks[0], len(time_slots), 4) == []
+    assert valid_starts(masks[1], len(time_slots), 3) == [0, 1, 2, 3, 4, 5]
+
+    # Verify the boolean model has no variables for blocked slots, so a busier week gives a smaller model:
+    projects = [{'name': 'Write', 'hours_per_block': 1, 'blocks_per_week': 2}]
+    free_model, extract_allocation = build_boolean_model(available_days, time_slots, projects, [])
+    busy_model, extract_allocation = build_boolean_model(available_days, time_slots, projects, fixed_constraints)
+    assert model_size(busy_model)['variables'] < model_size(free_model)['variables']
+    assert model_size(busy_model)['constraints'] < model_size(free_model)['constraints']
+    solver = create_solver({'max_time': 10})
+    assert solver.Solve(busy_model) == cp_model.OPTIMAL
+    assert all(masks[day] >> slot & 1 for day, slot, project_idx in extract_allocation(solver))
+
+
+@pytest.mark.parametrize('build_model', [build_boolean_model, build_interval_model])
+def test_extract_allocation_bulk(build_model):
+    # A small week, that the boolean model also solves quickly:
+    available_days = ['Monday', 'Tuesday']
+    time_slots = SlotGrid('08:00', '12:00')
+    projects = [{'name': 'Write', 'hours_per_block': 1, 'blocks_per_week': 2}, {'name': 'Read', 'hours_per_block': 1.5, 'blocks_per_week': 1}]
+    fixed_constraints = [{'name': 'Meeting', 'day': 'Monday', 'start_time': '09:00', 'end_time': '10:00'}]
+    model, extract_allocation = build_model(available_days, time_slots, projects, fixed_constraints)
+    solver = create_solver({'max_time': 10})
+    assert solver.Solve(model) == cp_model.OPTIMAL
+
+    # Verify reading the values at once gives the same allocation as reading them one by one:
+    allocated = extract_allocation(solver)
+    assert allocated == list(extract_allocation(solver, bulk=False))
+    assert len(allocated) == 2 * 2 + 3
+
+
+def test_create_timetable_grid():
+    # Verify the timetable is the same as filling a DataFrame cell by cell, empty cells included:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    status, result = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval')
+    expected = pd.DataFrame(index=SlotGrid(start_time, end_time).labels, columns=available_days)
+    for day, slots in result.items():
+        for slot, name in slots.items():
+            expected.at[SlotGrid(start_time, end_time)[slot], day] = name
+    timetable = create_timetable(available_days, start_time, end_time, result)
+    pd.testing.assert_frame_equal(timetable, expected)
+
+
 def test_create_timetable():
     # Get a valid set of user inputs:
     available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
@@ -112,4 +429,60 @@ def invalid_user_inputs():
         {'name': 'Writing group', 'day': 'Thursday', 'start_time': '09:00', 'end_time': '13:00'},
     ]
 
-    return available_days, start_time, end_time, projects, fixed_constraints
\ No newline at end of file
+    return available_days, start_time, end_time, projects, fixed_constraints
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_model_template(engine):
+    available_days = ['Monday', 'Tuesday']
+    time_slots = SlotGrid('08:00', '12:00')
+    projects = [{'name': 'Write', 'hours_per_block': 1, 'blocks_per_week': 2}, {'name': 'Read', 'hours_per_block': 1.5, 'blocks_per_week': 1}]
+    fixed_constraints = [{'name': 'Meeting', 'day': 'Monday', 'start_time': '09:00', 'end_time': '10:00'}]
+
+    # Verify the template only depends on the shape of the week, not on the names nor on the fixed constraints:
+    key = template_key(engine, available_days, time_slots, projects)
+    assert key == template_key(engine, ['Wednesday', 'Friday'], time_slots, [dict(project, name=project['name'] + ' 2') for project in projects])
+    assert key != template_key(engine, available_days, time_slots, projects[:1])
+    assert key != template_key(engine, available_days, SlotGrid('08:00', '12:00', 15), projects)
+
+    # Verify a model cloned from the template has the same optimum as a model built for the request, and avoids the fixed constraints:
+    template = build_model_template(engine, len(available_days), time_slots, projects)
+    template_size = model_size(template['model'])
+    template_domains = [list(variable.domain) for variable in template['model'].Proto().variables]
+    build_model = build_interval_model if engine == 'interval' else build_boolean_model
+    objectives = []
+    for model, extract_allocation in [build_model(available_days, time_slots, projects, fixed_constraints),
+                                      model_from_template(template, available_days, time_slots, projects, fixed_constraints)]:
+        solver = create_solver({'max_time': 10})
+        assert solver.Solve(model) == cp_model.OPTIMAL
+        objectives.append(solver.ObjectiveValue())
+        assert not any(day == 0 and slot in (2, 3) for day, slot, project_idx in extract_allocation(solver))
+    assert objectives[0] == objectives[1]
+
+    # Verify the template itself isn't changed by the requests:
+    assert model_size(template['model']) == template_size
+    assert [list(variable.domain) for variable in template['model'].Proto().variables] == template_domains
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_min_gap_objective(engine):
+    # Verify the smallest gaps between the blocks of each project are maximized, and the optimum is proved:
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    status, result, solve_stats = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine=engine,
+                                                  objective='min_gap', return_stats=True)
+    assert status == cp_model.OPTIMAL
+    assert solve_stats['objective'] == solve_stats['best_bound'] == 11
+    assert all(stats['Assigned'] == '100%' for stats in get_project_statistics(projects, result))
+
+    # Four days with room for one 2 hour block each: two projects of two blocks either share the gaps (2 + 2 days)
+    # or the heavier one gets Monday and Thursday (3 days) and the other one what's left (1 day)
+    available_days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday']
+    projects = [{'name': 'Write', 'hours_per_block': 2, 'blocks_per_week': 2}, {'name': 'Read', 'hours_per_block': 2, 'blocks_per_week': 2}]
+    for heavy in range(2):
+        weighted = [dict(project, weight=3 if project_idx == heavy else 1) for project_idx, project in enumerate(projects)]
+        status, result, solve_stats = schedule_blocks(available_days, '08:00', '10:00', weighted, [], engine=engine, objective='min_gap', return_stats=True)
+        assert status == cp_model.OPTIMAL
+        assert solve_stats['objective'] == 3 * 3 + 1
+        assert result['Monday'][0] == result['Thursday'][0] == projects[heavy]['name']
+
+    with pytest.raises(ValueError):
+        schedule_blocks(available_days, '08:00', '10:00', projects, [], objective='spread')
@@ -0,0 +1,63 @@
+from schedule import Schedule, as_result
+from project import schedule_blocks, get_project_statistics, create_timetable
+from test_project import valid_user_inputs
+from timeslots import SlotGrid
+from ortools.sat.python import cp_model
+import json
+import numpy as np
+import pytest
+
+def test_schedule_from_result():
+    result = {'Monday': {0: 'Write', 1: 'Write', 3: 'Lunch'}, 'Tuesday': {2: 'Read'}}
+    schedule = Schedule.from_result(result, ['Monday', 'Tuesday', 'Wednesday'], 8)
+
+    # Verify the week is held as a small-int matrix plus a name table, and converts back to the same dict:
+    assert schedule.grid.shape == (3, 8)
+    assert schedule.grid.dtype == np.uint8
+    assert set(schedule.names) == {'Write', 'Lunch', 'Read'}
+    assert schedule.to_result() == result
+    assert as_result(schedule) == result and as_result(result) is result
+    assert Schedule.of(schedule) is schedule
+
+    # Verify the counts and the runs of consecutive slots are read from the matrix:
+    assert schedule.slot_counts() == {'Write': 2, 'Lunch': 1, 'Read': 1}
+    assert schedule.runs('Monday') == [[0, 2, 'Write'], [3, 1, 'Lunch']]
+    assert schedule.runs('Wednesday') == [] and schedule.runs('Sunday') == []
+
+    # Verify the matrix can't be changed, so schedules can be shared:
+    with pytest.raises(ValueError):
+        schedule.grid[0, 0] = 0
+
+
+def test_schedule_serialization():
+    schedule = Schedule.from_result({'Monday': {0: 'Write', 5: 'Réunion'}, 'Friday': {7: 'Read'}}, ['Monday', 'Friday'], 8)
+
+    # Verify the JSON and binary forms round trip:
+    assert Schedule.from_dict(json.loads(json.dumps(schedule.to_dict()))) == schedule
+    data = schedule.to_bytes()
+    assert Schedule.from_bytes(data) == schedule
+    assert len(data) < 100
+    with pytest.raises(ValueError):
+        Schedule.from_bytes(b'%PDF')
+
+    # Verify big name tables get wider ids:
+    result = {'Monday': {slot: f'Meeting {slot}' for slot in range(300)}}
+    schedule = Schedule.from_result(result)
+    assert schedule.grid.dtype == np.uint16
+    assert Schedule.from_bytes(schedule.to_bytes()).to_result() == result
+
+
+def test_schedule_blocks_as_schedule():
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    status, result = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval')
+    status, schedule = schedule_blocks(available_days, start_time, end_time, projects, fixed_constraints, engine='interval', as_schedule=True)
+
+    # Verify the schedule has a row per day and a column per slot, and holds the same timetable as the dict:
+    assert status == cp_model.OPTIMAL
+    assert schedule.days == tuple(available_days)
+    assert schedule.num_slots == len(SlotGrid(start_time, end_time))
+    assert schedule.to_result() == result
+
+    # Verify the statistics and the timetable are the same from either form:
+    assert get_project_statistics(projects, schedule) == get_project_statistics(projects, result)
+    assert create_timetable(available_days, start_time, end_time, schedule).equals(create_timetable(available_days, start_time, end_time, result))
@@ -0,0 +1,71 @@
+from team import schedule_team, candidate_placements, shared_event_inputs, team_executor
+from jobs import BatchRunner
+from test_project import valid_user_inputs
+from timeslots import SlotGrid, time_to_minutes
+
+def team_inputs():
+    available_days, start_time, end_time, projects, fixed_constraints = valid_user_inputs()
+    people = {
+        'Ana': (available_days, start_time, end_time, projects[:2], fixed_constraints),
+        'Ben': (available_days, start_time, end_time, projects[2:4], [{'name': 'Dentist', 'day': 'Monday', 'start_time': '08:00', 'end_time': '12:00'}]),
+        'Cleo': (['Monday', 'Tuesday'], start_time, '14:00', projects[5:], []),
+    }
+    return people
+
+def test_candidate_placements():
+    people = team_inputs()
+    event = shared_event_inputs([{'name': 'Review', 'participants': ['Ana', 'Ben', 'Cleo'], 'hours': 1}], people)[0]
+    candidates = candidate_placements(event, people, 30)
+    # Verify the candidates are in the days and hours of all the participants, when none of them is busy:
+    assert candidates
+    assert {day for day, minute in candidates} <= {'Monday', 'Tuesday'}
+    assert all(8 * 60 <= minute <= 13 * 60 for day, minute in candidates)
+    assert not any(day == 'Monday' and minute < 12 * 60 for day, minute in candidates)
+
+def test_schedule_team():
+    people = team_inputs()
+    shared_events = [
+        {'name': 'Review', 'participants': ['Ana', 'Ben', 'Cleo'], 'hours': 1},
+        {'name': 'Pairing', 'participants': ['Ana', 'Ben'], 'hours': 1.5, 'days': ['Wednesday']},
+        {'name': 'All hands', 'participants': ['Ana', 'Cleo'], 'day': 'Tuesday', 'start_time': '08:00', 'end_time': '08:30'},
+    ]
+    outcome = schedule_team(people, shared_events, engine='interval')
+    assert outcome['error'] is None
+    assert outcome['complete']
+
+    # Verify each shared event is at the same time in the week of all its participants, the time it was placed at:
+    for event in outcome['shared_events']:
+        event_minutes = set(range(time_to_minutes(event['start_time']), time_to_minutes(event['end_time']), 30))
+        for person in event['participants']:
+            time_slots = SlotGrid(people[person][1], people[person][2])
+            result = outcome['people'][person]['result'][event['day']]
+            assert {time_slots.start + slot * 30 for slot, name in result.items() if name == event['name']} == event_minutes
+        assert not any(event['name'] in outcome['people'][person]['result'].get(event['day'], {}).values()
+                       for person in people if person not in event['participants'])
+    placed = {event['name']: event for event in outcome['shared_events']}
+    assert placed['Pairing']['day'] == 'Wednesday'
+    assert (placed['All hands']['day'], placed['All hands']['start_time']) == ('Tuesday', '08:00')
+
+    # Verify the problems of the shared events are reported:
+    assert schedule_team(people, [{'name': 'Review', 'participants': ['Dan'], 'hours': 1}])['error']
+    assert schedule_team(people, [{'name': 'Offsite', 'participants': ['Ana', 'Cleo'], 'hours': 1, 'days': ['Friday']}])['error']
+
+def test_schedule_team_executor():
+    people = team_inputs()
+    shared_events = [{'name': 'Review', 'participants': ['Ana', 'Ben', 'Cleo'], 'hours': 1}]
+    sequential = schedule_team(people, shared_events, engine='interval')
+
+    # Verify the weeks solved in a process pool, as the web app does, give the same team schedule:
+    with team_executor(max_workers=2) as executor:
+        parallel = schedule_team(people, shared_events, engine='interval', executor=executor)
+    assert parallel['error'] is None and parallel['complete']
+    assert parallel['shared_events'] == sequential['shared_events']
+    assert {person: outcome['result'] for person, outcome in parallel['people'].items()} == {person: outcome['result'] for person, outcome in sequential['people'].items()}
+
+    # Verify the weeks can be solved by the batch runner, as /team does, one at a time with a single slot:
+    batch_runner = BatchRunner(max_workers=2, max_in_flight=1)
+    try:
+        limited = schedule_team(people, shared_events, engine='interval', executor=batch_runner)
+    finally:
+        batch_runner.shutdown()
+    assert limited['shared_events'] == sequential['shared_events'] and limited['complete']
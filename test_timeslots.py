@@ -0,0 +1,33 @@
+from timeslots import SlotGrid
+import pytest
+
+def test_slot_grid():
+    time_slots = SlotGrid('08:00', '18:00')
+
+    # Verify the grid has the same labels as the old 30 min pandas grid:
+    assert len(time_slots) == 20
+    assert time_slots[0] == '08:00' and time_slots[-1] == '17:30'
+    assert list(time_slots) == time_slots.labels
+
+    # Verify slot lookups, including the end of the available time as a boundary:
+    assert time_slots.slot('13:00') == 10
+    assert time_slots.get_loc('18:00') == 20
+    for time_str in ['07:30', '18:30', '13:15', 'noon']:
+        with pytest.raises(KeyError):
+            time_slots.slot(time_str)
+
+    # Verify durations are converted with the grid's granularity:
+    assert time_slots.duration_slots(2) == 4
+    assert time_slots.hours(3) == 1.5
+    assert time_slots.fits_grid(1.5) and not time_slots.fits_grid(0.25)
+
+
+@pytest.mark.parametrize('slot_minutes, num_slots, block_slots', [(15, 40, 6), (30, 20, 3), (60, 10, 1)])
+def test_slot_grid_granularity(slot_minutes, num_slots, block_slots):
+    time_slots = SlotGrid('08:00', '18:00', slot_minutes)
+    assert len(time_slots) == num_slots
+    assert time_slots.duration_slots(1.5 if slot_minutes < 60 else 1) == block_slots
+
+    # Verify unsupported granularities are rejected:
+    with pytest.raises(ValueError):
+        SlotGrid('08:00', '18:00', 20)
@@ -0,0 +1,67 @@
+# Supported slot granularities, in minutes
+SLOT_MINUTES = (15, 30, 60)
+
+# Converts time string to minutes since midnight
+def time_to_minutes(time_str):
+    hours, minutes = time_str.split(':')
+    return int(hours) * 60 + int(minutes)
+
+# Converts minutes since midnight to a time string
+def minutes_to_time(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+# Precomputed grid of time slots between start_time and end_time, built once per request and shared by
+# scheduling, timetable creation and PDF rendering. Slot lookups are O(1) dict reads, without pandas.
+# It behaves like the list of slot labels ('08:00', '08:30', ...) for len(), indexing and iteration.
+class SlotGrid:
+    __slots__ = ('start_time', 'end_time', 'slot_minutes', 'start', 'end', 'num_slots', 'labels', '_slot_of_minute')
+
+    def __init__(self, start_time, end_time, slot_minutes=30):
+        if slot_minutes not in SLOT_MINUTES:
+            raise ValueError(f"Unsupported slot duration: {slot_minutes} minutes")
+        self.start_time = start_time
+        self.end_time = end_time
+        self.slot_minutes = slot_minutes
+        self.start = time_to_minutes(start_time)
+        self.end = time_to_minutes(end_time)
+        self.num_slots = max(0, (self.end - self.start) // slot_minutes)
+        self.labels = [minutes_to_time(self.start + slot * slot_minutes) for slot in range(self.num_slots)]
+        # The end of the last slot is a valid boundary too, so a constraint can end with the available time
+        self._slot_of_minute = {self.start + slot * slot_minutes: slot for slot in range(self.num_slots + 1)}
+
+    def __len__(self):
+        return self.num_slots
+
+    def __getitem__(self, slot):
+        return self.labels[slot]
+
+    def __iter__(self):
+        return iter(self.labels)
+
+    def __repr__(self):
+        return f"SlotGrid({self.start_time!r}, {self.end_time!r}, {self.slot_minutes})"
+
+    # Slot index of a time string. Raises a KeyError if it's outside the available time or not on the grid.
+    def slot(self, time_str):
+        try:
+            minutes = time_to_minutes(time_str)
+        except (ValueError, AttributeError):
+            raise KeyError(time_str)
+        if minutes not in self._slot_of_minute:
+            raise KeyError(time_str)
+        return self._slot_of_minute[minutes]
+
+    # Same name as pandas' Index.get_loc, used by time_to_slot
+    get_loc = slot
+
+    # Number of slots in a duration given in hours (replaces the old hours * 2)
+    def duration_slots(self, hours):
+        return int(hours * 60 / self.slot_minutes)
+
+    # True if a duration in hours is a whole number of slots
+    def fits_grid(self, hours):
+        return hours * 60 % self.slot_minutes == 0
+
+    # Hours in a number of slots
+    def hours(self, slots):
+        return slots * self.slot_minutes / 60